@@ -1,12 +1,14 @@
+import argparse
+import collections
+import math
+import numpy as np
+import os
 import pygame
 import sys
-from tkinter import messagebox, Tk
-import collections
-import csv
+import time
+from tkinter import filedialog, messagebox, Tk
 
-# --- Configuration ---
-COLUMNS = 38
-ROWS = 38
+from warepath import COLUMNS, ROWS, FREE, WALL, MIN_COST, MAX_COST, Warehouse, FieldCache, RoutingError, POLICIES, compare_modes, rounded_time, flood_cells, line_cells, paint_costs, paint_walls, rack_cells, rectangle_cells, PROFILER, count, timed, load_layout as read_layout, save_layout as write_layout, run_simulation as plan_route, run_pickers as plan_pickers
 
 WINDOW_HEIGHT = 800
 SIDEBAR_WIDTH = 280
@@ -17,6 +19,12 @@ WINDOW_WIDTH = SIDEBAR_WIDTH + GRID_WIDTH + MATHBAR_WIDTH
 BOX_WIDTH = GRID_WIDTH // COLUMNS
 BOX_HEIGHT = WINDOW_HEIGHT // ROWS
 
+# --- Viewport ---
+BOX_MIN = 6  # below this many pixels per cell the floor is drawn as one downsampled texture
+MIN_CELL = 0.1  # zoom limits, in pixels per cell
+MAX_CELL = 64
+ZOOM_STEP = 1.25  # per mouse wheel notch
+
 # --- Colors ---
 EMPTY_COLOR = (20, 20, 20)  # Background
 WALL_COLOR = (240, 240, 240)  # Shelves
@@ -25,7 +33,27 @@ TARGET_COLOR = (0, 200, 200)  # Item (Teal)
 PICKING_PATH_COLOR = (0, 120, 255)  # Outbound Route (Blue)
 RETURN_PATH_COLOR = (50, 205, 50)  # Return Route (Lime Green)
 PICKER_COLOR = (255, 0, 255)  # The Worker (Magenta)
+COST_COLOR = (200, 130, 40)  # Slowest floor (Amber), cheaper cells are shades between it and the background
 TEXT_COLOR = (255, 255, 255)
+# One path colour per picker in multi-picker runs, the first one is the usual blue
+PICKER_PATH_COLORS = [PICKING_PATH_COLOR, (230, 60, 60), (240, 200, 0), (160, 90, 255),
+                      (255, 105, 180), (0, 170, 120), (170, 120, 70), (140, 140, 255)]
+
+# Policy button labels, and the short mode names of the comparison table
+POLICY_LABELS = {"S-SHAPE": "S-Shape", "RETURN": "Return", "LARGEST-GAP": "Largest Gap", "COMBINED": "Combined"}
+COMPARE_LABELS = {"SEQUENCE": "SEQ", "GREEDY": "GREEDY", "OPTIMIZED": "2-OPT", "EXACT": "EXACT",
+                  "S-SHAPE": "S-SHAPE", "RETURN": "RETURN", "LARGEST-GAP": "L-GAP", "COMBINED": "COMB."}
+BEST_ROW_COLOR = (120, 220, 120)
+TABLE_CELL = 56  # column width of the table: points, distance, units, time
+
+# Paint codes of the low zoom texture; where cells are aggregated the highest code wins
+PAINT_EMPTY = FREE
+PAINT_WALL = WALL
+PAINT_COSTS = 2  # cell cost c (2 to MAX_COST): PAINT_COSTS + c - 2
+PAINT_PATHS = PAINT_COSTS + MAX_COST - 1  # picker p: picking path PAINT_PATHS + 2p, return path PAINT_PATHS + 1 + 2p
+PAINT_TARGET = 250
+PAINT_START = 251
+PAINT_PICKER = 252
 
 UI_BG = (40, 40, 40)
 BUTTON_COLOR = (70, 70, 70)
@@ -36,13 +64,58 @@ BUTTON_DISABLED = (50, 50, 50)  # Dim color for disabled buttons
 distance_input_rect = pygame.Rect(1055,78,50,21)
 distance_input = "1"
 distance_active = False
-
-pygame.init()
-window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Warehouse Picking: Manual Return Trigger")
-font = pygame.font.SysFont('Arial', 15)
-header_font = pygame.font.SysFont('Arial', 20, bold=True)
-number_font = pygame.font.SysFont('Arial', 14, bold=True)
+pickers_input_rect = pygame.Rect(1240,78,40,21)
+pickers_input = "3"
+pickers_active = False
+capacity_input_rect = pygame.Rect(1235,130,50,21)
+capacity_input = "0"  # tote capacity in picks, 0 means one trip
+capacity_active = False
+
+# Display and fonts are only created once main() starts
+window = None
+font = None
+header_font = None
+number_font = None
+floor_layer = None  # walls, depot and targets of the cells in view, repainted per changed cell
+grid_rect = pygame.Rect(SIDEBAR_WIDTH, 0, GRID_WIDTH, WINDOW_HEIGHT)
+
+def init_display():
+    global window, font, header_font, number_font, floor_layer
+    pygame.init()
+    window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    floor_layer = pygame.Surface((GRID_WIDTH, WINDOW_HEIGHT)).convert()
+    pygame.display.set_caption("Warehouse Picking: Manual Return Trigger")
+    font = pygame.font.SysFont('Arial', 15)
+    header_font = pygame.font.SysFont('Arial', 20, bold=True)
+    number_font = pygame.font.SysFont('Arial', 14, bold=True)
+
+# --- Profiler Panel ---
+# Timers and counters of warepath.profiling, shown in place of the table (P toggles)
+show_profiler = False
+PROFILER_HZ = 4  # panel refreshes per second while shown
+PROFILER_ROW = 17
+PROFILER_COLORS = [(190, 190, 255), (150, 220, 150), (230, 200, 120), (200, 200, 200)]  # by nesting depth
+PROFILE_FILES = ("profile.jsonl", "profile.trace.json")  # names suggested by the save dialogs
+
+# --- Text Cache ---
+# Rendered text surfaces keyed by (font, text, colour); labels, buttons and tables
+# repeat the same strings, so only new text is rasterised
+TEXT_CACHE_SIZE = 1024
+text_cache = collections.OrderedDict()  # oldest first
+
+def render_text(text_font, text, color):
+    """Antialiased ``text_font.render`` through a bounded LRU cache"""
+    key = (text_font, text, tuple(color))
+    surface = text_cache.get(key)
+    if surface is None:
+        surface = text_font.render(text, True, color)
+        count("text surfaces rendered")
+        text_cache[key] = surface
+        if len(text_cache) > TEXT_CACHE_SIZE:
+            text_cache.popitem(last=False)
+    else:
+        text_cache.move_to_end(key)
+    return surface
 
 class Button:
     def __init__(self, x, y, width, height, text, callback, enabled=True):
@@ -65,7 +138,7 @@ class Button:
 
         pygame.draw.rect(win, draw_color, self.rect)
 
-        text_surf = font.render(self.text, True, text_color)
+        text_surf = render_text(font, self.text, text_color)
         text_rect = text_surf.get_rect(center=self.rect.center)
         win.blit(text_surf, text_rect)
 
@@ -79,267 +152,614 @@ class Button:
                 self.callback()
 
 class Box:
+    """Drawing view of one warehouse cell, the state itself lives in warehouse arrays"""
     def __init__(self, i, j):
         self.x = i
         self.y = j
-        self.start = False
-        self.wall = False
-        self.target = False
-        self.target_index = -1
-        self.neighbours = []
-        self.parent = None
-
-    def draw(self, win, x_offset, path_type=None, is_picker=False):
+        self.cell = warehouse.cell(i, j)
+
+    @property
+    def wall(self):
+        return warehouse.is_wall(self.cell)
+
+    @property
+    def start(self):
+        return self.cell == warehouse.start
+
+    @property
+    def target(self):
+        return self.cell in target_cells
+
+    @property
+    def target_index(self):
+        return warehouse.target_index.get(self.cell, -1)
+
+    @property
+    def cost(self):
+        return warehouse.cost[self.cell]
+
+    def floor_rect(self):
+        return camera.cell_rect(self.x, self.y)
+
+    def draw_floor(self, layer):
+        """Paints the static look of the cell (floor, shelf, depot, target) onto the floor layer"""
         color = EMPTY_COLOR
+        slow = False
 
         # Priority of colors (what draws on top of what)
-        if is_picker:
-            color = PICKER_COLOR
-        elif self.wall:
+        if self.wall:
             color = WALL_COLOR
         elif self.start:
             color = START_COLOR
         elif self.target:
             color = TARGET_COLOR
-        elif path_type == "PICKING":
-            color = PICKING_PATH_COLOR
-        elif path_type == "RETURN":
-            color = RETURN_PATH_COLOR
-
-        draw_x = x_offset + (self.x * BOX_WIDTH)
-        draw_y = self.y * BOX_HEIGHT
-
-        pygame.draw.rect(win, color, (draw_x, draw_y, BOX_WIDTH - 2, BOX_HEIGHT - 2))
-
-        if self.target and self.target_index > 0:
-            text = number_font.render(str(self.target_index), True, (0, 0, 0))
-            text_rect = text.get_rect(center=(draw_x + BOX_WIDTH // 2, draw_y + BOX_HEIGHT // 2))
+        elif self.cost > MIN_COST:
+            color = cost_color(self.cost)
+            slow = True
+
+        rect = self.floor_rect()
+        pygame.draw.rect(layer, (0, 0, 0), rect)
+        pygame.draw.rect(layer, color, inner_rect(rect))
+        self.draw_label(layer, rect)
+        if slow and rect.height >= 14:
+            text = render_text(number_font, str(self.cost), (0, 0, 0))
+            layer.blit(text, text.get_rect(center=rect.center))
+
+    def draw_label(self, win, rect):
+        if self.target and self.target_index > 0 and rect.height >= 14:
+            text = render_text(number_font, str(self.target_index), (0, 0, 0))
+            text_rect = text.get_rect(center=rect.center)
             win.blit(text, text_rect)
 
-    #stZ
+    def draw(self, win, x_offset, path_type=None, is_picker=False, picker=0):
+        """Copies the cell from the floor layer and paints a path or picker over it, returns the rect"""
+        rect = self.floor_rect().move(x_offset, 0)
+        floor = self.floor_rect().clip(floor_layer.get_rect())
+        win.blit(floor_layer, floor.move(x_offset, 0), floor)
 
-    def set_neighbours(self, grid):
-        self.neighbours = []
-        if self.x > 0: self.neighbours.append(grid[self.x - 1][self.y])
-        if self.x < COLUMNS - 1: self.neighbours.append(grid[self.x + 1][self.y])
-        if self.y > 0: self.neighbours.append(grid[self.x][self.y - 1])
-        if self.y < ROWS - 1: self.neighbours.append(grid[self.x][self.y + 1])
+        # Pickers draw over everything, paths only over empty floor
+        if is_picker:
+            color = PICKER_COLOR
+        elif path_type is None or self.wall or self.start or self.target:
+            return rect
+        elif path_type == "PICKING":
+            color = PICKER_PATH_COLORS[picker % len(PICKER_PATH_COLORS)]
+        else:
+            color = return_color(picker)
+
+        pygame.draw.rect(win, color, inner_rect(rect))
+        if is_picker:
+            self.draw_label(win, rect)
+        return rect
+
+def inner_rect(rect):
+    """The coloured part of a cell, leaving the dark gap between boxes"""
+    gap = 2 if min(rect.width, rect.height) >= 8 else 1
+    return (rect.x, rect.y, rect.width - gap, rect.height - gap)
+
+class Camera:
+    """Which part of the floor the grid area shows
+
+    ``left``/``top`` is the (fractional) cell at the top-left corner of the grid area,
+    ``cell_w``/``cell_h`` the zoom in pixels per cell.
+    """
+    def __init__(self):
+        self.left = 0.0
+        self.top = 0.0
+        self.cell_w = BOX_WIDTH
+        self.cell_h = BOX_HEIGHT
+
+    def fit(self, columns, rows):
+        """Whole floor in view; whole-pixel boxes while they are big enough, as on the 38 x 38 floor"""
+        self.left = self.top = 0.0
+        if GRID_WIDTH // columns >= BOX_MIN and WINDOW_HEIGHT // rows >= BOX_MIN:
+            self.cell_w = GRID_WIDTH // columns
+            self.cell_h = WINDOW_HEIGHT // rows
+        else:
+            self.cell_w = self.cell_h = min(GRID_WIDTH / columns, WINDOW_HEIGHT / rows)
+
+    @property
+    def boxes(self):
+        """True when cells are big enough to draw one box each"""
+        return min(self.cell_w, self.cell_h) >= BOX_MIN
+
+    def zoom(self, factor, mx, my):
+        """Zooms by ``factor`` keeping the cell under the mouse where it is"""
+        factor = min(max(factor, MIN_CELL / min(self.cell_w, self.cell_h)), MAX_CELL / max(self.cell_w, self.cell_h))
+        x = self.left + (mx - SIDEBAR_WIDTH) / self.cell_w
+        y = self.top + my / self.cell_h
+        self.cell_w *= factor
+        self.cell_h *= factor
+        self.left = x - (mx - SIDEBAR_WIDTH) / self.cell_w
+        self.top = y - my / self.cell_h
+        self.clamp()
+
+    def pan(self, dx, dy):
+        self.left -= dx / self.cell_w
+        self.top -= dy / self.cell_h
+        self.clamp()
+
+    def clamp(self):
+        """Keeps at least one row and column of the floor in view"""
+        self.left = min(max(self.left, 1 - GRID_WIDTH / self.cell_w), warehouse.columns - 1)
+        self.top = min(max(self.top, 1 - WINDOW_HEIGHT / self.cell_h), warehouse.rows - 1)
+
+    def cell_at(self, mx, my):
+        return (math.floor(self.left + (mx - SIDEBAR_WIDTH) / self.cell_w),
+                math.floor(self.top + my / self.cell_h))
+
+    def cell_rect(self, x, y):
+        """Screen rect of cell (x, y) relative to the grid area"""
+        left = math.floor((x - self.left) * self.cell_w)
+        top = math.floor((y - self.top) * self.cell_h)
+        right = math.floor((x + 1 - self.left) * self.cell_w)
+        bottom = math.floor((y + 1 - self.top) * self.cell_h)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def visible(self):
+        """(x0, y0, x1, y1): the half-open range of cells at least partly in view"""
+        x0 = max(math.floor(self.left), 0)
+        y0 = max(math.floor(self.top), 0)
+        x1 = min(math.ceil(self.left + GRID_WIDTH / self.cell_w), warehouse.columns)
+        y1 = min(math.ceil(self.top + WINDOW_HEIGHT / self.cell_h), warehouse.rows)
+        return x0, y0, x1, y1
+
+    def shows(self, cell):
+        x, y = warehouse.coords(cell)
+        x0, y0, x1, y1 = self.visible()
+        return x0 <= x < x1 and y0 <= y < y1
+
+def path_paint_code(path_type, picker):
+    return PAINT_PATHS + 2 * (picker % len(PICKER_PATH_COLORS)) + (path_type != "PICKING")
+
+def cost_color(cost):
+    """Background for cost 1, COST_COLOR for MAX_COST, evenly in between"""
+    t = (cost - MIN_COST) / (MAX_COST - MIN_COST)
+    return tuple(round(e + t * (c - e)) for e, c in zip(EMPTY_COLOR, COST_COLOR))
+
+def paint_palette():
+    """Colour per paint code, as a (256, 3) lookup table for the low zoom texture"""
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    palette[PAINT_EMPTY] = EMPTY_COLOR
+    palette[PAINT_WALL] = WALL_COLOR
+    for cost in range(MIN_COST + 1, MAX_COST + 1):
+        palette[PAINT_COSTS + cost - 2] = cost_color(cost)
+    for picker in range(len(PICKER_PATH_COLORS)):
+        palette[path_paint_code("PICKING", picker)] = PICKER_PATH_COLORS[picker]
+        palette[path_paint_code("RETURN", picker)] = return_color(picker)
+    palette[PAINT_TARGET] = TARGET_COLOR
+    palette[PAINT_START] = START_COLOR
+    palette[PAINT_PICKER] = PICKER_COLOR
+    return palette
+
+def draw_overview(win, picker_cells):
+    """Low zoom: the cells in view as one texture, k x k cells per texel, scaled onto the grid area
+
+    Each texel shows the highest paint code of its cells, so a lone target, picker or
+    shelf still shows up when it is much smaller than a pixel.
+    """
+    x0, y0, x1, y1 = camera.visible()
+    k = max(1, math.ceil(1 / min(camera.cell_w, camera.cell_h)))
+    x0 -= x0 % k
+    y0 -= y0 % k
+    if x1 <= x0 or y1 <= y0:
+        return
+    columns, rows = warehouse.columns, warehouse.rows
+    paint = np.frombuffer(warehouse.occupancy, dtype=np.uint8).reshape(rows, columns)[y0:y1, x0:x1].copy()
+    if warehouse.weighted:
+        cost = np.frombuffer(warehouse.cost, dtype=np.uint8).reshape(rows, columns)[y0:y1, x0:x1]
+        slow = (paint == PAINT_EMPTY) & (cost > MIN_COST)
+        paint[slow] = cost[slow] + (PAINT_COSTS - 2)
+    # Path codes are above the cost codes, so a path shows over slow floor too
+    np.maximum(paint, path_paint.reshape(rows, columns)[y0:y1, x0:x1], out=paint, where=paint != PAINT_WALL)
+    for cells, code in ((warehouse.targets, PAINT_TARGET), ([warehouse.start], PAINT_START), (picker_cells, PAINT_PICKER)):
+        if cells:
+            ys, xs = np.divmod(np.fromiter(cells, dtype=np.int64, count=len(cells)), columns)
+            inside = (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+            paint[ys[inside] - y0, xs[inside] - x0] = code
+
+    h, w = paint.shape
+    blocks = np.zeros((-(-h // k) * k, -(-w // k) * k), dtype=np.uint8)
+    blocks[:h, :w] = paint
+    blocks = blocks.reshape(blocks.shape[0] // k, k, blocks.shape[1] // k, k).max(axis=(1, 3))
+    texture = pygame.surfarray.make_surface(PALETTE[blocks].swapaxes(0, 1))
+    count("textures built")
+    size = (max(round(w * camera.cell_w), 1), max(round(h * camera.cell_h), 1))
+    pos = (SIDEBAR_WIDTH + round((x0 - camera.left) * camera.cell_w), round((y0 - camera.top) * camera.cell_h))
+    win.blit(pygame.transform.scale(texture, size), pos)
+
+class Playback:
+    """Time-based playback of the pickers' steps, driven by a cursor instead of popping queues
+
+    ``position`` counts cells walked per picker (all pickers walk at the same speed),
+    so a frame only applies the steps between the old and the new cursor. Scrubbing
+    backwards rebuilds the drawn cells from ``base``, the paths that were already
+    on screen when the playback started.
+    """
+    def __init__(self, queues, pickers, base=None):
+        self.queues = queues  # one list of (cell, path type, picker) per picker
+        self.length = max((len(queue) for queue in queues), default=0)
+        self.start_pickers = list(pickers)
+        self.base = dict(base or {})
+        self.cells = dict(self.base)  # cell -> (path type, picker), what is drawn right now
+        self.pickers = list(pickers)  # where every picker stands right now
+        self.position = 0.0
+        self.shown = 0  # steps per queue already applied to cells
+        self.paused = False
+        self.changed = set()  # cells stepped on since the screen last looked, cleared by the drawing code
+
+    @property
+    def finished(self):
+        return self.shown >= self.length
+
+    @property
+    def progress(self):
+        return self.shown / self.length if self.length else 1.0
+
+    def update(self, seconds, speed):
+        if not self.paused:
+            self.seek(self.position + seconds * speed)
+
+    def seek(self, position):
+        self.position = min(max(position, 0.0), float(self.length))
+        index = int(self.position)
+        if index < self.shown:
+            self.cells = dict(self.base)
+            self.pickers = list(self.start_pickers)
+            self.shown = 0
+        # Step by step across all pickers, so overlapping paths end up drawn as they were walked
+        for step in range(self.shown, index):
+            for queue in self.queues:
+                if step < len(queue):
+                    cell, path_type, picker = queue[step]
+                    self.cells[cell] = (path_type, picker)
+                    self.pickers[picker] = cell
+                    self.changed.add(cell)
+        self.shown = index
+
+    def skip(self, cells):
+        self.seek(self.position + cells)
+
+    def jump_to_end(self):
+        self.seek(self.length)
+
+def return_color(picker):
+    """Return legs are green for a single picker, a darker shade of the picker's colour otherwise"""
+    if picker == 0:
+        return RETURN_PATH_COLOR
+    r, g, b = PICKER_PATH_COLORS[picker % len(PICKER_PATH_COLORS)]
+    return (r // 2, g // 2, b // 2)
 
 # --- Global State ---
-grid = []
-start_box = None
-targets = []
+warehouse = Warehouse(COLUMNS, ROWS)
+field_cache = FieldCache()  # distance fields survive between runs, keyed by the wall layout
+camera = Camera()
+PALETTE = paint_palette()
+path_paint = np.zeros(warehouse.size, dtype=np.uint8)  # paint code of the drawn paths per cell, for the texture
+target_cells = set()  # warehouse.targets as a set, refreshed once per frame for drawing
 bfs_table = []
+bfs_table_colors = None  # colour of the first column per row, for the per-picker rows
 return_bfs_table = []
 return_bfs_table_y = 0
-
-# -- For Saving Layouts --
-walls = []
-target_locations = []
-start_box_loc = []
-
-# Animation State
-visible_path_cells = {}
-active_queue = []  # The queue currently being animated
-return_queue = []  # Stored sequence for the return trip
-current_picker_node = None
+policy = POLICIES[0]  # aisle policy of the policy button
+
+# Rendering State: only cells in floor_dirty are repainted on the floor layer, and the
+# screen only gets the rects that changed unless redraw_all is set
+floor_dirty = set()
+redraw_all = True
+
+def mark_floor(*cells):
+    floor_dirty.update(cells)
+
+def mark_all():
+    global redraw_all
+    redraw_all = True
+
+def box_at(cell):
+    """Box views are made on demand, a big floor would not fit a million of them"""
+    return Box(*warehouse.coords(cell))
+
+def fit_view():
+    """Fits the camera to the floor size, after a reset, resize or load"""
+    global path_paint
+    if len(path_paint) != warehouse.size:
+        path_paint = np.zeros(warehouse.size, dtype=np.uint8)
+    camera.fit(warehouse.columns, warehouse.rows)
+    mark_all()
+
+# Animation State, one queue per picker
+visible_path_cells = {}  # cell -> (path type, picker)
+playback = None  # the Playback currently on screen
+playback_speed = 120  # cells per second
+MIN_SPEED = 15
+MAX_SPEED = 7680
+return_queues = []  # Stored sequences for the return trips
+current_picker_nodes = []
 is_animating = False
 current_algo_name = "Ready"
 ready_for_return = False  # Flag to enable the return button
 
 def create_grid():
-    global grid, start_box, targets, visible_path_cells, active_queue, return_queue, is_animating, current_algo_name, ready_for_return
-    grid = []
-    targets = []
+    global visible_path_cells, playback, return_queues, current_picker_nodes, is_animating, current_algo_name, ready_for_return
     visible_path_cells = {}
-    active_queue = []
-    return_queue = []
+    playback = None
+    return_queues = []
+    current_picker_nodes = []
     is_animating = False
     ready_for_return = False
     current_algo_name = "Ready"
 
-    for i in range(COLUMNS):
-        arr = []
-        for j in range(ROWS):
-            arr.append(Box(i, j))
-        grid.append(arr)
-
-    for i in range(COLUMNS):
-        for j in range(ROWS):
-            grid[i][j].set_neighbours(grid)
-
-    start_box = grid[0][0] #where we set up the start box -- will need to remove this later and then set different starts
-    start_box.start = True
+    warehouse.create_grid()
+    fit_view()
 
 def full_reset():
     create_grid()
     reset_table()
 
-def bfs_distance_map(start_node):
-    for col in grid:
-        for box in col:
-            box.parent = None
-
-    distances = {start_node: 0}
-    parents = {start_node: None}
-
-    q = collections.deque([start_node])
-    visited = {start_node}
-
-    while q:
-        current = q.popleft()
-        for neighbor in current.neighbours:
-            if neighbor not in visited and not neighbor.wall:
-                visited.add(neighbor)
-                neighbor.parent = current
-                distances[neighbor] = distances[current] + 1
-                parents[neighbor] = current
-                q.append(neighbor)
-    return distances, parents
-
-def get_path_between(start_node, end_node, parent_map):
-    path = []
-    curr = end_node
-    while curr != start_node and curr is not None:
-        path.append(curr)
-        curr = parent_map.get(curr)
-    return path[::-1]
-
-def trigger_return_trip():
-    """Moves data from return_queue to active_queue to start animation"""
-    global active_queue, return_queue, is_animating, ready_for_return
-
-    if return_queue:
-        active_queue = return_queue[:]  # Copy
-        return_queue = []  # Clear
-        is_animating = True
-        ready_for_return = False  # Disable button while running
-
-def run_simulation(mode):
-    global active_queue, return_queue, is_animating, targets, visible_path_cells, current_algo_name, ready_for_return,bfs_table, distance_input, return_bfs_table
-
-    if not targets:
-        Tk().wm_withdraw()
-        messagebox.showinfo("Info", "Add some pick locations (Right Click) first.")
+# Editing State: a stroke lasts from pressing the left button on the floor until letting go
+TOOLS = ("PEN", "LINE", "RECT", "FILL", "RACKS", "COST")  # picked with the keys 1 to 6
+SHAPE_TOOLS = ("LINE", "RECT", "RACKS", "COST")  # painted when the stroke ends, previewed until then
+tool = "PEN"
+paint_cost = 3  # cost the COST tool paints over a rectangle, changed with + and -
+stroke = None  # the Stroke in progress
+MARK_LIMIT = 1000  # strokes changing more cells than this repaint the whole view
+
+class Stroke:
+    """One drag with the current tool; all its cells reach the field cache in one invalidation"""
+    def __init__(self, x, y, erase):
+        self.anchor = (x, y)
+        self.last = (x, y)  # cell under the mouse
+        self.erase = erase  # clear shelves (or with the COST tool, reset the cost to 1) instead of drawing them
+        self.previous_key = warehouse.layout_key()
+        self.changed = []  # arrays of cells changed so far
+
+    def paint(self, cells):
+        if tool == "COST":
+            changed = paint_costs(warehouse, cells, MIN_COST if self.erase else paint_cost)
+        else:
+            changed = paint_walls(warehouse, cells, not self.erase)
+        self.changed.append(changed)
+        if len(changed) > MARK_LIMIT:
+            mark_all()
+        else:
+            mark_floor(*changed.tolist())
+
+    def shape_cells(self):
+        (x0, y0), (x1, y1) = self.anchor, self.last
+        if tool == "LINE":
+            return line_cells(warehouse, x0, y0, x1, y1)
+        if tool in ("RECT", "COST"):
+            return rectangle_cells(warehouse, x0, y0, x1, y1)
+        return rack_cells(warehouse, x0, y0, x1, y1)
+
+def begin_stroke(x, y, erase):
+    global stroke
+    clear_paths()
+    stroke = Stroke(x, y, erase)
+    if tool == "PEN":
+        stroke.paint([warehouse.cell(x, y)])
+    elif tool == "FILL":
+        # Filling a block of shelves clears it, filling open floor puts shelves on all of it
+        stroke.erase = warehouse.is_wall(warehouse.cell(x, y))
+        stroke.paint(flood_cells(warehouse, x, y))
+        end_stroke()
+
+def move_stroke(x, y):
+    if (x, y) == stroke.last:
         return
-
-    # Reset State
+    if tool == "PEN":
+        # A fast drag skips cells between two mouse events, so paint the line between them
+        stroke.paint(line_cells(warehouse, *stroke.last, x, y))
+    else:
+        mark_all()  # the shape preview moved
+    stroke.last = (x, y)
+
+def end_stroke():
+    global stroke
+    if tool in SHAPE_TOOLS:
+        stroke.paint(stroke.shape_cells())
+        mark_all()
+    changed = np.concatenate(stroke.changed)
+    # Cost edits need no invalidation, the new cost key simply stops matching the old fields
+    if len(changed) and tool != "COST":
+        field_cache.walls_changed(warehouse, changed, stroke.previous_key)
+    stroke = None
+
+def tool_hint():
+    """Controls line of the current tool"""
+    if tool == "COST":
+        return f"1-6: Cost {paint_cost} Tool, +/-, Ctrl: 1"
+    return f"1-6: {tool.title()} Tool, Ctrl: Erase"
+
+def draw_stroke_preview(win):
+    """Outline of the line or rectangle the current stroke will draw on release"""
+    if stroke is None or tool not in SHAPE_TOOLS:
+        return
+    first = camera.cell_rect(*stroke.anchor).move(SIDEBAR_WIDTH, 0)
+    last = camera.cell_rect(*stroke.last).move(SIDEBAR_WIDTH, 0)
+    color = EMPTY_COLOR if stroke.erase else PICKER_COLOR
+    if tool == "LINE":
+        pygame.draw.line(win, color, first.center, last.center, 2)
+    else:
+        pygame.draw.rect(win, color, first.union(last), 2)
+
+def clear_paths():
+    """Drops the drawn paths, e.g. after editing the floor"""
+    global visible_path_cells, playback
     visible_path_cells = {}
-    active_queue = []
-    return_queue = []
-    ready_for_return = False
-    current_algo_name = "Picking: " + mode
-
-    for t in targets:
-        t.target_index = -1
+    playback = None
 
-    nodes_of_interest = [start_box] + targets
-    n_count = len(nodes_of_interest)
+def change_paint_cost(step):
+    global paint_cost
+    paint_cost = min(max(paint_cost + step, MIN_COST + 1), MAX_COST)
 
-    # Build Matrix
-    matrix = [[None for _ in range(n_count)] for _ in range(n_count)]
-    for i in range(n_count):
-        dists, parents = bfs_distance_map(nodes_of_interest[i])
-        for j in range(n_count):
-            target_node = nodes_of_interest[j]
-            if target_node in dists:
-                matrix[i][j] = {'dist': dists[target_node], 'parents': parents}
-            else:
-                matrix[i][j] = {'dist': float('inf'), 'parents': None}
-            
-    # Determine Tour
-    tour = []
-    if mode == "SEQUENCE":
-        tour = list(range(n_count))
-    elif mode == "GREEDY":
-        unvisited = set(range(1, n_count))
-        current_idx = 0
-        tour = [0]
-        while unvisited:
-            best_dist = float('inf')
-            nearest_node = -1
-            for candidate in unvisited:
-                d = matrix[current_idx][candidate]['dist']
-                if d < best_dist:
-                    best_dist = d
-                    nearest_node = candidate
-
-            if nearest_node == -1:
-                Tk().wm_withdraw()
-                messagebox.showerror("Error", "Some targets are unreachable!")
-                return
-
-            tour.append(nearest_node)
-            unvisited.remove(nearest_node)
-            current_idx = nearest_node
-
-    # --- Construct OUTBOUND (Picking) Path ---
-    bfs_table = []
-    return_bfs_table = []
+def toggle_diagonal():
+    """Switches between 4-way and 8-way moves; the planned route no longer applies"""
+    warehouse.diagonal = not warehouse.diagonal
+    clear_paths()
+    reset_table()
+    mark_all()
 
-    for k in range(len(tour) - 1):
-        u_idx = tour[k]
-        v_idx = tour[k + 1]
+def change_speed(factor):
+    global playback_speed
+    playback_speed = min(max(playback_speed * factor, MIN_SPEED), MAX_SPEED)
 
-        start_node = nodes_of_interest[u_idx]
-        end_node = nodes_of_interest[v_idx]
-        parent_map = matrix[u_idx][v_idx]['parents']
+def toggle_pause():
+    if playback is not None:
+        playback.paused = not playback.paused
 
-        # print([start_node.x, start_node.y],[end_node.x, end_node.y])
+def jump_to_end():
+    if playback is not None:
+        playback.jump_to_end()
 
-        segment = get_path_between(start_node, end_node, parent_map)
+def trigger_return_trip():
+    """Starts playing the return_queues on top of the picking paths"""
+    global playback, return_queues, is_animating, ready_for_return
 
-        current_distance = len(segment)
-        bfs_table.append([f"S{k}",f"{current_distance:.0f}", int(current_distance) * int(distance_input)])
-        
-        for cell in segment:
-            active_queue.append((cell, "PICKING"))
+    if any(return_queues):
+        # every picker walks back at once
+        playback = Playback(return_queues, current_picker_nodes, base=visible_path_cells)
+        return_queues = []  # Clear
+        is_animating = True
+        ready_for_return = False  # Disable button while running
 
-        if v_idx != 0:
-            targets[v_idx - 1].target_index = k + 1
+def run_simulation(mode):
+    capacity = int(capacity_input or 0)
+    numbered = list(warehouse.target_index)  # stop numbers on the floor before this run
+    try:
+        if mode == "PICKERS":
+            result = plan_pickers(warehouse, max(int(pickers_input or 1), 1), units=int(distance_input), cache=field_cache, capacity=capacity)
+        else:
+            result = plan_route(warehouse, mode, units=int(distance_input), cache=field_cache, capacity=capacity)
+    except RoutingError as e:
+        routing_failed(numbered, e)
+        return
+    show_result(mode, result, numbered)
+
+def compare_all():
+    """Plans every mode, walks the quickest tour and lists them all in the table, the best one highlighted"""
+    global bfs_table, bfs_table_colors, return_bfs_table
+
+    units = int(distance_input)
+    numbered = list(warehouse.target_index)
+    try:
+        results = compare_modes(warehouse, units=units, cache=field_cache, capacity=int(capacity_input or 0))
+    except RoutingError as e:
+        routing_failed(numbered, e)
+        return
+    best_mode, best = results[0]
+    show_result(best_mode, best, numbered)
 
-    sum = 0
-    sum_units = 0
-    for row in bfs_table:
-        sum += int(row[1])
-        sum_units += int(row[2])
+    bfs_table = [[COMPARE_LABELS[mode], result.total_distance, result.total_distance * units, rounded_time(result.total_time)]
+                 for mode, result in results]
+    bfs_table_colors = [BEST_ROW_COLOR if result.total_time == best.total_time else (205, 152, 255)
+                        for _, result in results]
+    return_bfs_table = [["BEST", best.total_distance, best.total_distance * units, rounded_time(best.total_time)]]
 
-    bfs_table.append(["I. SUM", sum, sum_units])
+def routing_failed(numbered, error):
+    mark_floor(*numbered)
+    Tk().wm_withdraw()
+    if warehouse.targets:
+        messagebox.showerror("Error", str(error))
+    else:
+        messagebox.showinfo("Info", str(error))
 
-    # --- Construct RETURN Path (Store in separate queue) ---
-    last_idx = tour[-1]
-    start_idx = 0
+def show_result(mode, result, numbered):
+    """Starts walking a planned route and puts its rows in the table"""
+    global playback, return_queues, current_picker_nodes, is_animating, visible_path_cells, current_algo_name, ready_for_return, bfs_table, bfs_table_colors, return_bfs_table
 
-    start_node = nodes_of_interest[last_idx]
-    end_node = nodes_of_interest[start_idx]
-    parent_map = matrix[last_idx][start_idx]['parents']
+    mark_floor(*numbered, *warehouse.target_index)
 
-    return_segment = get_path_between(start_node, end_node, parent_map)
-    for cell in return_segment:
-        return_queue.append((cell, "RETURN"))
+    # Reset State
+    visible_path_cells = {}
+    ready_for_return = False
+    current_algo_name = "Picking: " + mode
 
-    return_segment = get_path_between(start_node, end_node, parent_map)
-    return_bfs_table.append(["RTRN",f"{len(return_segment):.0f}",int(len(return_segment) * int(distance_input))])
-    return_bfs_table.append(["F. SUM",int(len(return_segment))+bfs_table[-1][1],int(len(return_segment) * int(distance_input))+bfs_table[-1][2]])
+    routes = result.routes if mode == "PICKERS" else [result]
+    # Trips back to the depot to empty the tote are animated as return legs on the way
+    queues = [[(cell, kind, p) for cell, kind in route.picking_steps] for p, route in enumerate(routes)]
+    return_queues = [[(cell, "RETURN", p) for cell in route.return_path] for p, route in enumerate(routes)]
+    current_picker_nodes = [warehouse.start] * len(routes)
+    playback = Playback(queues, current_picker_nodes)
+    bfs_table = result.table
+    bfs_table_colors = None
+    if mode == "PICKERS":
+        bfs_table_colors = [PICKER_PATH_COLORS[p % len(PICKER_PATH_COLORS)] for p in range(len(routes))]
+    return_bfs_table = result.return_table
 
     is_animating = True
 
-def draw_table(table, first_x, first_y, cell_width, cell_height, window):
+def next_policy(button):
+    global policy
+
+    policy = POLICIES[(POLICIES.index(policy) + 1) % len(POLICIES)]
+    button.text = "Run Policy: " + POLICY_LABELS[policy]
+
+def draw_grid(full, changed, picker_cells):
+    """Paints the grid area: all of it when ``full``, otherwise the floor_dirty cells and ``changed``
+
+    ``changed`` are the cells whose path or picker changed. Returns the screen rects
+    to push (a full repaint is flipped as a whole by the caller).
+    """
+    rects = []
+    window.set_clip(grid_rect)
+    if not camera.boxes:
+        # Low zoom: one texture for the whole view whenever anything on the floor changed
+        if full or floor_dirty or changed:
+            floor_dirty.clear()
+            pygame.draw.rect(window, (0, 0, 0), grid_rect)
+            draw_overview(window, picker_cells)
+            rects.append(grid_rect)
+    else:
+        # Floor layer: walls, depot and targets of the cells in view only change with
+        # edits, loads, runs and camera moves; everything else is drawn over it
+        x0, y0, x1, y1 = camera.visible()
+        if full:
+            floor_dirty.clear()
+            floor_layer.fill((0, 0, 0))
+            for x in range(x0, x1):
+                for y in range(y0, y1):
+                    Box(x, y).draw_floor(floor_layer)
+            count("cells drawn", (x1 - x0) * (y1 - y0))
+            window.blit(floor_layer, grid_rect)
+            dirty_cells = set(visible_path_cells) | picker_cells
+        else:
+            for cell in floor_dirty:
+                if camera.shows(cell):
+                    box_at(cell).draw_floor(floor_layer)
+            dirty_cells = floor_dirty | changed
+            floor_dirty.clear()
+
+        for cell in dirty_cells:
+            if not camera.shows(cell):
+                continue
+            path_type, picker = visible_path_cells.get(cell, (None, 0))
+            rect = box_at(cell).draw(window, SIDEBAR_WIDTH, path_type, cell in picker_cells, picker)
+            if not full:
+                rects.append(rect.clip(grid_rect))
+        count("cells drawn", len(dirty_cells))
+    draw_stroke_preview(window)
+    window.set_clip(None)
+    return rects
+
+def draw_table(table, first_x, first_y, cell_width, cell_height, window, colors=None):
     global return_bfs_table_y
     for ri, row in enumerate(table):
         for ci, column in enumerate (row):
-            text_surface = font.render(str(column), True, (0, 0, 0))
+            text_surface = render_text(font, str(column), (0, 0, 0))
 
             #get position
             x = (first_x + ci * cell_width) + 5
             y = first_y + ri * cell_height
 
-            if ci >= 2:
+            if ci >= len(row) - 1:
                 rect = pygame.Rect(x-1, y, cell_width+9, cell_height-2)
             else: 
                 rect = pygame.Rect(x-1, y, cell_width-3, cell_height-2)
 
-            if ci <= 0:
+            if ci <= 0 and colors:
+                pygame.draw.rect(window, colors[ri], rect)
+            elif ci <= 0:
                 pygame.draw.rect(window, (205, 152, 255), rect)
             else:
                 pygame.draw.rect(window, (101, 174, 247), rect)
@@ -348,85 +768,122 @@ def draw_table(table, first_x, first_y, cell_width, cell_height, window):
             if ri >= len(table) - 1 and ci <= 0:
                 return_bfs_table_y = y
 
+def draw_profiler(win, x, y, bottom):
+    """Profiler panel: last and average milliseconds per timer (nested ones indented), then the counters"""
+    # Right edges of the Last, Avg and n columns
+    columns = (x + 150, x + 200, x + 250)
+    for text, right in zip(("Last", "Avg", "n"), columns):
+        surf = render_text(font, text, TEXT_COLOR)
+        win.blit(surf, (right - surf.get_width(), y))
+    win.blit(render_text(font, "Timer (ms)", TEXT_COLOR), (x, y))
+    y += 20
+
+    rows = (bottom - y) // PROFILER_ROW - 1
+    counters = list(PROFILER.counters.items())[:rows // 2]
+    timers = sorted(PROFILER.timers.items())[:rows - len(counters)]
+    for path, stats in timers:
+        depth = path.count("/")
+        name = render_text(font, path.rsplit("/", 1)[-1], PROFILER_COLORS[depth % len(PROFILER_COLORS)])
+        win.blit(name, (x + 10 * depth, y), pygame.Rect(0, 0, columns[0] - 45 - x - 10 * depth, PROFILER_ROW))
+        for value, right in zip((f"{1000 * stats.last:.2f}", f"{1000 * stats.average:.2f}", str(stats.count)), columns):
+            surf = render_text(font, value, TEXT_COLOR)
+            win.blit(surf, (right - surf.get_width(), y))
+        y += PROFILER_ROW
+
+    if counters:
+        y += 4
+        win.blit(render_text(number_font, "Counters:", TEXT_COLOR), (x, y))
+        y += PROFILER_ROW + 2
+        for name, value in counters:
+            win.blit(render_text(font, name, PROFILER_COLORS[0]), (x, y))
+            surf = render_text(font, f"{value:,}", TEXT_COLOR)
+            win.blit(surf, (columns[-1] - surf.get_width(), y))
+            y += PROFILER_ROW
+
+def toggle_profiler():
+    global show_profiler
+    show_profiler = not show_profiler
+
+def export_profile(write, name):
+    """Asks where to save the profile (``name`` is the suggestion), writes it with ``write`` and says where it went"""
+    root = Tk()
+    root.wm_withdraw()
+    path = filedialog.asksaveasfilename(parent=root, title="Save Profile", initialfile=name,
+                                        defaultextension=os.path.splitext(name)[1])
+    if path:
+        try:
+            write(path)
+            messagebox.showinfo("Profile Saved", f"Profile written to {os.path.abspath(path)}", parent=root)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the profile: {e}", parent=root)
+    root.destroy()
+
+def button_state(button, mouse):
+    """What a button looks like right now, to tell when it has to be drawn again"""
+    return (button.text, button.enabled, button.rect.collidepoint(mouse))
+
 def reset_table():
-    global bfs_table, return_bfs_table, walls, target_locations, start_box_loc
+    global bfs_table, bfs_table_colors, return_bfs_table
 
     bfs_table = []
+    bfs_table_colors = None
     return_bfs_table = []
-    walls = []
-    target_locations = []
-    start_box_loc = []
-
-#EMERGENCY VARIABLE -- to see if loaded and nothing changed -- should save again
-savedCSV = []
 
 def save_layout(name):
-    global walls, targets, target_locations, start_box_loc
-
-    with open(name,'w',newline='') as file:
-        writer = csv.writer(file)
-
-        writer.writerows(walls)
-        writer.writerows(target_locations)
-        if len(start_box_loc) >= 1:
-            writer.writerow(start_box_loc)
-        else:
-            writer.writerow(["spawn",0,0])
+    write_layout(warehouse, name)
     
 def load_layout(file):
-    global visible_path_cells, start_box, start_box_loc,target_locations,walls
     full_reset()
+    read_layout(file, warehouse)
+    fit_view()
+
+def main(argv=None):
+    global visible_path_cells, current_picker_nodes, redraw_all, tool, show_profiler, is_animating, current_algo_name, ready_for_return, distance_input, distance_active, pickers_input, pickers_active, capacity_input, capacity_active
 
-    with open(file, mode = 'r') as file:
-        layoutSheet = csv.reader(file)
-        print(layoutSheet)
-
-        for row in layoutSheet:
-            selected_box = grid[int(row[1])][int(row[2])]
-            if row[0] == "wall":
-                walls.append(["wall",int(row[1]),int(row[2])])
-                selected_box.wall = True
-                visible_path_cells = {}
-            #then targets
-            elif row[0] == "target":
-                if selected_box not in targets:
-                    if (["target",int(row[1]),int(row[2])]) not in target_locations:
-                        target_locations.append(["target",int(row[1]),int(row[2])])
-                    selected_box.target = True
-                    targets.append(selected_box)
-                else:
-                    target_locations = [tl for tl in target_locations if tl != ["target",int(row[1]),int(row[2])]]
-                    selected_box.target = False
-                    selected_box.target_index = -1
-                    targets.remove(selected_box)
-                visible_path_cells = {}
-            #then spawn setups
-            elif row[0] == "spawn":
-                if start_box:
-                    start_box_loc = ["spawn",int(row[1]),int(row[2])]
-                    start_box.start = False
-                    start_box = selected_box
-                    start_box.start = True
-                    start_box.wall = False
-                    visible_path_cells = {}
-
-def main():
-    global start_box, visible_path_cells, targets, is_animating, current_picker_node, current_algo_name, ready_for_return, distance_input, distance_active, bfs_table, walls, target_locations, start_box_loc
+    parser = argparse.ArgumentParser(description="WarePath layout editor")
+    parser.add_argument("layout", nargs="?", help="layout to open (CSV or .wpl), it sets the floor size")
+    parser.add_argument("--size", help="empty floor of COLUMNSxROWS cells, e.g. 400x1200")
+    args = parser.parse_args(argv)
 
+    init_display()
+    if args.size:
+        columns, rows = (int(n) for n in args.size.lower().split("x"))
+        warehouse.resize(columns, rows)
     create_grid()
+    if args.layout:
+        load_layout(args.layout)
 
     # Buttons
-    btn_dijkstra = Button(25, 100, 230, 45, "Run Breadth First Search", lambda: run_simulation("SEQUENCE"))
-    btn_greedy = Button(25, 155, 230, 45, "Run Greedy Nearest Neighbour", lambda: run_simulation("GREEDY"))
+    btn_dijkstra = Button(25, 100, 230, 40, "Run Breadth First Search", lambda: run_simulation("SEQUENCE"))
+    btn_greedy = Button(25, 147, 230, 40, "Run Greedy Nearest Neighbour", lambda: run_simulation("GREEDY"))
+    btn_optimized = Button(25, 194, 230, 40, "Run Optimized (2-opt)", lambda: run_simulation("OPTIMIZED"))
+    btn_exact = Button(25, 241, 230, 40, "Run Exact (Held-Karp)", lambda: run_simulation("EXACT"))
+    btn_policy = Button(25, 288, 180, 40, "Run Policy: " + POLICY_LABELS[policy], lambda: run_simulation(policy))
+    btn_next_policy = Button(210, 288, 45, 40, ">", lambda: next_policy(btn_policy))
+    btn_pickers = Button(25, 335, 230, 40, "Run Multi-Picker", lambda: run_simulation("PICKERS"))
 
     # Return Button (Initially Disabled)
-    btn_return = Button(25, 210, 230, 45, "Return to Depot", trigger_return_trip, enabled=False)
+    btn_return = Button(25, 382, 230, 40, "Return to Depot", trigger_return_trip, enabled=False)
 
     # Reset Button
-    btn_reset = Button(25, 265, 230, 45, "Reset Warehouse", full_reset)
+    btn_reset = Button(25, 429, 230, 40, "Reset Warehouse", full_reset)
+
+    # Playback controls
+    btn_pause = Button(25, 485, 110, 35, "Pause", toggle_pause, enabled=False)
+    btn_end = Button(145, 485, 110, 35, "Skip to End", jump_to_end, enabled=False)
+    btn_slower = Button(25, 528, 110, 35, "Slower", lambda: change_speed(0.5))
+    btn_faster = Button(145, 528, 110, 35, "Faster", lambda: change_speed(2))
+    progress_rect = pygame.Rect(25, 572, 230, 10)  # click or drag to scrub
 
     # Reset Table
-    btn_table_reset = Button(1055, 110, 230, 45, "Reset Table", reset_table)
+    btn_table_reset = Button(1055, 110, 78, 45, "Reset Table", reset_table)
+    btn_compare = Button(1138, 110, 78, 45, "Compare", compare_all)
+
+    # Profiler panel
+    btn_profiler = Button(1215, 160, 65, 24, "Profiler", toggle_profiler)
+    btn_export_jsonl = Button(1055, 565, 80, 26, "JSON Lines", lambda: export_profile(PROFILER.write_json_lines, PROFILE_FILES[0]))
+    btn_export_trace = Button(1140, 565, 80, 26, "Trace", lambda: export_profile(PROFILER.write_chrome_trace, PROFILE_FILES[1]))
+    btn_profiler_reset = Button(1225, 565, 55, 26, "Clear", PROFILER.reset)
 
     files = ("layout1.csv","layout2.csv","layout3.csv")
 
@@ -438,19 +895,38 @@ def main():
     btn_load_layout2 = Button(1180, 622 + (40 * 1), 50,30,"Load", lambda: load_layout(files[1]))
     btn_load_layout3 = Button(1180, 622 + (40 * 2), 50,30,"Load", lambda: load_layout(files[2]))
 
+    left_buttons = [btn_dijkstra, btn_greedy, btn_optimized, btn_exact, btn_policy, btn_next_policy, btn_pickers,
+                    btn_return, btn_reset, btn_pause, btn_end, btn_slower, btn_faster]
+    right_buttons = [btn_table_reset, btn_compare, btn_profiler, btn_save_layout1, btn_save_layout2, btn_save_layout3,
+                     btn_load_layout1, btn_load_layout2, btn_load_layout3]
+    profiler_buttons = [btn_export_jsonl, btn_export_trace, btn_profiler_reset]
+    left_rect = pygame.Rect(0, 0, SIDEBAR_WIDTH, WINDOW_HEIGHT)
+    right_rect = pygame.Rect(SIDEBAR_WIDTH + GRID_WIDTH, 0, MATHBAR_WIDTH, WINDOW_HEIGHT)
+    drawn_left = None  # sidebar states on screen
+    drawn_right = None
+    drawn_paths = {}  # the visible_path_cells dict on screen
+    drawn_pickers = set()
+
     clock = pygame.time.Clock()
 
     while True:
-        clock.tick(60)
+        seconds = clock.tick(60) / 1000
+
+        btn_pause.enabled = is_animating
+        btn_pause.text = "Play" if playback is not None and playback.paused else "Pause"
+        btn_end.enabled = is_animating
+        btn_profiler.text = "Table" if show_profiler else "Profiler"
+        for button in profiler_buttons:
+            button.enabled = show_profiler
 
         # Update Return Button State
         # It is enabled ONLY if we are NOT animating AND we have a return path waiting
-        btn_return.enabled = (not is_animating) and (len(return_queue) > 0)
+        btn_return.enabled = (not is_animating) and any(return_queues)
 
         # If the return queue is waiting, update the status text
         if btn_return.enabled:
             current_algo_name = "Pick Complete. Return?"
-        elif len(return_queue) == 0 and not is_animating and visible_path_cells:
+        elif not any(return_queues) and not is_animating and visible_path_cells:
             current_algo_name = "Cycle Complete"
 
         for event in pygame.event.get():
@@ -460,9 +936,22 @@ def main():
 
             btn_dijkstra.handle_event(event)
             btn_greedy.handle_event(event)
+            btn_optimized.handle_event(event)
+            btn_exact.handle_event(event)
+            btn_policy.handle_event(event)
+            btn_next_policy.handle_event(event)
+            btn_pickers.handle_event(event)
             btn_return.handle_event(event)
             btn_reset.handle_event(event)
+            btn_pause.handle_event(event)
+            btn_end.handle_event(event)
+            btn_slower.handle_event(event)
+            btn_faster.handle_event(event)
             btn_table_reset.handle_event(event)
+            btn_compare.handle_event(event)
+            btn_profiler.handle_event(event)
+            for button in profiler_buttons:
+                button.handle_event(event)
 
             btn_load_layout1.handle_event(event)
             btn_load_layout2.handle_event(event)
@@ -472,14 +961,57 @@ def main():
             btn_save_layout2.handle_event(event)
             btn_save_layout3.handle_event(event)
 
-            #for text updates
-            distance_field = font.render(distance_input, True,(230, 20, 5))
-
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if distance_input_rect.collidepoint(event.pos):
-                    distance_active = True
-                else:
-                    distance_active = False
+                distance_active = distance_input_rect.collidepoint(event.pos)
+                pickers_active = pickers_input_rect.collidepoint(event.pos)
+                capacity_active = capacity_input_rect.collidepoint(event.pos)
+
+            # Scrub by clicking or dragging along the progress bar
+            if playback is not None and pygame.mouse.get_pressed()[0] and event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+                if progress_rect.collidepoint(pygame.mouse.get_pos()):
+                    fraction = (pygame.mouse.get_pos()[0] - progress_rect.x) / progress_rect.width
+                    playback.seek(fraction * playback.length)
+
+            # Camera: wheel zooms around the mouse, Shift + drag pans, Home shows the whole floor
+            if event.type == pygame.MOUSEWHEEL and grid_rect.collidepoint(pygame.mouse.get_pos()):
+                camera.zoom(ZOOM_STEP ** event.y, *pygame.mouse.get_pos())
+                mark_all()
+            if event.type == pygame.MOUSEMOTION and event.buttons[0] and pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                if grid_rect.collidepoint(event.pos):
+                    camera.pan(*event.rel)
+                    mark_all()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+                fit_view()
+
+            # Tools: 1 to 6 pick one, + and - set the cost level, P shows the profiler, D switches 4-way and 8-way moves,
+            # the stroke ends when the left button is let go
+            if event.type == pygame.KEYDOWN and not (distance_active or pickers_active or capacity_active):
+                if pygame.K_1 <= event.key < pygame.K_1 + len(TOOLS):
+                    tool = TOOLS[event.key - pygame.K_1]
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    change_paint_cost(1)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    change_paint_cost(-1)
+                elif event.key == pygame.K_p:
+                    toggle_profiler()
+                elif event.key == pygame.K_d:
+                    toggle_diagonal()
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 1 and stroke is not None:
+                end_stroke()
+
+            if event.type == pygame.KEYDOWN and not (distance_active or pickers_active or capacity_active) and playback is not None:
+                if event.key == pygame.K_SPACE:
+                    toggle_pause()
+                elif event.key == pygame.K_END:
+                    jump_to_end()
+                elif event.key == pygame.K_LEFT:
+                    playback.skip(-playback_speed / 2)  # half a second back
+                elif event.key == pygame.K_RIGHT:
+                    playback.skip(playback_speed / 2)
+                elif event.key == pygame.K_UP:
+                    change_speed(2)
+                elif event.key == pygame.K_DOWN:
+                    change_speed(0.5)
 
             if event.type == pygame.KEYDOWN:
                 if distance_active == True:
@@ -488,169 +1020,220 @@ def main():
                     else:
                         if len(distance_input) <= 4:
                             distance_input += event.unicode
+                elif pickers_active:
+                    if event.key == pygame.K_BACKSPACE:
+                        pickers_input = pickers_input[:-1]
+                    elif event.unicode.isdigit() and len(pickers_input) < 2:
+                        pickers_input += event.unicode
+                elif capacity_active:
+                    if event.key == pygame.K_BACKSPACE:
+                        capacity_input = capacity_input[:-1]
+                    elif event.unicode.isdigit() and len(capacity_input) < 3:
+                        capacity_input += event.unicode
 
-            if not is_animating and any(pygame.mouse.get_pressed()):
+            if not is_animating and any(pygame.mouse.get_pressed()) and not pygame.key.get_mods() & pygame.KMOD_SHIFT:
                 mx, my = pygame.mouse.get_pos()
-                if mx > SIDEBAR_WIDTH:
-                    grid_x = (mx - SIDEBAR_WIDTH) // BOX_WIDTH
-                    grid_y = my // BOX_HEIGHT
+                if grid_rect.collidepoint(mx, my):
+                    grid_x, grid_y = camera.cell_at(mx, my)
 
-                    if 0 <= grid_x < COLUMNS and 0 <= grid_y < ROWS:
-                        clicked_box = grid[grid_x][grid_y]
+                    if warehouse.in_bounds(grid_x, grid_y):
                         keys = pygame.key.get_pressed()
 
-                        # Reset data if user edits grid
-                        if any(pygame.mouse.get_pressed()):
-                            pass
-
                         if pygame.mouse.get_pressed()[1] or (pygame.mouse.get_pressed()[0] and keys[pygame.K_s]):
-                            if clicked_box not in targets and not clicked_box.wall:
-                                if start_box: start_box.start = False
-                                start_box = clicked_box
-                                start_box.start = True
-                                start_box.wall = False
-                                start_box_loc = ["spawn",grid_x,grid_y]
-                                visible_path_cells = {}
+                            old_start = warehouse.start
+                            if warehouse.set_spawn(grid_x, grid_y):
+                                mark_floor(old_start, warehouse.start)
+                                clear_paths()
                         elif pygame.mouse.get_pressed()[2]:
-                            if clicked_box != start_box and not clicked_box.wall:
-                                if clicked_box not in targets:
-                                    clicked_box.target = True
-                                    targets.append(clicked_box)
-                                    if (["target",grid_x,grid_y]) not in target_locations:
-                                        target_locations.append(["target",grid_x,grid_y])
-                                else:
-                                    clicked_box.target = False
-                                    clicked_box.target_index = -1
-                                    targets.remove(clicked_box)
-                                    target_locations = [tl for tl in target_locations if tl != ["target",grid_x,grid_y]]
-                                visible_path_cells = {}
+                            if warehouse.toggle_target(grid_x, grid_y):
+                                mark_floor(warehouse.cell(grid_x, grid_y))
+                                clear_paths()
                         elif pygame.mouse.get_pressed()[0]:
-                            if clicked_box != start_box and clicked_box not in targets:
-                                clicked_box.wall = True
-                                if (["wall",grid_x,grid_y]) not in walls:
-                                    walls.append(["wall",grid_x,grid_y])
-                                visible_path_cells = {}
+                            if stroke is None and event.type == pygame.MOUSEBUTTONDOWN:
+                                begin_stroke(grid_x, grid_y, bool(pygame.key.get_mods() & pygame.KMOD_CTRL))
+                            elif stroke is not None:
+                                move_stroke(grid_x, grid_y)
 
         # --- ANIMATION UPDATE ---
-        if is_animating:
-            if len(active_queue) > 0:
-                for _ in range(2):
-                    if len(active_queue) > 0:
-                        next_box, type_flag = active_queue.pop(0)
-                        visible_path_cells[next_box] = type_flag
-                        current_picker_node = next_box
-            else:
-                is_animating = False
+        # Advance by elapsed time, not by frames, so the speed holds at any frame rate
+        if playback is not None:
+            with timed("playback"):
+                playback.update(seconds, playback_speed)
+            visible_path_cells = playback.cells
+            current_picker_nodes = playback.pickers
+            is_animating = not playback.finished
 
         # --- DRAWING ---
-        window.fill(UI_BG)
-
-        title = header_font.render("WAREHOUSE LOGISTICS", True, TEXT_COLOR)
-        window.blit(title, (25, 25))
-
-        # Status Text logic
-        status_col = (200, 200, 200)
-        if "Greedy" in current_algo_name:
-            status_col = (0, 255, 0)
-        elif "Pick Complete" in current_algo_name:
-            status_col = (255, 255, 0)
-
-        status = font.render(current_algo_name, True, status_col)
-        window.blit(status, (25, 55))
-
-        y_off = WINDOW_HEIGHT-120
-        controls = [
-            ("Left Click: Draw Shelves", WALL_COLOR),
-            ("Right Click: Add Order Item", TARGET_COLOR),
-            ("Middle / 'S': Set Depot", START_COLOR),
-            ("Blue Line: Picking Path", PICKING_PATH_COLOR),
-            ("Green Line: Return to Depot", RETURN_PATH_COLOR)
-        ]
-
-        window.blit(header_font.render("CONTROLS", True, TEXT_COLOR), (25, y_off - 30))
-        for text, col in controls:
-            s = font.render(text, True, col)
-            window.blit(s, (25, y_off))
-            y_off += 20
-
-        btn_dijkstra.draw(window)
-        btn_greedy.draw(window)
-        btn_return.draw(window)
-        btn_reset.draw(window)
-        btn_table_reset.draw(window)
-        
-        btn_load_layout1.draw(window)
-        btn_load_layout2.draw(window)
-        btn_load_layout3.draw(window)
-
-        btn_save_layout1.draw(window)
-        btn_save_layout2.draw(window)
-        btn_save_layout3.draw(window)
-
-        pygame.draw.rect(window, (0, 0, 0), (SIDEBAR_WIDTH, 0, GRID_WIDTH, WINDOW_HEIGHT))
-
-        pygame.draw.rect(window,(0,0,0),(MATHBAR_WIDTH,0,GRID_WIDTH,WINDOW_HEIGHT))
-
-        config_title = header_font.render("CONFIGS", True, TEXT_COLOR)
-        window.blit(config_title,(1055,25))
-
-        distance_prompt = number_font.render("Distance:", True, TEXT_COLOR)
-        window.blit(distance_prompt,(1055,60))
-
-        if distance_active: 
-            color = (111, 132, 179)
-        else:
-            color = UI_BG
-
-        pygame.draw.rect(window,color,distance_input_rect)
-        window.blit(distance_field,(distance_input_rect.x+2,distance_input_rect.y+2))
-
-        units_prompt = font.render("Units per Square", True, TEXT_COLOR)
-        window.blit(units_prompt,(distance_input_rect.x+distance_input_rect.width+4,distance_input_rect.y+2))
-
-        #print table here
-        table_title = number_font.render("Table:", True, TEXT_COLOR)
-        window.blit(table_title,(1055,165))
-
-        table_headers = ["Points","Distance","Units"]
-        for i, x in enumerate(table_headers):
-            text_to_render = font.render(x, True, TEXT_COLOR)
-            window.blit(text_to_render,(1055 + (70 * i) + 4, 190))
-
-        draw_table(bfs_table,1055,210,70,21,window)
-        draw_table(return_bfs_table,1055,return_bfs_table_y+26,70,21,window)
-
-        #print save layout here
-        layout_title = number_font.render("Save & Load Layouts:", True, TEXT_COLOR)
-        window.blit(layout_title,(1055, 600))
-
-        #--- Load Layout ---
-        layout_names = ("Layout 1", "Layout 2", "Layout 3")
-        for i, x in enumerate(layout_names):
-            text_to_r = font.render(x, True, TEXT_COLOR)
-            window.blit(text_to_r,(1055,630 + (40 * i)))
-
-        #Names & Project Title
-        names = font.render("WarePath v1.0",True, TEXT_COLOR)
-        window.blit(names,(1055,745))
-        extra = font.render("Dev by Manu Lantin, RJ Paderayon",True, TEXT_COLOR)
-        window.blit(extra,(1055,765))
-
-        for i in range(COLUMNS):
-            for j in range(ROWS):
-                box = grid[i][j]
-
-                path_type = visible_path_cells.get(box)
-                # Keep picker visible if animating OR if it's the end of the line
-                is_picker = False
-                if is_animating and box == current_picker_node:
-                    is_picker = True
-                elif not is_animating and current_picker_node == box and visible_path_cells:
-                    # Keep showing picker at the last spot when stopped
-                    is_picker = True
-
-                box.draw(window, SIDEBAR_WIDTH, path_type, is_picker)
-
-        pygame.display.flip()
-
-main()
\ No newline at end of file
+        # Sidebars are repainted only when something on them changed, grid cells only
+        # when their floor, path or picker changed, and only those rects go to the screen
+        with timed("frame"):
+            dirty_rects = []
+            mouse = pygame.mouse.get_pos()
+            progress = -1 if playback is None else int(progress_rect.width * playback.progress)
+
+            left_state = (current_algo_name, [button_state(b, mouse) for b in left_buttons], progress, playback_speed, tool, paint_cost,
+                          warehouse.diagonal)
+            if redraw_all or left_state != drawn_left:
+                drawn_left = left_state
+                with timed("left sidebar"):
+                    pygame.draw.rect(window, UI_BG, left_rect)
+
+                    title = render_text(header_font, "WAREHOUSE LOGISTICS", TEXT_COLOR)
+                    window.blit(title, (25, 25))
+
+                    # Status Text logic
+                    status_col = (200, 200, 200)
+                    if "Greedy" in current_algo_name:
+                        status_col = (0, 255, 0)
+                    elif "Pick Complete" in current_algo_name:
+                        status_col = (255, 255, 0)
+
+                    status = render_text(font, current_algo_name, status_col)
+                    window.blit(status, (25, 55))
+
+                    y_off = WINDOW_HEIGHT-157
+                    controls = [
+                        ("Left Click: Draw Shelves", WALL_COLOR),
+                        (tool_hint(), COST_COLOR if tool == "COST" else WALL_COLOR),
+                        ("Right Click: Add Order Item", TARGET_COLOR),
+                        ("Middle / 'S': Set Depot", START_COLOR),
+                        ("Blue Line: Picking Path", PICKING_PATH_COLOR),
+                        ("Green Line: Return to Depot", RETURN_PATH_COLOR),
+                        ("Space / Arrows / End: Playback", TEXT_COLOR),
+                        ("Wheel / Shift+Drag / Home: View", TEXT_COLOR)
+                    ]
+
+                    window.blit(render_text(header_font, "CONTROLS", TEXT_COLOR), (25, y_off - 30))
+                    for text, col in controls:
+                        s = render_text(font, text, col)
+                        window.blit(s, (25, y_off))
+                        y_off += 20
+
+                    for button in left_buttons:
+                        button.draw(window)
+
+                    pygame.draw.rect(window, BUTTON_DISABLED, progress_rect)
+                    if playback is not None:
+                        done = progress_rect.copy()
+                        done.width = progress
+                        pygame.draw.rect(window, PICKING_PATH_COLOR, done)
+                    speed_text = render_text(font, f"Speed: {playback_speed:g} cells/s", TEXT_COLOR)
+                    window.blit(speed_text, (25, 588))
+                    moves_text = render_text(font, f"D: {'8' if warehouse.diagonal else '4'}-Way Moves", TEXT_COLOR)
+                    window.blit(moves_text, (progress_rect.right - moves_text.get_width(), 588))
+                    dirty_rects.append(left_rect)
+
+            right_state = (distance_input, distance_active, pickers_input, pickers_active, capacity_input, capacity_active,
+                           bfs_table, bfs_table_colors, return_bfs_table, [button_state(b, mouse) for b in right_buttons],
+                           show_profiler and ([button_state(b, mouse) for b in profiler_buttons],
+                                              int(time.perf_counter() * PROFILER_HZ)))
+            if redraw_all or right_state != drawn_right:
+                drawn_right = right_state
+                with timed("right sidebar"):
+                    pygame.draw.rect(window, UI_BG, right_rect)
+
+                    config_title = render_text(header_font, "CONFIGS", TEXT_COLOR)
+                    window.blit(config_title,(1055,25))
+
+                    distance_prompt = render_text(number_font, "Distance:", TEXT_COLOR)
+                    window.blit(distance_prompt,(1055,60))
+
+                    if distance_active: 
+                        color = (111, 132, 179)
+                    else:
+                        color = UI_BG
+
+                    pygame.draw.rect(window,color,distance_input_rect)
+                    distance_field = render_text(font, distance_input, (230, 20, 5))
+                    window.blit(distance_field,(distance_input_rect.x+2,distance_input_rect.y+2))
+
+                    units_prompt = render_text(font, "Units per Square", TEXT_COLOR)
+                    window.blit(units_prompt,(distance_input_rect.x+distance_input_rect.width+4,distance_input_rect.y+2))
+
+                    pickers_prompt = render_text(number_font, "Pickers:", TEXT_COLOR)
+                    window.blit(pickers_prompt,(pickers_input_rect.x,60))
+                    pygame.draw.rect(window,(111, 132, 179) if pickers_active else UI_BG,pickers_input_rect)
+                    pickers_field = render_text(font, pickers_input, (230, 20, 5))
+                    window.blit(pickers_field,(pickers_input_rect.x+2,pickers_input_rect.y+2))
+
+                    capacity_prompt = render_text(number_font, "Tote:", TEXT_COLOR)
+                    window.blit(capacity_prompt,(capacity_input_rect.x,112))
+                    pygame.draw.rect(window,(111, 132, 179) if capacity_active else UI_BG,capacity_input_rect)
+                    capacity_field = render_text(font, capacity_input, (230, 20, 5))
+                    window.blit(capacity_field,(capacity_input_rect.x+2,capacity_input_rect.y+2))
+
+                    for button in right_buttons:
+                        button.draw(window)
+
+                    if show_profiler:
+                        window.blit(render_text(number_font, "Profiler:", TEXT_COLOR), (1055, 165))
+                        draw_profiler(window, 1055, 190, 560)
+                        for button in profiler_buttons:
+                            button.draw(window)
+                    else:
+                        #print table here
+                        table_title = render_text(number_font, "Table:", TEXT_COLOR)
+                        window.blit(table_title,(1055,165))
+
+                        table_headers = ["Points","Distance","Units","Time"]
+                        for i, x in enumerate(table_headers):
+                            text_to_render = render_text(font, x, TEXT_COLOR)
+                            window.blit(text_to_render,(1055 + (TABLE_CELL * i) + 4, 190))
+
+                        draw_table(bfs_table,1055,210,TABLE_CELL,21,window,bfs_table_colors)
+                        draw_table(return_bfs_table,1055,return_bfs_table_y+26,TABLE_CELL,21,window)
+
+                    #print save layout here
+                    layout_title = render_text(number_font, "Save & Load Layouts:", TEXT_COLOR)
+                    window.blit(layout_title,(1055, 600))
+
+                    #--- Load Layout ---
+                    layout_names = ("Layout 1", "Layout 2", "Layout 3")
+                    for i, x in enumerate(layout_names):
+                        text_to_r = render_text(font, x, TEXT_COLOR)
+                        window.blit(text_to_r,(1055,630 + (40 * i)))
+
+                    #Names & Project Title
+                    names = render_text(font, "WarePath v1.0", TEXT_COLOR)
+                    window.blit(names,(1055,745))
+                    extra = render_text(font, "Dev by Manu Lantin, RJ Paderayon", TEXT_COLOR)
+                    window.blit(extra,(1055,765))
+                    dirty_rects.append(right_rect)
+
+            # Path cells: a new dict means new paths (or a scrub back), otherwise only the new steps
+            target_cells.clear()
+            target_cells.update(warehouse.targets)
+            if visible_path_cells is not drawn_paths:
+                path_cells = set(drawn_paths) | set(visible_path_cells)
+                path_paint[:] = 0
+                for cell, (path_type, picker) in visible_path_cells.items():
+                    path_paint[cell] = path_paint_code(path_type, picker)
+                drawn_paths = visible_path_cells
+            elif playback is not None:
+                path_cells = set(playback.changed)
+                for cell in path_cells:
+                    path_paint[cell] = path_paint_code(*visible_path_cells[cell])
+            else:
+                path_cells = set()
+            if playback is not None:
+                playback.changed.clear()
+
+            # Keep pickers visible while animating and at the last spot when stopped
+            picker_cells = set(current_picker_nodes) if visible_path_cells else set()
+            moved_pickers = picker_cells ^ drawn_pickers
+            drawn_pickers = picker_cells
+
+            with timed("grid"):
+                dirty_rects += draw_grid(redraw_all, path_cells | moved_pickers, picker_cells)
+
+            with timed("present"):
+                if redraw_all:
+                    redraw_all = False
+                    pygame.display.flip()
+                    count("frames drawn")
+                elif dirty_rects:
+                    pygame.display.update(dirty_rects)
+                    count("frames drawn")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""WarePath routing core: floor model, layout I/O and tour planning, no display needed."""
+
+from .profiling import PROFILER, Profiler, TimerStats, count, timed
+from .grid import (COLUMNS, ROWS, FREE, WALL, MIN_COST, MAX_COST, TIME_SCALE, STRAIGHT, DIAGONAL, Warehouse, cost_key,
+                   wall_hash, wall_key)
+from .layout import (LayoutError, convert_layout, load_binary_layout, load_csv_layout, load_layout, save_binary_layout,
+                     save_csv_layout, save_layout)
+from .search import (NO_PARENT, UNREACHED, astar, bfs, column_jump_tables, dial, jps, jps_diagonal, jump_tables, manhattan,
+                     new_field, octile, path_time, walk_back)
+from .wavefront import distance_fields, predecessors
+from .corridors import CorridorGraph
+from .matrix import ENGINES, OCTILE_ENGINES, STEP_ENGINES, RouteMatrix, build_fields, build_matrix, choose_engine
+from .policies import POLICIES, AisleMap, PolicyRoute, plan_policy
+from .tours import (candidate_lists, held_karp, improve_tour, join_trips, nearest_neighbour, solve_tour, split_trips,
+                    tour_length)
+from .pickers import balance_routes, makespan, plan_pickers, split_tour
+from .routing import (MODES, TOUR_MODES, PickerResult, RoutingError, SimulationResult, bfs_distance_map,
+                      compare_modes, get_path_between, rounded_time, run_pickers, run_simulation)
+from .cache import FieldCache
+from .dynamic import repair_field
+from .editing import flood_cells, line_cells, paint_costs, paint_walls, rack_cells, rectangle_cells
+from .batching import BATCH_METHODS, batch_length, batch_orders, batch_picks, savings_batches, seed_batches
+from .wave import BatchingResult, OrderPlan, WavePlanner
@@ -0,0 +1,121 @@
+"""Grouping small orders into batches that one picker collects in a single tour.
+
+Orders are lists of matrix indices (the depot is index 0 and never part of an
+order). A batch is a list of order positions whose picks fit in one tote of
+``capacity`` items. Two ways of forming batches are offered:
+
+* ``savings``: every order starts as its own batch and the pair of batches whose
+  merged tour saves the most distance is merged, again and again (Clarke and
+  Wright, with savings recomputed against every merged batch).
+* ``seed``: a batch is started from the order with the farthest pick, then the
+  order closest to the picks already in the batch is added until the tote is full.
+
+An order larger than the tote stays in a batch of its own.
+"""
+
+import heapq
+
+import numpy as np
+
+from .tours import solve_tour, tour_length
+
+BATCH_METHODS = ("savings", "seed")
+
+
+def batch_orders(dist, orders, capacity, method="savings", mode="GREEDY"):
+    """Batches as lists of order positions, using ``mode`` tours to price the savings"""
+    if capacity < 1:
+        raise ValueError("Tote capacity must be at least one item")
+    if method == "savings":
+        return savings_batches(dist, orders, capacity, mode)
+    if method == "seed":
+        return seed_batches(dist, orders, capacity)
+    raise ValueError(f"Unknown batching method {method!r}, expected one of {', '.join(BATCH_METHODS)}")
+
+
+def batch_picks(orders, batch):
+    """Distinct picks of the orders in ``batch``, in order of first appearance"""
+    picks = []
+    for o in batch:
+        for node in orders[o]:
+            if node not in picks:
+                picks.append(node)
+    return picks
+
+
+def batch_length(dist, picks, mode="GREEDY", time_budget=0.0):
+    """Closed tour length from the depot over ``picks``"""
+    if not picks:
+        return 0
+    members = [0] + list(picks)
+    sub = dist[np.ix_(members, members)]
+    tour, _ = solve_tour(sub, mode, time_budget)
+    return tour_length(sub, tour)
+
+
+def savings_batches(dist, orders, capacity, mode="GREEDY"):
+    batches = {i: [i] for i in range(len(orders))}
+    sizes = {i: len(orders[i]) for i in batches}
+    lengths = {i: batch_length(dist, orders[i], mode) for i in batches}
+
+    heap = []
+
+    def push_pair(a, b):
+        if sizes[a] + sizes[b] > capacity:
+            return
+        merged = batch_length(dist, batch_picks(orders, batches[a] + batches[b]), mode)
+        saving = lengths[a] + lengths[b] - merged
+        if saving > 0:
+            heapq.heappush(heap, (-saving, min(a, b), max(a, b), merged))
+
+    for a in batches:
+        for b in range(a + 1, len(orders)):
+            push_pair(a, b)
+
+    next_id = len(orders)
+    while heap:
+        _, a, b, merged = heapq.heappop(heap)
+        if a not in batches or b not in batches:
+            continue  # one side was merged into something else already
+        batches[next_id] = batches.pop(a) + batches.pop(b)
+        sizes[next_id] = sizes.pop(a) + sizes.pop(b)
+        lengths[next_id] = merged
+        del lengths[a], lengths[b]
+        for other in batches:
+            if other != next_id:
+                push_pair(next_id, other)
+        next_id += 1
+
+    return sorted(sorted(batch) for batch in batches.values())
+
+
+def seed_batches(dist, orders, capacity):
+    d = np.asarray(dist)
+    left = list(range(len(orders)))
+    batches = []
+    while left:
+        # Seed: the order with the pick farthest from the depot
+        seed = max(left, key=lambda o: max((int(d[0, node]) for node in orders[o]), default=0))
+        left.remove(seed)
+        batch = [seed]
+        size = len(orders[seed])
+        picks = list(orders[seed])
+
+        while True:
+            fitting = [o for o in left if size + len(orders[o]) <= capacity]
+            if not fitting:
+                break
+            # Closest order: the shortest walk between one of its picks and one already in the batch
+            near = min(fitting, key=lambda o: _gap(d, picks, orders[o]))
+            left.remove(near)
+            batch.append(near)
+            size += len(orders[near])
+            picks.extend(orders[near])
+        batches.append(sorted(batch))
+    return sorted(batches)
+
+
+def _gap(d, picks, order):
+    if not picks or not order:
+        return 0
+    return int(d[np.ix_(picks, order)].min())
@@ -0,0 +1,190 @@
+"""Headless benchmarks: how long each stage takes and how much memory it peaks at.
+
+A run goes over a set of cases. These are the layout files of the repo and
+generated rack floors from 38 x 38 up to 1000 x 1000. Each case times the stages
+from loading the file to drawing it:
+
+* ``load_csv`` / ``load_wpl``: reading the layout as CSV and as binary
+* ``bfs``: one breadth first search from the depot over the whole floor
+* ``matrix``: the distance matrix between the depot and the picks (engine ``auto``)
+* ``tour_greedy`` / ``tour_optimized``: building a tour on that matrix
+* ``route``: ``run_simulation`` end to end, GREEDY, without a field cache
+* ``render_fit`` / ``render_zoomed``: a full repaint of the editor's grid area with the
+  whole floor in view, and zoomed in to 20 pixel boxes (needs pygame; skipped without it)
+
+Times are the best of ``repeat`` runs. Memory is the ``tracemalloc`` peak of one
+extra, traced run (NumPy reports its buffers to tracemalloc as well). Results are
+plain JSON, so one run can be kept as a baseline and compared against later with
+:func:`compare`.
+"""
+
+import contextlib
+import gc
+import importlib.util
+import io
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from .editing import paint_walls, rack_cells
+from .grid import Warehouse
+from .layout import load_layout, save_layout
+from .matrix import build_matrix
+from .routing import run_simulation
+from .search import bfs
+from .tours import TIME_BUDGET, solve_tour
+
+FORMAT = 1
+LAYOUTS = ("layout1.csv", "layout2.csv", "layout3.csv", os.path.join("Layouts", "premade_layout1.csv"))
+SIZES = (38, 100, 250, 500, 1000)
+PICKS = 20
+REPEAT = 3
+# Regressions smaller than this many seconds or bytes are noise, whatever the ratio
+MIN_SECONDS = 0.002
+MIN_BYTES = 64 << 10
+
+EDITOR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "final demo.py")
+
+
+def generated_floor(size, picks=PICKS, seed=0):
+    """A ``size`` x ``size`` floor of rack rows with cross aisles, the depot in a corner and random picks"""
+    warehouse = Warehouse(size, size)
+    paint_walls(warehouse, rack_cells(warehouse, 1, 1, size - 2, size - 2, cross_every=max(size // 10, 8)))
+    free = np.flatnonzero(np.frombuffer(warehouse.occupancy, dtype=np.uint8) == 0)
+    rng = random.Random(seed)
+    warehouse.targets = rng.sample(free[1:].tolist(), min(picks, len(free) - 1))
+    return warehouse
+
+
+def run(layouts=LAYOUTS, sizes=SIZES, repeat=REPEAT, render=True, progress=None):
+    """Benchmarks every layout file that exists and every generated size, returns the JSON document"""
+    cases = {}
+    editor = _load_editor() if render else None
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in layouts:
+            if os.path.exists(path):
+                cases[path] = run_case(path, tmp, repeat, editor, progress)
+        for size in sizes:
+            name = os.path.join(tmp, f"grid-{size}.csv")
+            save_layout(generated_floor(size), name)
+            cases[f"grid-{size}"] = run_case(name, tmp, repeat, editor, progress, label=f"grid-{size}")
+    return {
+        "format": FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "cases": cases,
+    }
+
+
+def run_case(path, tmp, repeat=REPEAT, editor=None, progress=None, label=None):
+    label = label or path
+    warehouse = load_layout(path)
+    binary = os.path.join(tmp, "case.wpl")
+    save_layout(warehouse, binary)
+    nodes = [warehouse.start] + warehouse.targets
+    holder = {}
+
+    def matrix():
+        holder["matrix"] = build_matrix(warehouse, nodes)
+
+    stages = [
+        ("load_csv", lambda: load_layout(path)),
+        ("load_wpl", lambda: load_layout(binary)),
+        ("bfs", lambda: bfs(warehouse, warehouse.start)),
+        ("matrix", matrix),
+        ("tour_greedy", lambda: solve_tour(holder["matrix"].dist, "GREEDY")),
+        ("tour_optimized", lambda: solve_tour(holder["matrix"].dist, "OPTIMIZED", TIME_BUDGET)),
+        ("route", lambda: run_simulation(warehouse, "GREEDY")),
+    ]
+    if editor is not None:
+        stages.append(("render_fit", lambda: _render(editor, warehouse, None)))
+        stages.append(("render_zoomed", lambda: _render(editor, warehouse, 20)))
+
+    result = {"cells": warehouse.size, "picks": len(warehouse.targets), "stages": {}}
+    for stage, work in stages:
+        result["stages"][stage] = measure(work, repeat)
+        if progress:
+            progress(label, stage, result["stages"][stage])
+    return result
+
+
+def measure(work, repeat=REPEAT):
+    """{"seconds": best of ``repeat`` runs, "peak_bytes": tracemalloc peak of one more run}"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        work()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        work()
+        took = time.perf_counter() - start
+        best = took if best is None else min(best, took)
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def compare(baseline, current, threshold=0.25):
+    """(case, stage, metric, before, after, change) for every measurement in both runs, plus the regressions
+
+    A measurement regressed when it grew by more than ``threshold`` (a fraction) and by
+    more than the noise floor (``MIN_SECONDS`` / ``MIN_BYTES``).
+    """
+    rows = []
+    regressions = []
+    for case, before_case in baseline["cases"].items():
+        after_case = current["cases"].get(case)
+        if after_case is None:
+            continue
+        for stage, before in before_case["stages"].items():
+            after = after_case["stages"].get(stage)
+            if after is None:
+                continue
+            for metric, floor in (("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES)):
+                old, new = before[metric], after[metric]
+                change = (new - old) / old if old else 0.0
+                row = (case, stage, metric, old, new, change)
+                rows.append(row)
+                if change > threshold and new - old > floor:
+                    regressions.append(row)
+    return rows, regressions
+
+
+# --- Rendering, through the editor's own drawing code ---
+
+def _load_editor():
+    """The editor module with a headless display, or None when pygame (or the editor) is missing"""
+    if not os.path.exists(EDITOR):
+        return None
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        spec = importlib.util.spec_from_file_location("warepath_editor", EDITOR)
+        editor = importlib.util.module_from_spec(spec)
+        with contextlib.redirect_stdout(io.StringIO()):  # pygame greets on import
+            spec.loader.exec_module(editor)
+        editor.init_display()
+    except ImportError:
+        return None
+    return editor
+
+
+def _render(editor, warehouse, cell_size):
+    editor.warehouse = warehouse
+    editor.fit_view()
+    if cell_size:
+        editor.camera.zoom(cell_size / editor.camera.cell_w, editor.SIDEBAR_WIDTH, 0)
+    editor.target_cells.clear()
+    editor.target_cells.update(warehouse.targets)
+    editor.draw_grid(True, set(), set())
@@ -0,0 +1,218 @@
+"""Distance fields kept between runs, keyed by the wall set and the source cell.
+
+A field only depends on the walls, so re-planning the same floor with a new pick
+list only floods from the cells that have not been sources before. Loading a
+layout or resetting the grid needs no invalidation at all: the wall key changes
+and the old entries simply stop matching until LRU eviction drops them (or the
+layout comes back). Single wall edits go through :meth:`FieldCache.wall_changed`,
+which repairs the cached fields in place (see :mod:`warepath.dynamic`), or with
+``repair=False`` carries over only the fields the edit cannot have changed.
+Region edits (a whole stroke of the editing tools) go through
+:meth:`FieldCache.walls_changed` once per stroke. Cost edits change the key as
+well. On a floor with costs or diagonal moves a field survives a wall edit only when
+the edit added walls off its shortest path tree, since the repairs count 4-connected
+steps. With diagonal moves a new wall also blocks the diagonal steps past its corners.
+"""
+
+import collections
+
+import numpy as np
+
+from .dynamic import repair_field
+from .grid import WALL
+from .matrix import build_fields
+from .search import NO_PARENT, UNREACHED
+
+# Default memory budget for cached fields
+BUDGET_BYTES = 64 << 20
+# A field holds an int32 distance and an int32 predecessor per cell
+FIELD_CELL_BYTES = 8
+
+
+class FieldCache:
+    def __init__(self, budget_bytes=BUDGET_BYTES, repair=True):
+        self.budget_bytes = budget_bytes
+        self.repair = repair
+        self.entries = collections.OrderedDict()  # (layout key, source) -> (dist, pred), oldest first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.repaired_cells = 0  # distances changed by incremental repairs so far
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def fits(self, warehouse, count):
+        """True if ``count`` fields of ``warehouse`` fit in the budget together"""
+        return count * warehouse.size * FIELD_CELL_BYTES <= self.budget_bytes
+
+    def fields(self, warehouse, sources, engine="wavefront"):
+        """(dist, pred) for every source, flooding only from the ones not cached yet"""
+        key = warehouse.layout_key()
+        found = {}
+        missing = []
+        for source in sources:
+            entry = self.entries.get((key, source))
+            if entry is not None:
+                self.entries.move_to_end((key, source))
+                found[source] = entry
+                self.hits += 1
+            elif source not in found and source not in missing:
+                missing.append(source)
+                self.misses += 1
+
+        if missing:
+            for source, entry in zip(missing, build_fields(warehouse, missing, engine)):
+                found[source] = entry
+                self.put(key, source, entry)
+
+        return [found[source] for source in sources]
+
+    def put(self, key, source, entry):
+        old = self.entries.pop((key, source), None)
+        if old is not None:
+            self.nbytes -= _entry_bytes(old)
+        self.entries[(key, source)] = entry
+        self.nbytes += _entry_bytes(entry)
+        while self.nbytes > self.budget_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= _entry_bytes(evicted)
+
+    def wall_changed(self, warehouse, cell, previous_key):
+        """Moves the fields of ``previous_key`` over to the edited walls, dropping what cannot be kept
+
+        ``previous_key`` is ``warehouse.layout_key()`` from before the edit. Returns
+        the (dist, pred, source) of the fields that were dropped.
+        """
+        key = warehouse.layout_key()
+        if key == previous_key:
+            return []
+
+        dropped = []
+        kept = collections.OrderedDict()
+        for (entry_key, source), entry in self.entries.items():
+            if entry_key != previous_key:
+                kept[(entry_key, source)] = entry
+            elif self._carry_over(warehouse, cell, source, entry):
+                kept[(key, source)] = entry
+            else:
+                dropped.append((entry[0], entry[1], source))
+                self.nbytes -= _entry_bytes(entry)
+        self.entries = kept
+        return dropped
+
+    def walls_changed(self, warehouse, cells, previous_key):
+        """:meth:`wall_changed` for a whole stroke of edited ``cells`` at once
+
+        One cell is repaired as usual. For more, a field is kept when only walls were
+        added and none of them lay on its shortest path tree (no cell's predecessor
+        became a wall), which is one vectorised check per field. Everything else is dropped.
+        """
+        cells = np.asarray(cells, dtype=np.intp)
+        if len(cells) == 1:
+            return self.wall_changed(warehouse, int(cells[0]), previous_key)
+        key = warehouse.layout_key()
+        if key == previous_key:
+            return []
+
+        added = bool((np.frombuffer(warehouse.occupancy, dtype=np.uint8)[cells] == WALL).all())
+        corners = warehouse.columns if warehouse.diagonal else None
+        dropped = []
+        kept = collections.OrderedDict()
+        for (entry_key, source), entry in self.entries.items():
+            if entry_key != previous_key:
+                kept[(entry_key, source)] = entry
+            elif added and _untouched(cells, source, *entry, corners):
+                kept[(key, source)] = entry
+            else:
+                dropped.append((entry[0], entry[1], source))
+                self.nbytes -= _entry_bytes(entry)
+        self.entries = kept
+        return dropped
+
+    def _carry_over(self, warehouse, cell, source, entry):
+        if warehouse.diagonal:
+            walls = np.asarray([cell], dtype=np.intp)
+            return warehouse.is_wall(cell) and _untouched(walls, source, *entry, warehouse.columns)
+        if warehouse.weighted:
+            return warehouse.is_wall(cell) and _patch(warehouse, cell, source, *entry)
+        if not self.repair:
+            return _patch(warehouse, cell, source, *entry)
+        changed = repair_field(warehouse, cell, source, *entry)
+        if changed < 0:
+            return False
+        self.repaired_cells += changed
+        return True
+
+
+def _entry_bytes(entry):
+    dist, pred = entry
+    return dist.itemsize * len(dist) + pred.itemsize * len(pred)
+
+
+def _untouched(walls, source, dist, pred, columns=None):
+    """True (after blanking the new ``walls``) if no shortest path of the field ran through them
+
+    With ``columns`` (diagonal moves) a path also must not have squeezed past them diagonally.
+    """
+    if source in walls:
+        return False
+    # Views, so bfs and dial fields (array('i')) are blanked in place like the NumPy ones
+    dist = np.frombuffer(dist, dtype=np.int32)
+    pred = np.frombuffer(pred, dtype=np.int32)
+    through = np.isin(pred, walls)
+    through[walls] = False  # the new walls themselves are blanked below
+    if through.any():
+        return False
+    if columns is not None and _past_corners(walls, pred, columns):
+        return False
+    dist[walls] = UNREACHED
+    pred[walls] = NO_PARENT
+    return True
+
+
+def _past_corners(walls, pred, columns):
+    """True if a diagonal step of the tree ran between two cells beside one of ``walls``"""
+    size = len(pred)
+    x = walls % columns
+    for side, across in ((-1, -columns), (-1, columns), (1, -columns), (1, columns)):
+        inside = (x > 0 if side < 0 else x < columns - 1) & (walls + across >= 0) & (walls + across < size)
+        a = walls[inside] + side
+        b = walls[inside] + across
+        if ((pred[a] == b) | (pred[b] == a)).any():
+            return True
+    return False
+
+
+def _patch(warehouse, cell, source, dist, pred):
+    """Updates ``cell`` in one field in place if the rest of the field is untouched by the edit"""
+    if cell == source:
+        return False
+
+    if warehouse.is_wall(cell):
+        # A new wall only matters if some shortest path ran through it
+        if dist[cell] == UNREACHED:
+            return True
+        for n in warehouse.neighbours(cell):
+            if pred[n] == cell:
+                return False
+        dist[cell] = UNREACHED
+        pred[cell] = NO_PARENT
+        return True
+
+    # A freed cell matters if it connects a new area or shortens a neighbour
+    reached = [n for n in warehouse.neighbours(cell) if dist[n] != UNREACHED]
+    if not reached:
+        return True
+    best = min(reached, key=lambda n: dist[n])
+    d = dist[best] + 1
+    for n in warehouse.neighbours(cell):
+        if dist[n] == UNREACHED or dist[n] > d + 1:
+            return False
+    dist[cell] = d
+    pred[cell] = best
+    return True
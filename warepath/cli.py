@@ -0,0 +1,352 @@
+"""Command line entry point, e.g. ``python -m warepath route layout1.csv --mode greedy --json``"""
+
+import argparse
+import json
+import sys
+
+from . import bench
+from .batching import BATCH_METHODS
+from .layout import LayoutError, convert_layout, load_layout
+from .matrix import ENGINES
+from .profiling import PROFILER
+from .routing import MODES, TOUR_MODES, RoutingError, compare_modes, rounded_time, run_pickers, run_simulation
+from .tours import TIME_BUDGET
+from .wave import WavePlanner
+
+
+def route_to_dict(layout, warehouse, result, units, paths=False):
+    route = {
+        "layout": layout,
+        "mode": result.mode,
+        "units_per_square": units,
+        "diagonal": warehouse.diagonal,
+        "tour": [list(warehouse.coords(result.nodes[i])) for i in result.tour],
+        "legs": [{"point": row[0], "distance": int(row[1]), "units": row[2], "time": row[3]}
+                 for row in result.table[:-1]],
+        "picking_distance": result.picking_distance,
+        "return_distance": result.return_distance,
+        "total_distance": result.total_distance,
+        "total_units": result.total_distance * units,
+        "picking_time": rounded_time(result.picking_time),
+        "return_time": rounded_time(result.return_time),
+        "total_time": rounded_time(result.total_time),
+        "optimal": result.optimal,
+        "trips": len(result.trips),
+    }
+    if result.optimal:
+        route["greedy_time"] = rounded_time(result.greedy_time)
+        route["optimality_gap"] = result.optimality_gap
+    if paths:
+        # Walking the legs back is the expensive part, so it only happens on request
+        route["picking_path"] = [list(warehouse.coords(cell)) for cell in result.picking_path]
+        route["return_path"] = [list(warehouse.coords(cell)) for cell in result.return_path]
+    return route
+
+
+def pickers_to_dict(layout, warehouse, result, units, paths=False):
+    slowest = max(result.routes, key=lambda route: route.total_time)  # the route that sets the makespan
+    return {
+        "layout": layout,
+        "mode": result.mode,
+        "units_per_square": units,
+        "pickers": [route_to_dict(layout, warehouse, route, units, paths) for route in result.routes],
+        "makespan": rounded_time(result.makespan),
+        "makespan_units": slowest.total_distance * units,
+        "total_distance": result.total_distance,
+        "total_units": result.total_distance * units,
+        "total_time": rounded_time(result.total_time),
+    }
+
+
+def open_layout(args):
+    """The layout named in ``args`` with the movement asked for, None (after saying why) when it cannot be read"""
+    try:
+        warehouse = load_layout(args.layout)
+    except (OSError, LayoutError) as e:
+        print(e, file=sys.stderr)
+        return None
+    warehouse.diagonal = args.diagonal
+    return warehouse
+
+
+def cmd_route(args):
+    warehouse = open_layout(args)
+    if warehouse is None:
+        return 1
+    if args.compare:
+        return print_comparison(args, warehouse)
+    try:
+        if args.pickers != 1:
+            result = run_pickers(warehouse, args.pickers, units=args.units, engine=args.engine,
+                                 time_budget=args.budget, capacity=args.capacity)
+        else:
+            result = run_simulation(warehouse, args.mode, units=args.units, engine=args.engine,
+                                    time_budget=args.budget, capacity=args.capacity)
+    except (RoutingError, ValueError) as e:
+        print(f"{args.layout}: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        if args.pickers != 1:
+            route = pickers_to_dict(args.layout, warehouse, result, args.units, args.paths)
+        else:
+            route = route_to_dict(args.layout, warehouse, result, args.units, args.paths)
+        print(json.dumps(route))
+        return 0
+
+    print(f"{args.layout} ({result.mode}, {len(warehouse.targets)} picks)")
+    print(f"{'Points':<8}{'Distance':>10}{'Units':>10}{'Time':>10}")
+    if args.pickers != 1:
+        for p, route in enumerate(result.routes):
+            print(f"-- P{p + 1} --")
+            for row in route.table + route.return_table:
+                print(f"{row[0]:<8}{row[1]:>10}{row[2]:>10}{row[3]:>10}")
+        print("--")
+    for row in result.table + result.return_table:
+        print(f"{row[0]:<8}{row[1]:>10}{row[2]:>10}{row[3]:>10}")
+    return 0
+
+
+def print_comparison(args, warehouse):
+    try:
+        results = compare_modes(warehouse, units=args.units, engine=args.engine, time_budget=args.budget,
+                                capacity=args.capacity)
+    except (RoutingError, ValueError) as e:
+        print(f"{args.layout}: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps([route_to_dict(args.layout, warehouse, result, args.units, args.paths)
+                          for _, result in results]))
+        return 0
+
+    print(f"{args.layout} ({len(warehouse.targets)} picks)")
+    print(f"{'Mode':<12}{'Distance':>10}{'Units':>10}{'Time':>10}{'Trips':>7}")
+    for mode, result in results:
+        time = rounded_time(result.total_time)
+        print(f"{mode:<12}{result.total_distance:>10}{result.total_distance * args.units:>10}{time:>10}"
+              f"{len(result.trips):>7}")
+    return 0
+
+
+def read_orders(file, warehouse):
+    """Orders from a JSON file holding a list of orders, each a list of [x, y] pick squares"""
+    with open(file) as f:
+        orders = json.load(f)
+    cells = []
+    for i, order in enumerate(orders):
+        for x, y in order:
+            if not warehouse.in_bounds(x, y):
+                raise ValueError(f"order {i}: square {x},{y} is off the floor")
+        cells.append([warehouse.cell(x, y) for x, y in order])
+    return cells
+
+
+def cmd_wave(args):
+    warehouse = open_layout(args)
+    if warehouse is None:
+        return 1
+    try:
+        orders = read_orders(args.orders, warehouse)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"{args.orders}: {e}", file=sys.stderr)
+        return 1
+
+    planner = WavePlanner(warehouse, orders, engine=args.engine)
+    if args.capacity:
+        return print_batches(args, warehouse, planner)
+
+    failed = 0
+    # One JSON line per order, in the order the workers finish them
+    for plan in planner.plan(args.mode, workers=args.workers, time_budget=args.budget):
+        line = {"order": plan.index, "mode": args.mode}
+        if plan.error:
+            line["error"] = plan.error
+            failed += 1
+        else:
+            line["tour"] = [list(warehouse.coords(cell)) for cell in plan.tour]
+            line["distance"] = plan.distance
+            line["units"] = plan.distance * args.units
+            line["time"] = rounded_time(plan.time)
+            line["optimal"] = plan.optimal
+        print(json.dumps(line), flush=True)
+    return 1 if failed else 0
+
+
+def print_batches(args, warehouse, planner):
+    result = planner.batch(args.capacity, args.batching, args.mode, workers=args.workers, time_budget=args.budget)
+    # One JSON line per batch, then the orders that could not be planned and the summary
+    for plan, batch in zip(result.plans, result.batches):
+        print(json.dumps({
+            "batch": plan.index,
+            "orders": batch,
+            "picks": len(plan.picks),
+            "tour": [list(warehouse.coords(cell)) for cell in plan.tour],
+            "distance": plan.distance,
+            "units": plan.distance * args.units,
+            "time": rounded_time(plan.time),
+        }))
+    failed = [plan for plan in result.singles if plan.error]
+    for plan in failed:
+        print(json.dumps({"order": plan.index, "error": plan.error}))
+    print(json.dumps({
+        "summary": args.batching,
+        "capacity": args.capacity,
+        "batches": len(result.batches),
+        "single_distance": result.single_distance,
+        "batched_distance": result.batched_distance,
+        "saved": result.saved,
+        "saved_units": result.saved * args.units,
+        "saved_time": rounded_time(result.saved_time),
+    }))
+    return 1 if failed else 0
+
+
+def cmd_convert(args):
+    try:
+        warehouse = convert_layout(args.source, args.target)
+    except (OSError, LayoutError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{args.source} -> {args.target} ({warehouse.columns} x {warehouse.rows}, "
+          f"{len(warehouse.targets)} targets)")
+    return 0
+
+
+def cmd_bench(args):
+    def progress(case, stage, result):
+        print(f"{case:<32} {stage:<15} {1000 * result['seconds']:>10.2f} ms {result['peak_bytes'] / 2**20:>9.2f} MiB",
+              file=sys.stderr, flush=True)
+
+    layouts = bench.LAYOUTS if args.layouts is None else args.layouts
+    results = bench.run(layouts, args.sizes, args.repeat, render=not args.no_render, progress=progress)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        print(json.dumps(results, indent=1))
+    return 0
+
+
+def cmd_compare(args):
+    runs = []
+    for name in (args.baseline, args.current):
+        try:
+            with open(name) as f:
+                runs.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"{name}: {e}", file=sys.stderr)
+            return 1
+
+    rows, regressions = bench.compare(*runs, threshold=args.threshold)
+    print(f"{'case':<32} {'stage':<15} {'metric':<10} {'before':>12} {'after':>12} {'change':>8}")
+    for case, stage, metric, old, new, change in rows:
+        flag = "  REGRESSED" if (case, stage, metric, old, new, change) in regressions else ""
+        if metric == "seconds":
+            old, new = f"{1000 * old:.2f} ms", f"{1000 * new:.2f} ms"
+        else:
+            old, new = f"{old / 2**20:.2f} MiB", f"{new / 2**20:.2f} MiB"
+        print(f"{case:<32} {stage:<15} {metric:<10} {old:>12} {new:>12} {100 * change:>+7.1f}%{flag}")
+    print(f"{len(regressions)} regression(s) above {100 * args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+
+def capacity(text):
+    """Tote capacity argument: a whole number of picks, 0 for no limit"""
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"a tote holds 0 (no limit) or more picks, not {value}")
+    return value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="warepath", description="Warehouse pick routing without the editor")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write the phase timings and counters of the run to FILE "
+                             "(a .jsonl name writes JSON lines, anything else a Chrome trace)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    route = commands.add_parser("route", help="plan a pick tour for a saved layout")
+    route.add_argument("layout", help="layout saved from the editor (CSV or .wpl)")
+    route.add_argument("--mode", default="GREEDY", type=str.upper, choices=MODES,
+                       help="SEQUENCE visits targets in placement order, GREEDY picks the nearest next, "
+                            "OPTIMIZED improves the greedy tour with 2-opt/Or-opt, "
+                            "EXACT finds the shortest tour for small orders, S-SHAPE, RETURN, LARGEST-GAP "
+                            "and COMBINED follow the aisle routing policies of the same names")
+    route.add_argument("--engine", default="auto", choices=ENGINES,
+                       help="wavefront floods every node of interest at once (NumPy), bfs runs one queue per node, "
+                            "dial runs a bucket queue Dijkstra over the cell costs, astar/jps search each leg "
+                            "point to point, corridor runs Dijkstra on the floor contracted to its aisles, auto "
+                            "picks one of flood, point to point or corridor; on a floor with costs wavefront, bfs "
+                            "and corridor give way to dial and jps to astar, with --diagonal they give way to dial "
+                            "and jps jumps diagonally")
+    route.add_argument("--budget", type=float, default=TIME_BUDGET,
+                       help="seconds of local search for OPTIMIZED (default %(default)s)")
+    route.add_argument("--pickers", type=int, default=1,
+                       help="share the targets between this many pickers, keeping the longest route short "
+                            "(--mode is ignored above 1)")
+    route.add_argument("--capacity", type=capacity, default=None,
+                       help="tote capacity in picks; the tour is split into trips back to the depot")
+    route.add_argument("--units", type=int, default=1, help="units per square (default 1)")
+    route.add_argument("--diagonal", action="store_true",
+                       help="let pickers move diagonally (8-connected, octile lengths, no cutting past shelf corners)")
+    route.add_argument("--json", action="store_true", help="print the route as JSON")
+    route.add_argument("--paths", action="store_true", help="include the walked cells in the JSON output")
+    route.add_argument("--compare", action="store_true",
+                       help="plan every mode and list them quickest first (--mode is ignored)")
+    route.set_defaults(func=cmd_route)
+
+    wave = commands.add_parser("wave", help="plan many orders on one layout in parallel")
+    wave.add_argument("layout", help="layout saved from the editor (CSV or .wpl)")
+    wave.add_argument("orders", help="JSON file with a list of orders, each a list of [x, y] squares")
+    wave.add_argument("--mode", default="OPTIMIZED", type=str.upper, choices=TOUR_MODES,
+                      help="tour mode used for every order (default %(default)s)")
+    wave.add_argument("--engine", default="auto", choices=ENGINES, help="how the shared distance matrix is built")
+    wave.add_argument("--workers", type=int, default=None,
+                      help="worker processes (default one per CPU, 1 plans in this process)")
+    wave.add_argument("--budget", type=float, default=TIME_BUDGET,
+                      help="seconds of local search per order for OPTIMIZED (default %(default)s)")
+    wave.add_argument("--capacity", type=capacity, default=0,
+                      help="tote capacity in picks; batches orders into shared tours and reports the distance saved")
+    wave.add_argument("--batching", default="savings", choices=BATCH_METHODS,
+                      help="savings merges the pair of batches that saves the most, seed grows batches "
+                           "around the farthest order (default %(default)s)")
+    wave.add_argument("--units", type=int, default=1, help="units per square (default 1)")
+    wave.add_argument("--diagonal", action="store_true", help="let pickers move diagonally (see route --diagonal)")
+    wave.set_defaults(func=cmd_wave)
+
+    convert = commands.add_parser("convert", help="convert a layout between CSV and the binary .wpl format")
+    convert.add_argument("source", help="layout to read (CSV or .wpl)")
+    convert.add_argument("target", help="layout to write, a .wpl name writes binary, anything else CSV")
+    convert.set_defaults(func=cmd_convert)
+
+    bench_parser = commands.add_parser("bench", help="time every stage on the repo layouts and generated floors")
+    bench_parser.add_argument("--out", help="write the results to this JSON file instead of printing them")
+    bench_parser.add_argument("--layouts", nargs="*", default=None,
+                              help="layout files to include (default: layout1-3.csv and Layouts/premade_layout1.csv)")
+    bench_parser.add_argument("--sizes", type=int, nargs="*", default=list(bench.SIZES),
+                              help="generated square floors to include (default: %(default)s)")
+    bench_parser.add_argument("--repeat", type=int, default=bench.REPEAT,
+                              help="timed runs per stage, the best one counts (default %(default)s)")
+    bench_parser.add_argument("--no-render", action="store_true", help="skip the editor drawing stages")
+    bench_parser.set_defaults(func=cmd_bench)
+
+    compare = commands.add_parser("compare", help="compare two bench results and flag regressions")
+    compare.add_argument("baseline", help="JSON results of the earlier run")
+    compare.add_argument("current", help="JSON results of the new run")
+    compare.add_argument("--threshold", type=float, default=0.25,
+                         help="slowdown (or memory growth) counted as a regression, as a fraction (default %(default)s)")
+    compare.set_defaults(func=cmd_compare)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.profile:
+        return args.func(args)
+    PROFILER.reset()
+    try:
+        return args.func(args)
+    finally:
+        PROFILER.write(args.profile)
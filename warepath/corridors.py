@@ -0,0 +1,222 @@
+"""Corridor graph: the free floor contracted to a weighted sparse graph for Dijkstra.
+
+Rack floors are mostly aisles: rectangles of free cells, a few lanes wide, with
+shelves on both long sides. Inside such an aisle every row (or column) looks
+the same. A picker only enters or leaves it at its two end rows, so the rows in
+between can be replaced by one straight edge per lane, weighted by its length.
+
+The contraction works on *stacks*. A stack is a run of rows in which the free
+run around each cell has the same extent and is closed by shelves (or the floor
+edge) at both ends. For example, a vertical aisle two lanes wide is one stack
+of rows two cells wide. The rows strictly inside a stack are contracted. Its
+end rows stay graph nodes, along with every other free cell. Horizontal aisles
+are the same on columns. A row is kept whole when it holds a pinned cell (the
+depot, a pick) or a cell that the other direction needs as a node. So inside a
+stack, the contracted rows always sit between two rows of nodes. Distances
+across a contracted block are Manhattan, and Manhattan is exactly a straight
+lane edge plus steps along a node row. Graph distances are therefore the same
+as grid distances.
+
+Edges are either single steps between neighbouring nodes or straight lane
+edges, so a graph path expands back to cells without storing the corridors.
+"""
+
+import heapq
+
+import numpy as np
+
+from .profiling import count, timed
+from .search import UNREACHED
+from .wavefront import free_mask
+
+
+class CorridorGraph:
+    def __init__(self, warehouse, pins=()):
+        """Contracts the free cells of ``warehouse``; ``pins`` (e.g. depot and picks) always stay nodes"""
+        self.warehouse = warehouse
+        with timed("corridors"):
+            free = free_mask(warehouse)
+            nodes, vertical, horizontal = _contract(free, pins)
+            self.cells = np.flatnonzero(nodes)  # node -> cell id, in cell order
+            self.node_of = np.full(warehouse.size, -1, dtype=np.int32)  # cell id -> node, -1 when contracted
+            self.node_of[self.cells] = np.arange(len(self.cells), dtype=np.int32)
+            self._build_edges(nodes, vertical, horizontal)
+        count("graph nodes", len(self.cells))
+        count("graph edges", self.edge_count)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def edge_count(self):
+        """Undirected edges"""
+        return len(self._targets) // 2
+
+    def _build_edges(self, nodes, vertical, horizontal):
+        columns = self.warehouse.columns
+        us, vs, ws = [], [], []
+
+        # Single steps between neighbouring nodes
+        right = np.zeros_like(nodes)
+        right[:, :-1] = nodes[:, :-1] & nodes[:, 1:]
+        down = np.zeros_like(nodes)
+        down[:-1] = nodes[:-1] & nodes[1:]
+        for pairs, step in ((right, 1), (down, columns)):
+            cells = np.flatnonzero(pairs)
+            us.append(cells)
+            vs.append(cells + step)
+            ws.append(np.ones(len(cells), dtype=np.int64))
+
+        # Lane edges over each contracted block, from the node before it to the node after it
+        first, last = _runs(horizontal)
+        us.append(first - 1)
+        vs.append(last + 1)
+        ws.append(last - first + 2)
+        first, last = _runs(vertical.T)  # positions x * rows + y on the transposed grid
+        rows = vertical.shape[0]
+        first = (first % rows) * columns + first // rows
+        last = (last % rows) * columns + last // rows
+        us.append(first - columns)
+        vs.append(last + columns)
+        ws.append((last - first) // columns + 2)
+
+        u = self.node_of[np.concatenate(us)]
+        v = self.node_of[np.concatenate(vs)]
+        w = np.concatenate(ws)
+        # Both directions, grouped by source node (CSR)
+        source = np.concatenate((u, v))
+        target = np.concatenate((v, u))
+        weight = np.concatenate((w, w))
+        order = np.argsort(source, kind="stable")
+        self._offsets = np.searchsorted(source[order], np.arange(len(self.cells) + 1)).tolist()
+        self._targets = target[order].tolist()
+        self._weights = weight[order].tolist()
+
+    def shortest_paths(self, source):
+        """Dijkstra from cell ``source``: (distance per node, predecessor node per node)
+
+        Unreached nodes keep ``UNREACHED`` and a predecessor of -1.
+        """
+        n = len(self.cells)
+        dist = [UNREACHED] * n
+        pred = [-1] * n
+        start = int(self.node_of[source])
+        if start < 0:
+            return dist, pred
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+
+        best = dist[:]  # tentative distances
+        best[start] = 0
+        heap = [(0, start)]
+        expanded = 0
+        while heap:
+            d, node = heapq.heappop(heap)
+            if dist[node] != UNREACHED:
+                continue
+            dist[node] = d
+            expanded += 1
+            for k in range(offsets[node], offsets[node + 1]):
+                t = targets[k]
+                nd = d + weights[k]
+                if dist[t] == UNREACHED and (best[t] == UNREACHED or nd < best[t]):
+                    best[t] = nd
+                    pred[t] = node
+                    heapq.heappush(heap, (nd, t))
+        count("graph nodes expanded", expanded)
+        return dist, pred
+
+    def path(self, pred, source, target):
+        """Cells walked from ``source`` (exclusive) to ``target`` (inclusive) on a :meth:`shortest_paths` tree"""
+        node = int(self.node_of[target])
+        start = int(self.node_of[source])
+        if node < 0 or (pred[node] == -1 and node != start):
+            return None
+        corners = []
+        while node != start:
+            corners.append(int(self.cells[node]))
+            node = pred[node]
+        corners.append(source)
+        corners.reverse()
+
+        columns = self.warehouse.columns
+        cells = []
+        for a, b in zip(corners, corners[1:]):
+            step = columns if (b - a) % columns == 0 else 1
+            step = step if b > a else -step
+            cells.extend(range(a + step, b + step, step))
+        return cells
+
+
+def _contract(free, pins):
+    """(nodes, vertical, horizontal) boolean grids: kept cells, and cells on vertical / horizontal lane edges"""
+    rows_inside, rows_end, row_runs = _stacks(free)
+    cols_inside, cols_end, col_runs = (a.T for a in _stacks(free.T))
+
+    pinned = np.zeros(free.shape, dtype=bool)
+    if len(pins):
+        pinned.ravel()[np.asarray(pins, dtype=np.intp)] = True
+
+    # Horizontal lanes only where no row stack is, then vertical lanes everywhere else
+    # (open areas included) except next to a horizontal lane, whose ends have to stay.
+    # A cell that cannot go keeps its whole column (or row), so every contracted block
+    # is closed by full rows of nodes.
+    horizontal = cols_inside & ~rows_inside & ~rows_end & ~pinned
+    horizontal &= ~_any_per_run(cols_inside & ~horizontal, col_runs)
+    beside = np.zeros_like(horizontal)
+    beside[:, 1:] |= horizontal[:, :-1]
+    beside[:, :-1] |= horizontal[:, 1:]
+    vertical = rows_inside & ~beside & ~pinned
+    vertical &= ~_any_per_run(rows_inside & ~vertical, row_runs)
+    return free & ~vertical & ~horizontal, vertical, horizontal
+
+
+def row_runs(free):
+    """Free runs of every row of a (rows, columns) grid: (left, right, same, run ids)
+
+    ``left`` and ``right`` are the first and last column of the run around each
+    cell, ``same[y]`` is True where row y + 1 continues the run of row y with the
+    same extent, and run ids number every run, 0 for walls.
+    """
+    rows, columns = free.shape
+    x = np.arange(columns)
+    left = np.maximum.accumulate(np.where(free, -1, x), axis=1) + 1
+    right = np.minimum.accumulate(np.where(free, columns, x)[:, ::-1], axis=1)[:, ::-1] - 1
+    same = free[1:] & free[:-1] & (left[1:] == left[:-1]) & (right[1:] == right[:-1])
+
+    starts = free.copy()
+    starts[:, 1:] &= ~free[:, :-1]
+    runs = np.cumsum(starts.ravel()).reshape(rows, columns) * free
+    return left, right, same, runs
+
+
+def _stacks(free):
+    """Row stacks of a (rows, columns) grid: (inside, end rows, run ids)
+
+    ``inside`` marks cells whose row run has the same extent as the runs above and
+    below it, ``end rows`` the cells just above or below such a row.
+    """
+    _, _, same, runs = row_runs(free)
+    inside = np.zeros_like(free)
+    inside[1:-1] = same[1:] & same[:-1]
+    ends = np.zeros_like(free)
+    ends[:-1] |= inside[1:]
+    ends[1:] |= inside[:-1]
+    ends &= ~inside
+    return inside, ends, runs
+
+
+def _runs(mask):
+    """Flat positions of the first and last cell of every horizontal run in ``mask``, in row order"""
+    before = np.zeros_like(mask)
+    before[:, 1:] = mask[:, :-1]
+    after = np.zeros_like(mask)
+    after[:, :-1] = mask[:, 1:]
+    return np.flatnonzero(mask & ~before), np.flatnonzero(mask & ~after)
+
+
+def _any_per_run(mask, runs):
+    """True on every cell of a run in which ``mask`` is set anywhere"""
+    hit = np.zeros(runs.max() + 1, dtype=bool)
+    hit[runs[mask]] = True
+    hit[0] = False
+    return hit[runs]
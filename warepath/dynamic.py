@@ -0,0 +1,103 @@
+"""Incremental repair of a distance field after a single wall toggle.
+
+Instead of flooding the whole grid again, only the cells whose distance actually
+changes are visited: the part of the shortest-path tree that hung off a new wall
+and cannot be re-attached at the same distance, or the cells a freed wall brings
+closer to the source.
+"""
+
+import collections
+import heapq
+
+from .search import NO_PARENT, UNREACHED
+
+
+def repair_field(warehouse, cell, source, dist, pred):
+    """Updates ``dist``/``pred`` in place for a wall toggled at ``cell``
+
+    Returns the number of cells whose distance changed, or -1 if the field cannot
+    be repaired (the source itself became a wall).
+    """
+    if warehouse.is_wall(cell):
+        if cell == source:
+            return -1
+        return _wall_added(warehouse, cell, dist, pred)
+    return _wall_removed(warehouse, cell, dist, pred)
+
+
+def _children(warehouse, dist, pred, cell):
+    return [n for n in warehouse.neighbours(cell) if pred[n] == cell and dist[n] != UNREACHED]
+
+
+def _wall_added(warehouse, cell, dist, pred):
+    if dist[cell] == UNREACHED:
+        return 0
+
+    # Walk the subtree under the new wall in distance order. A cell that still has
+    # a valid neighbour one step closer is re-attached there with its whole subtree;
+    # only the rest loses its distance.
+    queue = collections.deque(_children(warehouse, dist, pred, cell))
+    dist[cell] = UNREACHED
+    pred[cell] = NO_PARENT
+    broken = set()
+    while queue:
+        v = queue.popleft()
+        d = dist[v] - 1
+        for n in warehouse.neighbours(v):
+            if dist[n] == d and n not in broken:
+                pred[v] = n
+                break
+        else:
+            broken.add(v)
+            queue.extend(_children(warehouse, dist, pred, v))
+
+    for v in broken:
+        dist[v] = UNREACHED
+        pred[v] = NO_PARENT
+
+    # Re-grow the broken cells from their intact border
+    heap = []
+    for v in broken:
+        best = NO_PARENT
+        for n in warehouse.neighbours(v):
+            if n not in broken and dist[n] != UNREACHED and (best == NO_PARENT or dist[n] < dist[best]):
+                best = n
+        if best != NO_PARENT:
+            heapq.heappush(heap, (dist[best] + 1, v, best))
+
+    while heap:
+        d, v, parent = heapq.heappop(heap)
+        if dist[v] != UNREACHED:
+            continue
+        dist[v] = d
+        pred[v] = parent
+        for n in warehouse.neighbours(v):
+            if n in broken and dist[n] == UNREACHED:
+                heapq.heappush(heap, (d + 1, n, v))
+
+    return len(broken) + 1
+
+
+def _wall_removed(warehouse, cell, dist, pred):
+    reached = [n for n in warehouse.neighbours(cell) if dist[n] != UNREACHED]
+    if not reached:
+        return 0
+
+    best = min(reached, key=lambda n: dist[n])
+    dist[cell] = dist[best] + 1
+    pred[cell] = best
+    changed = 1
+
+    # Push the shortcut outwards; with unit steps from a single seed a FIFO queue
+    # settles cells in distance order, and it stops wherever nothing improves.
+    queue = collections.deque([cell])
+    while queue:
+        v = queue.popleft()
+        d = dist[v] + 1
+        for n in warehouse.neighbours(v):
+            if dist[n] == UNREACHED or dist[n] > d:
+                dist[n] = d
+                pred[n] = v
+                changed += 1
+                queue.append(n)
+    return changed
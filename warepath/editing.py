@@ -0,0 +1,115 @@
+"""Region tools for drawing floors: rectangles, lines, flood fill and rows of racks.
+
+Every tool returns the cells it covers as a NumPy array of cell ids, clipped to the
+floor, and :func:`paint_walls` applies such an array in one go. A whole stroke is
+then one wall edit, one ``wall_key`` update and one cache invalidation
+(:meth:`FieldCache.walls_changed`), however many cells it covers. :func:`paint_costs`
+does the same for cell costs, which only change ``cost_key``.
+"""
+
+import numpy as np
+
+from .grid import FREE
+
+
+def rectangle_cells(warehouse, x0, y0, x1, y1, filled=True):
+    """Cells of the rectangle with corners (x0, y0) and (x1, y1), both included"""
+    x0, x1 = sorted((max(x0, 0), min(x1, warehouse.columns - 1)))
+    y0, y1 = sorted((max(y0, 0), min(y1, warehouse.rows - 1)))
+    xs = np.arange(x0, x1 + 1)
+    ys = np.arange(y0, y1 + 1)
+    block = ys[:, None] * warehouse.columns + xs[None, :]
+    if not filled and block.shape[0] > 2 and block.shape[1] > 2:
+        block = np.concatenate((block[0], block[-1], block[1:-1, 0], block[1:-1, -1]))
+    return block.ravel()
+
+
+def line_cells(warehouse, x0, y0, x1, y1):
+    """Cells on the straight line from (x0, y0) to (x1, y1), one per step along the longer axis"""
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    t = np.linspace(0, 1, steps + 1)
+    xs = np.rint(x0 + t * (x1 - x0)).astype(np.intp)
+    ys = np.rint(y0 + t * (y1 - y0)).astype(np.intp)
+    inside = (xs >= 0) & (xs < warehouse.columns) & (ys >= 0) & (ys < warehouse.rows)
+    return ys[inside] * warehouse.columns + xs[inside]
+
+
+def flood_cells(warehouse, x, y):
+    """The 4-connected area around (x, y) with the same occupancy: an open area or one block of shelves
+
+    Scanline fill: each row run of the area is found with ``bytearray.find`` and
+    ``rfind`` on the occupancy array, so the Python loop runs once per run, not once per cell.
+    """
+    occupancy = warehouse.occupancy
+    columns = warehouse.columns
+    seed = warehouse.cell(x, y)
+    kind = occupancy[seed]
+    other = bytes([1 - kind])  # FREE and WALL are 0 and 1
+    same = bytes([kind])
+
+    area = bytearray(warehouse.size)
+    pending = [seed]
+    while pending:
+        cell = pending.pop()
+        if area[cell]:
+            continue
+        row = cell - cell % columns
+        left = max(occupancy.rfind(other, row, cell) + 1, row)
+        right = occupancy.find(other, cell, row + columns)
+        if right == -1:
+            right = row + columns
+        area[left:right] = b"\x01" * (right - left)
+
+        # Start of every run of the same kind touching this one in the rows above and below
+        for start in (left - columns, left + columns):
+            if not 0 <= start < warehouse.size:
+                continue
+            end = start + (right - left)
+            p = occupancy.find(same, start, end)
+            while p != -1:
+                if not area[p]:
+                    pending.append(p)
+                p = occupancy.find(other, p, end)
+                if p == -1:
+                    break
+                p = occupancy.find(same, p, end)
+    return np.flatnonzero(np.frombuffer(area, dtype=np.uint8))
+
+
+def rack_cells(warehouse, x0, y0, x1, y1, rack=2, aisle=2, cross_every=0):
+    """Shelf cells for rows of racks filling a rectangle
+
+    Racks run along the longer side of the rectangle and are ``rack`` cells deep,
+    with ``aisle`` free cells between them. With ``cross_every`` a cross aisle of
+    ``aisle`` cells is left after every ``cross_every`` cells of rack.
+    """
+    block = rectangle_cells(warehouse, x0, y0, x1, y1)
+    ys, xs = np.divmod(block, warehouse.columns)
+    if ys.max() - ys.min() >= xs.max() - xs.min():
+        across, along = xs - xs.min(), ys - ys.min()  # tall rectangle: racks run top to bottom
+    else:
+        across, along = ys - ys.min(), xs - xs.min()
+    shelf = across % (rack + aisle) < rack
+    if cross_every:
+        shelf &= along % (cross_every + aisle) < cross_every
+    return block[shelf]
+
+
+def paint_walls(warehouse, cells, wall=True):
+    """Sets (or with ``wall=False`` clears) the walls on ``cells`` as one edit
+
+    Like single clicks, new walls never cover the depot or a target. Returns the
+    cells that changed, for the cache invalidation and for redrawing.
+    """
+    cells = np.asarray(cells, dtype=np.intp)
+    if wall:
+        kept = np.asarray([warehouse.start] + warehouse.targets, dtype=np.intp)
+        cells = cells[~np.isin(cells, kept)]
+    return warehouse.set_walls(cells, wall)
+
+
+def paint_costs(warehouse, cells, cost):
+    """Sets the cost of the free ``cells`` as one edit (shelves keep theirs); returns the cells that changed"""
+    cells = np.asarray(cells, dtype=np.intp)
+    free = np.frombuffer(warehouse.occupancy, dtype=np.uint8)[cells] == FREE
+    return warehouse.set_costs(cells[free], cost)
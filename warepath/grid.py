@@ -0,0 +1,235 @@
+"""Warehouse floor model backed by a flat occupancy array.
+
+Cells are plain integer ids, ``cell = y * columns + x``, so the search engines can
+index preallocated arrays instead of hashing objects.
+
+Every cell also has a small integer cost, 1 (normal floor) to ``MAX_COST``, for slow
+zones such as congestion near packing or pedestrian crossings. A step between two
+cells takes the mean of their costs, so on a floor with costs, distances count
+``TIME_SCALE`` units per step of cost 1 and stay whole numbers. A floor without
+costs keeps plain step counts.
+
+Pickers step to the four orthogonal neighbours unless ``Warehouse.diagonal`` is set.
+Then they may also step diagonally, but only when both cells beside the step are
+free, so they never cut the corner of a shelf. Distances are octile, in integers:
+a straight step counts ``STRAIGHT`` and a diagonal one ``DIAGONAL`` (7 / 5 = 1.4,
+within 1% of the square root of 2), times the cost factor above.
+"""
+
+import numpy as np
+
+# --- Configuration ---
+COLUMNS = 38
+ROWS = 38
+
+FREE = 0
+WALL = 1
+
+# Cell costs: time to cross a cell, in steps of normal floor
+MIN_COST = 1
+MAX_COST = 9
+TIME_SCALE = 2  # distance units per step of cost 1 on a floor with costs (a step costs the sum of both cells)
+
+# Octile step lengths with diagonal moves, in distance units
+STRAIGHT = 5
+DIAGONAL = 7
+
+_MASK64 = (1 << 64) - 1
+
+
+def wall_hash(cell):
+    """64-bit hash of one wall cell (splitmix64), XORed together into ``Warehouse.wall_key``"""
+    z = (cell * 0x9E3779B97F4A7C15 + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+def wall_key(cells):
+    """XOR of ``wall_hash`` over an array of cells, computed in uint64 NumPy arithmetic"""
+    z = np.asarray(cells, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        z = z * np.uint64(0x9E3779B97F4A7C15) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return int(np.bitwise_xor.reduce(z)) if len(z) else 0
+
+
+def cost_key(cells, costs):
+    """Hash of the cells whose cost is not ``MIN_COST``, XORed together into ``Warehouse.cost_key``"""
+    cells = np.asarray(cells, dtype=np.uint64)
+    costs = np.asarray(costs, dtype=np.uint64)
+    slow = costs != MIN_COST
+    return wall_key(cells[slow] * np.uint64(256) + costs[slow])
+
+
+class Warehouse:
+    """Everything the planner needs to know about one floor, no display involved"""
+
+    def __init__(self, columns=COLUMNS, rows=ROWS):
+        self.resize(columns, rows)
+        self.diagonal = False  # 8-connected movement (see moves), a setting that outlives create_grid
+
+    def resize(self, columns, rows):
+        """New floor size; clears the floor like create_grid"""
+        self.columns = columns
+        self.rows = rows
+        self.size = columns * rows
+        self.create_grid()
+
+    def create_grid(self):
+        self.occupancy = bytearray(self.size)  # WALL for shelves, FREE otherwise
+        self.wall_key = 0  # hash of the wall set, kept up to date by set_wall
+        self.cost = bytearray([MIN_COST]) * self.size  # per cell cost, MIN_COST to MAX_COST
+        self.cost_key = 0  # hash of the costs, kept up to date by set_costs
+        self.start = 0
+        self._targets = {}  # pick cells in placement order, as dict keys for O(1) lookups
+        self.target_index = {}  # cell -> position in the last planned tour
+
+    # --- Cell ids ---
+
+    def cell(self, x, y):
+        return y * self.columns + x
+
+    def coords(self, cell):
+        return cell % self.columns, cell // self.columns
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.columns and 0 <= y < self.rows
+
+    def is_wall(self, cell):
+        return self.occupancy[cell] == WALL
+
+    def set_wall(self, cell, wall=True):
+        """Single entry point for wall edits so ``wall_key`` stays in step with the walls"""
+        if (self.occupancy[cell] == WALL) != wall:
+            self.occupancy[cell] = WALL if wall else FREE
+            self.wall_key ^= wall_hash(cell)
+
+    def set_walls(self, cells, wall=True):
+        """Bulk ``set_wall`` as one array operation; returns the cells that actually changed"""
+        occupancy = np.frombuffer(self.occupancy, dtype=np.uint8)
+        hit = np.zeros(self.size, dtype=bool)  # a mask dedupes repeated cells without sorting
+        hit[np.asarray(cells, dtype=np.intp)] = True
+        changed = np.flatnonzero(hit & (occupancy != (WALL if wall else FREE)))
+        occupancy[changed] = WALL if wall else FREE
+        self.wall_key ^= wall_key(changed)
+        return changed
+
+    def set_costs(self, cells, costs):
+        """Sets the cost of ``cells``, ``costs`` being one value or one per cell; returns the cells that changed"""
+        cells = np.asarray(cells, dtype=np.intp).ravel()
+        costs = np.broadcast_to(np.asarray(costs, dtype=np.int64), cells.shape)
+        if len(costs) and (costs.min() < MIN_COST or costs.max() > MAX_COST):
+            raise ValueError(f"Cell costs go from {MIN_COST} to {MAX_COST}")
+        # The last cost given for a cell wins
+        cells, last = np.unique(cells[::-1], return_index=True)
+        costs = costs[::-1][last]
+        plane = np.frombuffer(self.cost, dtype=np.uint8)
+        changed = plane[cells] != costs
+        cells, costs = cells[changed], costs[changed]
+        self.cost_key ^= cost_key(cells, plane[cells]) ^ cost_key(cells, costs)
+        plane[cells] = costs
+        return cells
+
+    @property
+    def weighted(self):
+        """True when some cell costs more than ``MIN_COST``"""
+        return self.cost_key != 0
+
+    @property
+    def time_scale(self):
+        """Distance units per straight step of cost 1: 1, times ``TIME_SCALE`` with costs and ``STRAIGHT`` with diagonals"""
+        return (TIME_SCALE if self.weighted else 1) * (STRAIGHT if self.diagonal else 1)
+
+    def layout_key(self):
+        """Identifies the walls, costs and movement; distance fields computed under one key stay valid under it"""
+        return self.columns, self.rows, self.wall_key, self.cost_key, self.diagonal
+
+    def wall_cells(self):
+        # bytearray.find skips the free runs in C, which matters on big floors
+        cells = []
+        cell = self.occupancy.find(WALL)
+        while cell != -1:
+            cells.append(cell)
+            cell = self.occupancy.find(WALL, cell + 1)
+        return cells
+
+    # --- Targets ---
+
+    @property
+    def targets(self):
+        return list(self._targets)
+
+    @targets.setter
+    def targets(self, cells):
+        self._targets = dict.fromkeys(cells)
+
+    def is_target(self, cell):
+        return cell in self._targets
+
+    def neighbours(self, cell):
+        """Free 4-connected neighbours, in the same left/right/up/down order the boxes used"""
+        columns = self.columns
+        x = cell % columns
+        result = []
+        if x > 0: result.append(cell - 1)
+        if x < columns - 1: result.append(cell + 1)
+        if cell >= columns: result.append(cell - columns)
+        if cell < self.size - columns: result.append(cell + columns)
+        return [c for c in result if self.occupancy[c] != WALL]
+
+    def moves(self, cell):
+        """(neighbour, step length) for every step a picker can take from ``cell``
+
+        Without ``diagonal`` these are the :meth:`neighbours`, each of length 1. With
+        it, straight steps count ``STRAIGHT`` and diagonal ones ``DIAGONAL``, and a
+        diagonal step needs both cells beside it free.
+        """
+        if not self.diagonal:
+            return [(n, 1) for n in self.neighbours(cell)]
+        columns = self.columns
+        occupancy = self.occupancy
+        x = cell % columns
+        left = x > 0 and occupancy[cell - 1] != WALL
+        right = x < columns - 1 and occupancy[cell + 1] != WALL
+        up = cell >= columns and occupancy[cell - columns] != WALL
+        down = cell < self.size - columns and occupancy[cell + columns] != WALL
+        result = []
+        if left: result.append((cell - 1, STRAIGHT))
+        if right: result.append((cell + 1, STRAIGHT))
+        if up: result.append((cell - columns, STRAIGHT))
+        if down: result.append((cell + columns, STRAIGHT))
+        if up and left and occupancy[cell - columns - 1] != WALL: result.append((cell - columns - 1, DIAGONAL))
+        if up and right and occupancy[cell - columns + 1] != WALL: result.append((cell - columns + 1, DIAGONAL))
+        if down and left and occupancy[cell + columns - 1] != WALL: result.append((cell + columns - 1, DIAGONAL))
+        if down and right and occupancy[cell + columns + 1] != WALL: result.append((cell + columns + 1, DIAGONAL))
+        return result
+
+    # --- Edits (same rules as the mouse buttons in the editor) ---
+
+    def set_spawn(self, x, y):
+        cell = self.cell(x, y)
+        if cell in self._targets or self.occupancy[cell] == WALL:
+            return False
+        self.start = cell
+        return True
+
+    def toggle_target(self, x, y):
+        cell = self.cell(x, y)
+        if cell == self.start or self.occupancy[cell] == WALL:
+            return False
+        if cell not in self._targets:
+            self._targets[cell] = None
+        else:
+            del self._targets[cell]
+            self.target_index.pop(cell, None)
+        return True
+
+    def add_wall(self, x, y):
+        cell = self.cell(x, y)
+        if cell == self.start or cell in self._targets:
+            return False
+        self.set_wall(cell)
+        return True
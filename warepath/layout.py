@@ -0,0 +1,210 @@
+"""Saving and loading warehouse layouts, as CSV or as a compact binary file.
+
+CSV layouts are rows of ``kind,x,y``. The first row, ``size,columns,rows``, gives
+the floor size. Layouts saved before it existed have no such row and load as the
+default 38 x 38 floor. Cells slower than normal floor get a ``cost,x,y,cost`` row.
+CSV is easy to read and to edit by hand, but it needs one text row per shelf square.
+
+Binary layouts (``.wpl``) are made for big floors and are loaded through ``mmap``.
+The file holds:
+
+* a header: ``HEADER`` packed as magic, version, flags, columns, rows, start cell, target count
+* the wall plane, one bit per cell in cell id order (``numpy.packbits``, little bit order)
+* the targets as little-endian uint32 cell ids, in placement order
+* with the ``COST_PLANE`` flag, the cell costs, one byte per cell in cell id order
+
+Version 1 files (no flags, no costs) still load.
+
+:func:`load_layout` tells the two apart by the magic bytes, :func:`save_layout` by
+the file extension.
+"""
+
+import csv
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .grid import COLUMNS, MAX_COST, MIN_COST, ROWS, WALL, Warehouse, cost_key, wall_key
+from .profiling import timed
+
+MAGIC = b"WPLY"
+VERSION = 2
+HEADER = struct.Struct("<4sHHIIII")  # magic, version, flags, columns, rows, start, targets
+COST_PLANE = 1  # header flag: a cost plane follows the targets
+BINARY_SUFFIX = ".wpl"
+
+
+class LayoutError(ValueError):
+    """Raised for a layout file that cannot be read (bad rows or header, squares off the floor, cut short, bad costs)"""
+
+
+def save_layout(warehouse, name):
+    """Writes a binary layout for ``.wpl`` names and a CSV layout otherwise"""
+    with timed("save_layout"):
+        if os.path.splitext(name)[1].lower() == BINARY_SUFFIX:
+            save_binary_layout(warehouse, name)
+        else:
+            save_csv_layout(warehouse, name)
+
+
+def load_layout(file, warehouse=None):
+    """Fills ``warehouse`` (or a fresh one) from a layout file and returns it, resized to the layout"""
+    with open(file, 'rb') as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    with timed("load_layout"):
+        if binary:
+            return load_binary_layout(file, warehouse)
+        return load_csv_layout(file, warehouse)
+
+
+def convert_layout(source, target):
+    """Re-saves ``source`` in the format of the ``target`` name, e.g. CSV to ``.wpl``"""
+    warehouse = load_layout(source)
+    save_layout(warehouse, target)
+    return warehouse
+
+
+# --- CSV ---
+
+def save_csv_layout(warehouse, name):
+    with open(name, 'w', newline='') as file:
+        writer = csv.writer(file)
+
+        writer.writerow(["size", warehouse.columns, warehouse.rows])
+        for cell in warehouse.wall_cells():
+            writer.writerow(["wall", *warehouse.coords(cell)])
+        for cell in warehouse.targets:
+            writer.writerow(["target", *warehouse.coords(cell)])
+        writer.writerow(["spawn", *warehouse.coords(warehouse.start)])
+        if warehouse.weighted:
+            plane = np.frombuffer(warehouse.cost, dtype=np.uint8)
+            for cell in np.flatnonzero(plane != MIN_COST).tolist():
+                writer.writerow(["cost", *warehouse.coords(cell), int(plane[cell])])
+
+
+def load_csv_layout(file, warehouse=None):
+    with open(file, mode='r') as file:
+        layoutSheet = [row for row in csv.reader(file) if row]
+
+    columns, rows = COLUMNS, ROWS
+    if layoutSheet and layoutSheet[0][0] == "size":
+        columns, rows = _numbers(file, layoutSheet[0], 2)
+        if columns < 1 or rows < 1:
+            raise LayoutError(f"{file.name}: floor size {columns} x {rows}, both must be at least 1")
+        layoutSheet = layoutSheet[1:]
+    if warehouse is None:
+        warehouse = Warehouse(columns, rows)
+    else:
+        warehouse.resize(columns, rows)
+
+    walls = []
+    targets = {}  # cell -> None, like Warehouse keeps them
+    slow, costs = [], []
+    for row in layoutSheet:
+        x, y = _numbers(file, row, 2)
+        if not (0 <= x < columns and 0 <= y < rows):
+            raise LayoutError(f"{file.name}: {row[0]} {x},{y} lies outside the {columns} x {rows} floor")
+        cell = warehouse.cell(x, y)
+        if row[0] == "wall":
+            walls.append(cell)
+        #then targets (a repeated target row toggles it off again)
+        elif row[0] == "target":
+            if cell not in targets:
+                targets[cell] = None
+            else:
+                del targets[cell]
+        #then spawn setups
+        elif row[0] == "spawn":
+            warehouse.start = cell
+        elif row[0] == "cost":
+            slow.append(cell)
+            costs.append(_numbers(file, row, 3)[2])
+    warehouse.set_walls(walls)
+    warehouse.set_wall(warehouse.start, False)
+    warehouse.targets = list(targets)
+    try:
+        warehouse.set_costs(slow, costs)
+    except ValueError as e:
+        raise LayoutError(f"{file.name}: {e}") from None
+
+    return warehouse
+
+
+def _numbers(file, row, count):
+    """The first ``count`` numbers after the kind of a CSV row"""
+    if len(row) > count:
+        try:
+            return [int(value) for value in row[1:count + 1]]
+        except ValueError:
+            pass
+    raise LayoutError(f"{file.name}: bad row {','.join(row)!r}")
+
+
+# --- Binary ---
+
+def save_binary_layout(warehouse, name):
+    occupancy = np.frombuffer(warehouse.occupancy, dtype=np.uint8)
+    walls = np.packbits(occupancy == WALL, bitorder='little')
+    targets = np.asarray(warehouse.targets, dtype='<u4')
+    flags = COST_PLANE if warehouse.weighted else 0
+    with open(name, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, warehouse.columns, warehouse.rows, warehouse.start,
+                               len(targets)))
+        file.write(walls.tobytes())
+        file.write(targets.tobytes())
+        if flags & COST_PLANE:
+            file.write(warehouse.cost)
+
+
+def load_binary_layout(file, warehouse=None):
+    with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < HEADER.size:
+            raise LayoutError(f"{file}: too short for a layout header")
+        magic, version, flags, columns, rows, start, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise LayoutError(f"{file}: not a binary layout")
+        if version not in (1, VERSION):
+            raise LayoutError(f"{file}: layout version {version}, this WarePath reads up to version {VERSION}")
+        if version == 1:
+            flags = 0  # the field was reserved
+        size = columns * rows
+        plane = (size + 7) // 8
+        costs_at = HEADER.size + plane + 4 * count
+        if len(data) < costs_at + (size if flags & COST_PLANE else 0):
+            raise LayoutError(f"{file}: cut short")
+
+        bits = np.frombuffer(data, dtype=np.uint8, count=plane, offset=HEADER.size)
+        walls = np.unpackbits(bits, count=size, bitorder='little')
+        targets = np.frombuffer(data, dtype='<u4', count=count, offset=HEADER.size + plane).tolist()
+        del bits  # the mmap cannot close while NumPy still looks into it
+        if start >= size:
+            raise LayoutError(f"{file}: depot {start} lies outside the {columns} x {rows} floor")
+        if targets and max(targets) >= size:
+            raise LayoutError(f"{file}: target {max(targets)} lies outside the {columns} x {rows} floor")
+        if len(set(targets)) != len(targets):
+            raise LayoutError(f"{file}: a target is listed twice")
+        costs = None
+        if flags & COST_PLANE:
+            costs = np.frombuffer(data, dtype=np.uint8, count=size, offset=costs_at).copy()
+            if size and (costs.min() < MIN_COST or costs.max() > MAX_COST):
+                raise LayoutError(f"{file}: cell costs go from {MIN_COST} to {MAX_COST}")
+
+    if warehouse is None:
+        warehouse = Warehouse(columns, rows)
+    else:
+        warehouse.resize(columns, rows)
+    walls[start] = 0
+    # The whole wall plane at once, so wall_key is computed here instead of per set_wall
+    warehouse.occupancy = bytearray(walls.tobytes())  # unpackbits gives 0/1, the same as FREE/WALL
+    warehouse.wall_key = wall_key(np.flatnonzero(walls))
+    warehouse.start = start
+    warehouse.targets = targets
+    if costs is not None:
+        # Likewise the whole cost plane, keyed once
+        warehouse.cost = bytearray(costs.tobytes())
+        slow = np.flatnonzero(costs != MIN_COST)
+        warehouse.cost_key = cost_key(slow, costs[slow])
+    return warehouse
+
@@ -0,0 +1,228 @@
+"""Pairwise distances between the nodes of interest, with legs rebuilt only on demand.
+
+A :class:`RouteMatrix` keeps a dense n x n int32 distance matrix plus, for the
+flood engines, one int32 predecessor array per source. Cell paths are walked back
+from those arrays only for the legs somebody asks for (animation, export), and
+point to point engines simply search the leg again.
+
+On a floor with cell costs the matrix holds walking times (see :mod:`warepath.grid`)
+and the engines that count steps give way to ones that follow the costs: ``dial``
+for the floods and the corridor graph, ``astar`` for ``jps``. With diagonal moves it
+holds octile distances, and the 4-connected engines give way to ``dial`` (``jps``
+takes diagonal jumps).
+"""
+
+import numpy as np
+
+from . import wavefront
+from .corridors import CorridorGraph
+from .grid import WALL
+from .profiling import count, timed
+from .search import (UNREACHED, astar, bfs, column_jump_tables, dial, jps, jump_tables, manhattan, path_time,
+                     walk_back)
+
+ENGINES = ("auto", "wavefront", "bfs", "dial", "astar", "jps", "corridor")
+FLOOD_ENGINES = ("wavefront", "bfs", "dial")
+# Engines that count steps, and what stands in for them on a floor with cell costs
+STEP_ENGINES = {"wavefront": "dial", "bfs": "dial", "corridor": "dial", "jps": "astar"}
+# Engines limited to 4-connected moves, and what stands in for them with diagonal moves
+OCTILE_ENGINES = {"wavefront": "dial", "bfs": "dial", "corridor": "dial"}
+
+# "auto" assumes a point to point search expands about this many cells per unit of
+# Manhattan leg length, at roughly this many times the cost of a wavefront cell.
+LEG_BAND = 4
+POINT_TO_POINT_COST = 20
+# With diagonal moves a flood is dial stepping through Warehouse.moves, about this
+# many times the cost of a wavefront cell
+OCTILE_FLOOD_COST = 7
+# Instead of flooding, "auto" contracts floors of at least CORRIDOR_MIN_CELLS free cells
+# and runs Dijkstra on the corridor graph when a graph node, at roughly GRAPH_COST
+# times the cost of a wavefront cell, still comes out cheaper
+CORRIDOR_MIN_CELLS = 10000
+GRAPH_COST = 3
+
+
+class RouteMatrix:
+    def __init__(self, warehouse, nodes, dist, preds=None, search=None):
+        self.warehouse = warehouse
+        self.nodes = nodes
+        self.dist = dist  # (n, n) int32, UNREACHED where there is no path
+        self.preds = preds  # one predecessor array per node, or None for point to point engines
+        self.search = search  # leg search for point to point engines
+        self.scale = warehouse.time_scale  # dist units per step of cost 1
+        self._cells = {}  # (i, j) -> cells walked, on floors with costs where dist is a time
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, index):
+        return self.dist[index]
+
+    @property
+    def nbytes(self):
+        """Memory held by the matrix and the predecessor arrays"""
+        total = self.dist.nbytes
+        for pred in self.preds or ():
+            total += pred.itemsize * len(pred)
+        return total
+
+    def distance(self, i, j):
+        """Cells walked from nodes[i] to nodes[j]"""
+        if self.scale == 1:
+            return int(self.dist[i, j])
+        cells = self._cells.get((i, j))
+        if cells is None:
+            cells = self._cells[i, j] = self._cells[j, i] = len(self.leg(i, j) or ())
+        return cells
+
+    def time(self, i, j):
+        """Walking time from nodes[i] to nodes[j], in steps of cost 1"""
+        value = int(self.dist[i, j])
+        return value if self.scale == 1 else value / self.scale
+
+    def reachable(self, i, j):
+        return self.dist[i, j] != UNREACHED
+
+    def leg(self, i, j):
+        """Cells walked from nodes[i] (exclusive) to nodes[j] (inclusive)"""
+        if not self.reachable(i, j):
+            return None
+        count("legs walked")
+        if self.preds is not None:
+            return walk_back(self.nodes[i], self.nodes[j], self.preds[i])
+        return self.search(self.warehouse, self.nodes[i], self.nodes[j])
+
+    def tour_length(self, tour):
+        """Cells walked between consecutive tour entries (no return leg)"""
+        if self.scale != 1:
+            return sum(self.distance(tour[k], tour[k + 1]) for k in range(len(tour) - 1))
+        order = np.asarray(tour)
+        return int(self.dist[order[:-1], order[1:]].sum())
+
+    def tour_time(self, tour):
+        """Walking time between consecutive tour entries (no return leg)"""
+        order = np.asarray(tour)
+        value = int(self.dist[order[:-1], order[1:]].sum())
+        return value if self.scale == 1 else value / self.scale
+
+
+def build_fields(warehouse, sources, engine="wavefront", until=None):
+    """One (distance, predecessor) pair of arrays per source, indexed by cell id
+
+    ``until`` lets the wavefront engine stop once those cells are reached, leaving
+    the rest of each field ``UNREACHED``. Fields meant for a cache must be complete.
+    """
+    if engine == "bfs":
+        return [bfs(warehouse, source) for source in sources]
+    if engine == "dial":
+        return [dial(warehouse, source) for source in sources]
+    if engine == "wavefront":
+        dist = wavefront.distance_fields(warehouse, sources, until=until)
+        return [(row.copy(), wavefront.predecessors(warehouse, row)) for row in dist]
+    raise ValueError(f"Unknown flood engine {engine!r}, expected one of {', '.join(FLOOD_ENGINES)}")
+
+
+def choose_engine(warehouse, nodes):
+    """Point to point search while the legs are short next to the floor, one flood per node otherwise
+
+    The point to point search is A*, or with diagonal moves JPS, which skips the
+    symmetric diagonal paths across open floor.
+    """
+    n = len(nodes)
+    free_cells = warehouse.size - warehouse.occupancy.count(WALL)
+    columns = warehouse.columns
+    leg_cells = sum(manhattan(columns, nodes[i], nodes[j]) for i in range(n) for j in range(i + 1, n))
+    flood_cells = n * free_cells * (OCTILE_FLOOD_COST if warehouse.diagonal else 1)
+    if leg_cells * LEG_BAND * POINT_TO_POINT_COST < flood_cells:
+        return "jps" if warehouse.diagonal else "astar"
+    return "wavefront"
+
+
+def build_matrix(warehouse, nodes, engine="auto", cache=None):
+    """:class:`RouteMatrix` over ``nodes`` using the given engine
+
+    With a :class:`~warepath.cache.FieldCache` the flood engines reuse the fields of
+    nodes seen before on the same walls, and "auto" always floods so they can (except
+    with diagonal moves, where a flood is a Python Dijkstra). When the fields of all
+    nodes would not fit in the cache together they would only evict each other, so
+    "auto" then chooses as if there were no cache. On a floor with cell
+    costs or diagonal moves the engines are replaced (``STEP_ENGINES``, ``OCTILE_ENGINES``).
+    """
+    graph = None
+    with timed("matrix"):
+        if engine == "auto" and cache is not None and not cache.fits(warehouse, len(nodes)):
+            cache = None
+        if engine == "auto" and cache is not None and not warehouse.diagonal:
+            engine = "wavefront"
+        elif engine == "auto":
+            engine = choose_engine(warehouse, nodes)
+            free_cells = warehouse.size - warehouse.occupancy.count(WALL)
+            if engine == "wavefront" and free_cells >= CORRIDOR_MIN_CELLS and warehouse.time_scale == 1:
+                graph = CorridorGraph(warehouse, nodes)
+                if len(graph) * GRAPH_COST < free_cells:
+                    engine = "corridor"
+        if warehouse.diagonal:
+            engine = OCTILE_ENGINES.get(engine, engine)
+        if warehouse.weighted:
+            engine = STEP_ENGINES.get(engine, engine)
+        matrix = _build_matrix(warehouse, nodes, engine, cache, graph)
+    count("matrix nodes", len(nodes))
+    count("matrix bytes", matrix.nbytes)
+    return matrix
+
+
+def _build_matrix(warehouse, nodes, engine, cache, graph=None):
+    n_count = len(nodes)
+    columns = np.asarray(nodes, dtype=np.intp)
+
+    if engine == "wavefront" and cache is None:
+        # Only the node columns of the distance tensor are kept, the rest becomes predecessors
+        with timed("fields"):
+            fields = wavefront.distance_fields(warehouse, nodes, until=nodes)
+        with timed("predecessors"):
+            preds = [wavefront.predecessors(warehouse, row) for row in fields]
+        return RouteMatrix(warehouse, nodes, np.ascontiguousarray(fields[:, columns]), preds)
+
+    if engine in FLOOD_ENGINES:
+        with timed("fields"):
+            if cache is not None:
+                fields = cache.fields(warehouse, nodes, engine)
+            else:
+                fields = build_fields(warehouse, nodes, engine)
+        dist = np.empty((n_count, n_count), dtype=np.int32)
+        for i, (field, _) in enumerate(fields):
+            dist[i] = np.asarray(field)[columns]
+        return RouteMatrix(warehouse, nodes, dist, [pred for _, pred in fields])
+
+    if engine == "corridor":
+        # Dijkstra on the contracted floor; legs are expanded from the kept trees when drawn
+        if graph is None:
+            graph = CorridorGraph(warehouse, nodes)
+        index = graph.node_of[columns]
+        dist = np.full((n_count, n_count), UNREACHED, dtype=np.int32)
+        trees = {}
+        with timed("dijkstra"):
+            for i, node in enumerate(nodes):
+                field, trees[node] = graph.shortest_paths(node)
+                if index[i] >= 0:
+                    dist[i, index >= 0] = np.asarray(field, dtype=np.int32)[index[index >= 0]]
+        return RouteMatrix(warehouse, nodes, dist, search=lambda w, a, b: graph.path(trees[a], a, b))
+
+    if engine == "astar":
+        search = astar
+    elif engine == "jps":
+        tables = jump_tables(warehouse)
+        if warehouse.diagonal:
+            tables += column_jump_tables(warehouse)
+        search = lambda w, a, b: jps(w, a, b, tables)
+    else:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(ENGINES)}")
+
+    # Legs are symmetric, so each pair is searched once; paths are searched again when needed
+    dist = np.zeros((n_count, n_count), dtype=np.int32)
+    with timed("legs"):
+        for i in range(n_count):
+            for j in range(i + 1, n_count):
+                path = search(warehouse, nodes[i], nodes[j])
+                dist[i, j] = dist[j, i] = UNREACHED if path is None else path_time(warehouse, nodes[i], path)
+    return RouteMatrix(warehouse, nodes, dist, search=search)
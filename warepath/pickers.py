@@ -0,0 +1,126 @@
+"""Sharing one order between several pickers so the longest route is as short as possible.
+
+Every picker starts and ends at the depot. The plan minimises the makespan (the
+longest closed route), not the total distance. It is built in two steps. First one
+good giant tour over every pick is cut into ``k`` consecutive pieces with a DP.
+Then picks are moved off the longest route for as long as that shortens it, with
+2-opt/Or-opt re-run on the routes a move touches. Routes are lists of matrix
+indices starting at the depot (index 0), like tours.
+"""
+
+import time
+
+import numpy as np
+
+from .tours import TIME_BUDGET, improve_tour, nearest_neighbour, tour_length
+
+
+def plan_pickers(dist, pickers, time_budget=TIME_BUDGET):
+    """``pickers`` routes over all nodes of ``dist``; pickers left without work get ``[0]``"""
+    if pickers < 1:
+        raise ValueError("Need at least one picker")
+    start = time.perf_counter()
+    giant = improve_tour(dist, nearest_neighbour(dist), time_budget / 2)
+    routes = split_tour(dist, giant, pickers)
+    routes += [[0] for _ in range(pickers - len(routes))]
+
+    deadline = start + time_budget
+    routes = [_improve_route(dist, route, deadline) for route in routes]
+    return balance_routes(dist, routes, deadline)
+
+
+def makespan(dist, routes):
+    return max(tour_length(dist, route) for route in routes)
+
+
+def split_tour(dist, tour, pickers):
+    """Cuts the giant ``tour`` into at most ``pickers`` consecutive routes with the smallest makespan
+
+    ``cost[i, j]`` is the closed route over picks i..j of the tour. ``best[j]`` is
+    the smallest makespan covering picks 0..j with the routes used so far. Each
+    added route is one (n, n) NumPy step.
+    """
+    picks = np.asarray(tour[1:], dtype=np.intp)
+    n = len(picks)
+    if n == 0:
+        return [[0]]
+    pickers = min(pickers, n)
+
+    d = np.asarray(dist, dtype=np.int64)
+    walk = np.concatenate(([0], np.cumsum(d[picks[:-1], picks[1:]])))
+    cost = d[0, picks][:, None] + (walk[None, :] - walk[:, None]) + d[picks, 0][None, :]
+    inf = np.iinfo(np.int64).max
+    cost[np.tril_indices(n, -1)] = inf  # a route cannot end before it starts
+
+    best = cost[0].copy()
+    cuts = []  # cuts[m][j]: first pick of the last added route covering 0..j, or n if it was not needed
+    for _ in range(pickers - 1):
+        before = np.concatenate(([inf], best[:-1]))  # makespan of the routes before pick i
+        total = np.maximum(before[:, None], cost)
+        first = total.argmin(axis=0)
+        split = total[first, np.arange(n)]
+        # Without the triangle inequality one route fewer can be better
+        first[best <= split] = n
+        best = np.minimum(best, split)
+        cuts.append(first)
+
+    routes = []
+    end = n - 1
+    for first in reversed(cuts):
+        i = int(first[end])
+        if i == n:
+            continue
+        routes.append([0] + picks[i:end + 1].tolist())
+        end = i - 1
+    routes.append([0] + picks[:end + 1].tolist())
+    return routes[::-1]
+
+
+def balance_routes(dist, routes, deadline):
+    """Moves single picks off the longest route to the cheapest spot in another while that helps"""
+    d = dist.tolist()
+    routes = [list(route) for route in routes]
+    lengths = [tour_length(dist, route) for route in routes]
+
+    while len(routes) > 1 and time.perf_counter() < deadline:
+        longest = max(range(len(routes)), key=lambda r: lengths[r])
+        route = routes[longest]
+        best = None
+        for s in range(1, len(route)):
+            a, x, b = route[s - 1], route[s], route[(s + 1) % len(route)]
+            shorter = lengths[longest] - (d[a][x] + d[x][b] - d[a][b])
+            for r, other in enumerate(routes):
+                if r == longest:
+                    continue
+                added, gap = _cheapest_insert(d, other, x)
+                worst = max(shorter, lengths[r] + added)
+                if worst < lengths[longest] and (best is None or worst < best[0]):
+                    best = (worst, s, r, gap)
+
+        if best is None:
+            break
+        _, s, r, gap = best
+        routes[r].insert(gap + 1, route.pop(s))
+        for changed in (longest, r):
+            routes[changed] = _improve_route(dist, routes[changed], deadline)
+            lengths[changed] = tour_length(dist, routes[changed])
+    return routes
+
+
+def _cheapest_insert(d, route, x):
+    """(extra distance, position) of the cheapest gap in the closed ``route`` for node ``x``"""
+    best = None
+    for p in range(len(route)):
+        u, v = route[p], route[(p + 1) % len(route)]
+        added = d[u][x] + d[x][v] - d[u][v]
+        if best is None or added < best[0]:
+            best = (added, p)
+    return best
+
+
+def _improve_route(dist, route, deadline):
+    if len(route) < 4:
+        return route
+    sub = dist[np.ix_(route, route)]
+    order = improve_tour(sub, list(range(len(route))), max(deadline - time.perf_counter(), 0))
+    return [route[i] for i in order]
@@ -0,0 +1,418 @@
+"""Aisle routing policies: S-shape, return, largest gap and combined.
+
+These are the rules of thumb warehouses route pickers by. They work aisle by
+aisle and never need a distance matrix:
+
+* S-SHAPE walks through every aisle with a pick from end to end. In the last
+  aisle it turns back when the walk through would end on the far side.
+* RETURN enters and leaves every aisle with a pick from the end nearer the depot.
+* LARGEST-GAP walks through the first and the last aisle. In the aisles in
+  between, it picks from both ends and turns back at the largest gap between
+  neighbouring picks (or between the aisle end and a pick).
+* COMBINED decides aisle by aisle between walking through and turning back,
+  with a dynamic program over the end the picker is at.
+
+Aisles are found in the walls. An aisle is a run of rows whose free run has the
+same extent in every row and is at most ``MAX_AISLE_WIDTH`` cells wide (racks on
+both sides). Columns work the same way for horizontal aisles. The floor is routed
+along the direction that has more of the picks inside aisles. Picks outside any
+aisle are stops of their own. Cross aisles cut the floor into blocks, which are
+swept one by one in a serpentine away from the depot.
+
+A policy turns into waypoints: aisle ends and picks. Moves inside one aisle are
+Manhattan moves across its free rectangle. Each move between aisles is one A*
+search. Planning is sorting the picks by aisle plus one search per aisle change,
+so very large orders are fine.
+"""
+
+import numpy as np
+
+from .corridors import row_runs
+from .profiling import count, timed
+from .search import astar, manhattan, path_time
+from .wavefront import free_mask
+
+POLICIES = ("S-SHAPE", "RETURN", "LARGEST-GAP", "COMBINED")
+MAX_AISLE_WIDTH = 4  # lanes
+MIN_AISLE_LENGTH = 3  # rows
+
+# What a waypoint is for: walked past, a pick, or the depot at the end of a trip
+PASS, PICK, DEPOT = 0, 1, 2
+
+
+class PolicyRoute:
+    """The walked legs of a policy tour, with the interface of a :class:`RouteMatrix` for consecutive stops
+
+    Only the legs of the tour itself are known: ``distance(i, j)``, ``time(i, j)`` and
+    ``leg(i, j)`` work for each pair of stops the tour walks between, including the
+    return to 0.
+    """
+
+    def __init__(self, warehouse, nodes, legs, hops):
+        self.warehouse = warehouse
+        self.nodes = nodes  # [start] + picks in visiting order
+        self._legs = legs  # (i, j) -> (cells, time, waypoints from nodes[i] to nodes[j])
+        self._hops = hops  # (a, b) -> cells of an A* move between aisles
+        self.scale = warehouse.time_scale  # time units per step of cost 1
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def distance(self, i, j):
+        return self._legs[i, j][0]
+
+    def time(self, i, j):
+        value = self._legs[i, j][1]
+        return value if self.scale == 1 else value / self.scale
+
+    def reachable(self, i, j):
+        return (i, j) in self._legs
+
+    def leg(self, i, j):
+        """Cells walked from nodes[i] (exclusive) to nodes[j] (inclusive)"""
+        _, _, waypoints = self._legs[i, j]
+        count("legs walked")
+        cells = []
+        for a, b in zip(waypoints, waypoints[1:]):
+            hop = self._hops.get((a, b))
+            cells.extend(hop if hop is not None else _straight(self.warehouse.columns, a, b))
+        return cells
+
+    def tour_length(self, tour):
+        """Cells walked between consecutive tour entries (no return leg)"""
+        return sum(self.distance(tour[k], tour[k + 1]) for k in range(len(tour) - 1))
+
+    def tour_time(self, tour):
+        """Walking time between consecutive tour entries (no return leg)"""
+        return sum(self.time(tour[k], tour[k + 1]) for k in range(len(tour) - 1))
+
+
+class AisleMap:
+    """Aisles of one floor, along columns (vertical) and along rows (horizontal)
+
+    ``aisle_of[vertical]`` maps a cell id to its aisle, -1 outside any aisle.
+    ``aisles[vertical]`` holds one (first lane, last lane, first position,
+    last position) tuple per aisle, where lanes run across the aisle and
+    positions along it.
+    """
+
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        free = free_mask(warehouse)
+        vertical_of, vertical = _find_aisles(free)
+        horizontal_of, horizontal = _find_aisles(free.T)
+        self.aisle_of = {True: vertical_of.ravel(), False: horizontal_of.T.ravel()}
+        self.aisles = {True: vertical, False: horizontal}
+
+    def direction(self, picks):
+        """True (vertical) when at least as many of ``picks`` lie in vertical aisles as in horizontal ones"""
+        picks = np.asarray(picks, dtype=np.intp)
+        return bool((self.aisle_of[True][picks] >= 0).sum() >= (self.aisle_of[False][picks] >= 0).sum())
+
+    def blocks(self, picks, vertical):
+        """The picks as :class:`Stop` lists, one per block of side by side aisles, each sorted across the block
+
+        Aisles whose rows overlap share a block and cross aisles separate the blocks.
+        A pick outside the aisles is a stop of its own in the block nearest to it.
+        Blocks come in order along the aisles.
+        """
+        columns = self.warehouse.columns
+        aisle_of = self.aisle_of[vertical]
+        aisles = self.aisles[vertical]
+
+        grouped = {}
+        lone = []
+        for pick in picks:
+            y, x = divmod(pick, columns)
+            across, along = (x, y) if vertical else (y, x)
+            aisle = int(aisle_of[pick])
+            if aisle < 0:
+                lone.append(Stop(across, along, along, [(along, pick)], vertical, columns))
+                continue
+            stop = grouped.get(aisle)
+            if stop is None:
+                first, _, v0, v1 = aisles[aisle]
+                stop = grouped[aisle] = Stop(first, v0, v1, [], vertical, columns)
+            stop.picks.append((along, pick))
+
+        blocks = []
+        bounds = []  # (first, last) position of each block
+        for stop in sorted(grouped.values(), key=lambda stop: stop.v0):
+            if blocks and stop.v0 <= bounds[-1][1]:
+                blocks[-1].append(stop)
+                bounds[-1] = (bounds[-1][0], max(bounds[-1][1], stop.v1))
+            else:
+                blocks.append([stop])
+                bounds.append((stop.v0, stop.v1))
+        for stop in lone:
+            if not blocks:
+                blocks.append([])
+                bounds.append((stop.v0, stop.v0))
+            k = min(range(len(blocks)), key=lambda k: max(bounds[k][0] - stop.v0, stop.v0 - bounds[k][1], 0))
+            blocks[k].append(stop)
+
+        for block in blocks:
+            block.sort(key=lambda stop: (stop.across, stop.v0))
+            for stop in block:
+                stop.picks.sort()
+        return blocks
+
+
+class Stop:
+    """An aisle with picks (or a lone pick), with its ends 0 and 1 at positions ``v0`` and ``v1`` of lane ``across``"""
+
+    def __init__(self, across, v0, v1, picks, vertical, columns):
+        self.across = across
+        self.v0 = v0
+        self.v1 = v1
+        self.picks = picks  # (position along the aisle, cell), sorted by position
+        if vertical:
+            self.ends = (v0 * columns + across, v1 * columns + across)
+        else:
+            self.ends = (across * columns + v0, across * columns + v1)
+
+    @property
+    def length(self):
+        return self.v1 - self.v0
+
+    def depth(self, end):
+        """How far into the aisle the farthest pick is, seen from ``end``"""
+        return self.picks[-1][0] - self.v0 if end == 0 else self.v1 - self.picks[0][0]
+
+    def walk_through(self, end):
+        """Waypoints entering at ``end`` and leaving at the other one"""
+        return self.turn_back(end)[:-1] + [(self.ends[1 - end], PASS)]
+
+    def turn_back(self, end, picks=None):
+        """Waypoints entering at ``end``, going as deep as the farthest of ``picks`` (default all) and back out"""
+        picks = self.picks if picks is None else picks
+        ordered = picks if end == 0 else picks[::-1]
+        return [(self.ends[end], PASS)] + [(cell, PICK) for _, cell in ordered] + [(self.ends[end], PASS)]
+
+    def split_at_largest_gap(self, front):
+        """(picks reached from ``front``, picks reached from the other end)
+
+        The gaps are between neighbouring picks and between each aisle end and its
+        nearest pick; the widest one is never walked.
+        """
+        depths = [along - self.v0 if front == 0 else self.v1 - along for along, _ in self.picks]
+        ordered = sorted(range(len(depths)), key=depths.__getitem__)
+        marks = [0] + [depths[i] for i in ordered] + [self.length]
+        gaps = [b - a for a, b in zip(marks, marks[1:])]
+        widest = gaps.index(max(gaps))
+        near = sorted(self.picks[i] for i in ordered[:widest])
+        far = sorted(self.picks[i] for i in ordered[widest:])
+        return near, far
+
+
+def plan_policy(warehouse, policy, picks=None, capacity=None, aisle_map=None):
+    """(route, tour) for one of ``POLICIES`` over ``picks`` (default the targets), or None when a pick is unreachable
+
+    With a tote ``capacity`` the picks are cut into trips of that many, in the
+    order the policy visits them, and each trip is routed by the policy again.
+    """
+    policy = policy.upper()
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}, expected one of {', '.join(POLICIES)}")
+    picks = list(warehouse.targets if picks is None else picks)
+    with timed("policy"):
+        aisle_map = aisle_map or AisleMap(warehouse)
+        vertical = aisle_map.direction(picks)
+        trips = [picks]
+        if capacity and len(picks) > capacity:
+            order = [cell for cell, role in _waypoints(warehouse, aisle_map, picks, vertical, policy) if role == PICK]
+            trips = [order[i:i + capacity] for i in range(0, len(order), capacity)]
+
+        waypoints = [(warehouse.start, PASS)]
+        for trip in trips:
+            waypoints += _waypoints(warehouse, aisle_map, trip, vertical, policy)
+            waypoints.append((warehouse.start, DEPOT))
+        return _build_route(warehouse, waypoints, aisle_map.aisle_of[vertical])
+
+
+def _waypoints(warehouse, aisle_map, picks, vertical, policy):
+    """(cell, role) for one trip, from the depot to the end of the last aisle visited
+
+    Blocks are swept one after the other away from the depot, in a serpentine:
+    the first across the floor away from the depot's side, the next one back.
+    """
+    start = warehouse.start
+    columns = warehouse.columns
+    blocks = aisle_map.blocks(picks, vertical)
+    if not blocks:
+        return []
+    depot_across, depot_along = (start % columns, start // columns) if vertical else divmod(start, columns)
+    if abs(blocks[-1][0].v0 - depot_along) < abs(blocks[0][0].v0 - depot_along):
+        blocks.reverse()
+    stops = [stop for block in blocks for stop in block]
+    if abs(stops[-1].across - depot_across) < abs(stops[0].across - depot_across):
+        for block in blocks:
+            block.reverse()
+    for block in blocks[1::2]:
+        block.reverse()
+
+    if policy == "COMBINED":
+        return _combined(columns, start, [stop for block in blocks for stop in block])
+    walk = []
+    at = start
+    for k, block in enumerate(blocks):
+        after = blocks[k + 1][0].ends[0] if k + 1 < len(blocks) else start  # where the walk goes next
+        walk += _sweep(columns, policy, block, at, after)
+        at = walk[-1][0]
+    return walk
+
+
+def _sweep(columns, policy, stops, at, after):
+    """Waypoints of one block for S-SHAPE, RETURN or LARGEST-GAP, walking on from ``at`` towards ``after``"""
+    def nearer(stop, cell):
+        return 0 if manhattan(columns, cell, stop.ends[0]) <= manhattan(columns, cell, stop.ends[1]) else 1
+
+    walk = []
+    if policy == "S-SHAPE":
+        for k, stop in enumerate(stops):
+            end = nearer(stop, walk[-1][0] if walk else at)
+            if k == len(stops) - 1 and end == nearer(stop, after):
+                walk += stop.turn_back(end)  # walking through would leave on the wrong side
+            else:
+                walk += stop.walk_through(end)
+    elif policy == "RETURN":
+        for stop in stops:
+            walk += stop.turn_back(nearer(stop, at))
+    elif len(stops) == 1:
+        walk += stops[0].turn_back(nearer(stops[0], at))
+    else:
+        # Out through the first aisle, along the back picking the far parts, back through
+        # the last aisle and along the front picking the near parts
+        front = nearer(stops[0], at)
+        middle = stops[1:-1]
+        splits = [stop.split_at_largest_gap(front) for stop in middle]
+        walk += stops[0].walk_through(front)
+        for stop, (_, far) in zip(middle, splits):
+            if far:
+                walk += stop.turn_back(1 - front, far)
+        walk += stops[-1].walk_through(1 - front)
+        for stop, (near, _) in zip(middle[::-1], splits[::-1]):
+            if near:
+                walk += stop.turn_back(front, near)
+    return walk
+
+
+def _combined(columns, start, stops):
+    """Walks through or turns back in each aisle, whichever makes the whole sweep shortest
+
+    ``best[end]`` is the shortest estimated walk that has done the aisles so far and
+    stands at that end of the last one. Moves between aisles count as Manhattan.
+    """
+    best = {0: 0, 1: 0}
+    at = {0: start, 1: start}
+    choices = []
+    for stop in stops:
+        step = {}
+        for came in (0, 1):
+            for enter in (0, 1):
+                walk = best[came] + manhattan(columns, at[came], stop.ends[enter])
+                for through in (True, False):
+                    leave = 1 - enter if through else enter
+                    total = walk + (stop.length if through else 2 * stop.depth(enter))
+                    if leave not in step or total < step[leave][0]:
+                        step[leave] = (total, came, enter, through)
+        choices.append(step)
+        best = {end: step[end][0] for end in step}
+        at = {end: stop.ends[end] for end in step}
+
+    end = min(best, key=lambda e: best[e] + manhattan(columns, at[e], start))
+    parts = []
+    for stop, step in zip(stops[::-1], choices[::-1]):
+        _, came, enter, through = step[end]
+        parts.append(stop.walk_through(enter) if through else stop.turn_back(enter))
+        end = came
+    return [waypoint for part in parts[::-1] for waypoint in part]
+
+
+def _build_route(warehouse, waypoints, aisle_of):
+    """Prices the waypoints into one leg per pair of consecutive stops, None when a move has no path
+
+    Two waypoints in the same aisle are a Manhattan move across its free rectangle,
+    anything else is an A* search, kept for drawing the leg later. Each leg is priced
+    in cells and in time, which differ on a floor with cell costs.
+    """
+    columns = warehouse.columns
+    weighted = warehouse.weighted
+    scale = warehouse.time_scale  # time units per straight step of cost 1
+    nodes = [warehouse.start]
+    tour = [0]
+    legs = {}
+    hops = {}
+    visited = set()
+
+    leg = [warehouse.start]  # waypoints since the last stop
+    distance = time = 0
+    for cell, role in waypoints[1:]:
+        here = leg[-1]
+        if cell != here:
+            if aisle_of[here] >= 0 and aisle_of[here] == aisle_of[cell]:
+                steps = manhattan(columns, here, cell)
+                distance += steps
+                time += path_time(warehouse, here, _straight(columns, here, cell)) if weighted else steps * scale
+            else:
+                hop = hops.get((here, cell))
+                if hop is None:
+                    hop = astar(warehouse, here, cell)
+                    if hop is None:
+                        return None
+                    hops[here, cell] = hop
+                distance += len(hop)
+                time += path_time(warehouse, here, hop)
+            leg.append(cell)
+
+        if role == DEPOT:
+            stop = 0
+        elif role == PICK and cell not in visited:
+            visited.add(cell)
+            nodes.append(cell)
+            stop = len(nodes) - 1
+        else:
+            continue
+        legs[tour[-1], stop] = (distance, time, leg)
+        tour.append(stop)
+        leg = [cell]
+        distance = time = 0
+    count("policy searches", len(hops))
+
+    tour.pop()  # the last return to the depot stays implicit, as in every tour
+    return PolicyRoute(warehouse, nodes, legs, hops), tour
+
+
+def _straight(columns, a, b):
+    """Cells of a Manhattan move from ``a`` (exclusive) to ``b`` inside one free rectangle, along the row first"""
+    ay, ax = divmod(a, columns)
+    by, bx = divmod(b, columns)
+    step = 1 if bx > ax else -1
+    cells = [ay * columns + x for x in range(ax + step, bx + step, step)]
+    step = 1 if by > ay else -1
+    cells += [y * columns + bx for y in range(ay + step, by + step, step)]
+    return cells
+
+
+def _find_aisles(free):
+    """Vertical aisles of a (rows, columns) grid: (aisle id per cell, (first lane, last lane, first row, last row) per aisle)"""
+    left, right, same, runs = row_runs(free)
+    continues = np.zeros_like(free)
+    continues[1:] = same  # this row run has the same extent as the one above
+
+    # Run starts column by column, top to bottom; a run that doesn't continue the one above starts an aisle
+    starts = free & (left == np.arange(free.shape[1]))
+    xs, ys = np.nonzero(starts.T)
+    first = ~continues[ys, xs]
+    label = np.cumsum(first) - 1
+    heads = np.flatnonzero(first)
+    tails = np.append(heads[1:] - 1, len(ys) - 1)
+    u0, u1 = xs[heads], right[ys[heads], xs[heads]]
+    v0, v1 = ys[heads], ys[tails]
+    keep = (v1 - v0 + 1 >= MIN_AISLE_LENGTH) & (u1 - u0 + 1 <= MAX_AISLE_WIDTH)
+
+    number = np.cumsum(keep) - 1  # aisles kept, renumbered from 0
+    by_run = np.full(runs.max() + 1, -1, dtype=np.int32)
+    by_run[runs[ys, xs]] = np.where(keep[label], number[label], -1)
+    aisles = list(zip(u0[keep].tolist(), u1[keep].tolist(), v0[keep].tolist(), v1[keep].tolist()))
+    return by_run[runs], aisles
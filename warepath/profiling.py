@@ -0,0 +1,130 @@
+"""Lightweight instrumentation: nested timers and counters, exported as JSON lines or a Chrome trace.
+
+Timers nest, so ``with timed("matrix")`` inside ``with timed("route")`` is kept
+under the path ``route/matrix``. Every timer keeps its count, total, last and
+longest time, and the most recent ``EVENT_LIMIT`` timings are kept one by one
+for the exports. Counters are plain running sums ("cells expanded", "frames drawn").
+
+Everything goes to one module-level :data:`PROFILER`. It is cheap enough to leave
+on (a timer costs about a microsecond, and only whole phases are timed, never
+single cells), and ``PROFILER.enabled = False`` turns it into a no-op.
+"""
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Most recent timings kept one by one for the exports, older ones only count in the totals
+EVENT_LIMIT = 20000
+
+
+class TimerStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0  # seconds
+        self.last = 0.0
+        self.longest = 0.0
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Profiler:
+    def __init__(self, event_limit=EVENT_LIMIT):
+        self.enabled = True
+        self.origin = time.perf_counter()  # trace timestamps count from here
+        self.events = collections.deque(maxlen=event_limit)  # (path, start, seconds, thread id)
+        self.timers = {}  # path -> TimerStats, in order of first use
+        self.counters = collections.Counter()
+        self._local = threading.local()  # per thread stack of open timer names
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.events.clear()
+        self.timers.clear()
+        self.counters.clear()
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        if not self.enabled:
+            yield
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+        path = "/".join(stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            stats = self.timers.get(path)
+            if stats is None:
+                stats = self.timers[path] = TimerStats()
+            stats.count += 1
+            stats.total += seconds
+            stats.last = seconds
+            stats.longest = max(stats.longest, seconds)
+            self.events.append((path, start, seconds, threading.get_ident()))
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    # --- Exports ---
+
+    def summary(self):
+        """Timers and counters as one JSON-ready dict, times in seconds"""
+        return {
+            "timers": {path: {"count": s.count, "total": s.total, "average": s.average, "last": s.last,
+                              "longest": s.longest} for path, s in self.timers.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_json_lines(self, file):
+        """One line per kept timing, then one with the totals of each timer, then one with the counters"""
+        with open(file, "w") as f:
+            for path, start, seconds, thread in self.events:
+                f.write(json.dumps({"timer": path, "start": start - self.origin, "seconds": seconds,
+                                    "thread": thread}) + "\n")
+            for path, stats in self.summary()["timers"].items():
+                f.write(json.dumps({"timer": path, "totals": stats}) + "\n")
+            f.write(json.dumps({"counters": dict(self.counters)}) + "\n")
+
+    def write_chrome_trace(self, file):
+        """Trace Event Format, for chrome://tracing or https://ui.perfetto.dev"""
+        pid = os.getpid()
+        events = []
+        for path, start, seconds, thread in self.events:
+            events.append({"name": path.rsplit("/", 1)[-1], "cat": "warepath", "ph": "X", "pid": pid, "tid": thread,
+                           "ts": (start - self.origin) * 1e6, "dur": seconds * 1e6, "args": {"path": path}})
+        now = (time.perf_counter() - self.origin) * 1e6
+        for name, value in self.counters.items():
+            events.append({"name": name, "cat": "warepath", "ph": "C", "pid": pid, "ts": now, "args": {name: value}})
+        with open(file, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def write(self, file):
+        """JSON lines for ``.jsonl`` names, a Chrome trace otherwise"""
+        if file.endswith(".jsonl"):
+            self.write_json_lines(file)
+        else:
+            self.write_chrome_trace(file)
+
+
+PROFILER = Profiler()
+
+
+def timed(name):
+    """``with timed("phase"):`` times the block on :data:`PROFILER`"""
+    return PROFILER.timed(name)
+
+
+def count(name, amount=1):
+    PROFILER.count(name, amount)
@@ -0,0 +1,305 @@
+"""Pick tours for a warehouse, shared by the editor and the CLI."""
+
+from .matrix import build_matrix
+from .pickers import plan_pickers
+from .policies import POLICIES, plan_policy
+from .profiling import timed
+from .search import UNREACHED, dial, walk_back
+from .tours import TIME_BUDGET, join_trips, nearest_neighbour, solve_tour, split_trips, tour_length
+
+TOUR_MODES = ("SEQUENCE", "GREEDY", "OPTIMIZED", "EXACT")  # tours over a distance matrix
+MODES = TOUR_MODES + POLICIES
+
+
+class RoutingError(Exception):
+    """Raised when a tour cannot be planned (no targets, unreachable targets, ...)"""
+
+
+class SimulationResult:
+    def __init__(self, mode, matrix, tour):
+        self.mode = mode
+        self.matrix = matrix  # a RouteMatrix, or a PolicyRoute for the aisle policies
+        self.nodes = matrix.nodes  # [start] + targets as cell ids, tour entries index into this
+        self.tour = tour  # with a tote capacity the depot (0) shows up again between trips
+        self.table = []  # rows for the right sidebar: [point, distance, units, time]
+        self.return_table = []
+        self.optimal = False  # True when the tour is proven shortest (EXACT on a small order)
+        self.greedy_time = None  # closed GREEDY tour time, kept by EXACT for the gap
+        self._picking_path = None
+        self._return_path = None
+
+    @property
+    def picking_path(self):
+        """Cells walked from the depot to the last pick, rebuilt from the matrix on first use"""
+        if self._picking_path is None:
+            self._picking_path = []
+            for k in range(len(self.tour) - 1):
+                self._picking_path.extend(self.matrix.leg(self.tour[k], self.tour[k + 1]))
+        return self._picking_path
+
+    @property
+    def picking_steps(self):
+        """(cell, "PICKING" or "RETURN") for every cell walked before the final return
+
+        The trips back to the depot to empty the tote are the "RETURN" steps in here.
+        """
+        steps = []
+        for k in range(len(self.tour) - 1):
+            kind = "RETURN" if self.tour[k + 1] == 0 else "PICKING"
+            steps.extend((cell, kind) for cell in self.matrix.leg(self.tour[k], self.tour[k + 1]))
+        return steps
+
+    @property
+    def trips(self):
+        """The tour cut at the depot: one list per trip, each starting with 0"""
+        trips = []
+        for node in self.tour:
+            if node == 0:
+                trips.append([0])
+            else:
+                trips[-1].append(node)
+        return trips
+
+    @property
+    def return_path(self):
+        """Cells walked from the last pick back to the depot"""
+        if self._return_path is None:
+            self._return_path = self.matrix.leg(self.tour[-1], 0) or []
+        return self._return_path
+
+    @property
+    def picking_distance(self):
+        return self.matrix.tour_length(self.tour)
+
+    @property
+    def return_distance(self):
+        return self.matrix.distance(self.tour[-1], 0)
+
+    @property
+    def total_distance(self):
+        return self.picking_distance + self.return_distance
+
+    @property
+    def picking_time(self):
+        """Walking time to the last pick, in steps of cost 1 (the same as the distance on a floor without costs)"""
+        return self.matrix.tour_time(self.tour)
+
+    @property
+    def return_time(self):
+        return self.matrix.time(self.tour[-1], 0)
+
+    @property
+    def total_time(self):
+        return self.picking_time + self.return_time
+
+    @property
+    def optimality_gap(self):
+        """How much longer the GREEDY tour takes than the optimum, as a fraction (None unless optimal)"""
+        if not self.optimal:
+            return None
+        return (self.greedy_time - self.total_time) / max(self.total_time, 1)
+
+
+class PickerResult:
+    def __init__(self, matrix):
+        self.mode = "PICKERS"
+        self.matrix = matrix
+        self.nodes = matrix.nodes
+        self.routes = []  # one SimulationResult per picker, a picker without picks has tour [0]
+        self.table = []  # one row per picker: [picker, distance, units, time]
+        self.return_table = []
+
+    @property
+    def makespan(self):
+        """Time of the longest route, the time the whole order takes"""
+        return max(route.total_time for route in self.routes)
+
+    @property
+    def total_distance(self):
+        return sum(route.total_distance for route in self.routes)
+
+    @property
+    def total_time(self):
+        return sum(route.total_time for route in self.routes)
+
+
+def bfs_distance_map(warehouse, start_node):
+    """Distance and predecessor arrays (indexed by cell id) for every cell reachable from ``start_node``
+
+    On a floor with cell costs the distances are walking times (see :func:`dial`).
+    """
+    return dial(warehouse, start_node)
+
+
+def get_path_between(start_node, end_node, parent_map):
+    return walk_back(start_node, end_node, parent_map)
+
+
+def run_simulation(warehouse, mode, units=1, engine="auto", cache=None, time_budget=TIME_BUDGET, capacity=None):
+    """Plans a pick tour over ``warehouse.targets`` and returns the walked paths and table rows
+
+    OPTIMIZED starts from the GREEDY tour and improves it with local search for at
+    most ``time_budget`` seconds. EXACT solves orders of up to ``EXACT_LIMIT`` picks
+    optimally (Held-Karp) and falls back to OPTIMIZED above that. With a tote
+    ``capacity`` the tour is split into trips back to the depot (see :func:`split_trips`).
+    The aisle policies of :data:`POLICIES` route without a matrix (see :func:`plan_policy`).
+    """
+    mode = mode.upper()
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+    if mode in POLICIES:
+        return _run_policy(warehouse, mode, units, capacity)
+
+    with timed("route"):
+        matrix = _target_matrix(warehouse, engine, cache)
+
+        # Determine Tour
+        with timed("tour"):
+            tour, optimal = solve_tour(matrix.dist, mode, time_budget)
+        if capacity and len(tour) - 1 > capacity:
+            with timed("trips"):
+                tour = join_trips(split_trips(matrix.dist, tour, capacity))
+            optimal = False  # the shortest single loop, not the shortest set of trips
+
+        result = SimulationResult(mode, matrix, tour)
+        if optimal:
+            result.optimal = True
+            result.greedy_time = tour_length(matrix.dist, nearest_neighbour(matrix.dist)) / matrix.scale
+        _fill_tables(result, warehouse, units)
+
+    # What the greedy heuristic would have cost on top of the optimum
+    if result.optimal:
+        extra = result.greedy_time - result.total_time
+        result.return_table.append(["GAP", "", f"{100 * result.optimality_gap:.1f}%", rounded_time(extra)])
+
+    return result
+
+
+def compare_modes(warehouse, modes=MODES, units=1, engine="auto", cache=None, time_budget=TIME_BUDGET,
+                  capacity=None):
+    """[(mode, SimulationResult)] for every mode over the same targets, quickest first
+
+    The stop numbers drawn on the targets stay those of the quickest tour. Pass a
+    :class:`~warepath.cache.FieldCache` to build the fields for the matrix modes once.
+    """
+    results = []
+    for mode in modes:
+        results.append((mode, run_simulation(warehouse, mode, units, engine, cache, time_budget, capacity)))
+    results.sort(key=lambda item: item[1].total_time)
+    warehouse.target_index = {}
+    _number_targets(results[0][1], warehouse)
+    return results
+
+
+def run_pickers(warehouse, pickers, units=1, engine="auto", cache=None, time_budget=TIME_BUDGET, capacity=None):
+    """Shares ``warehouse.targets`` between ``pickers`` pickers, keeping the longest route short
+
+    Every picker gets its own :class:`SimulationResult` over the same matrix. The
+    summary table has one row per picker plus the makespan and the total. With a
+    tote ``capacity`` each picker's route is split into trips afterwards.
+    """
+    with timed("route"):
+        matrix = _target_matrix(warehouse, engine, cache)
+        result = PickerResult(matrix)
+        with timed("pickers"):
+            routes = plan_pickers(matrix.dist, pickers, time_budget)
+        for route in routes:
+            if capacity and len(route) - 1 > capacity:
+                with timed("trips"):
+                    route = join_trips(split_trips(matrix.dist, route, capacity))
+            picker = SimulationResult("PICKERS", matrix, route)
+            _fill_tables(picker, warehouse, units)
+            result.routes.append(picker)
+
+    for p, picker in enumerate(result.routes):
+        result.table.append([f"P{p + 1}", picker.total_distance, picker.total_distance * units,
+                             rounded_time(picker.total_time)])
+    longest = max(result.routes, key=lambda picker: picker.total_time)
+    result.return_table.append(["MAX", longest.total_distance, longest.total_distance * units, rounded_time(result.makespan)])
+    result.return_table.append(["F. SUM", result.total_distance, result.total_distance * units,
+                                rounded_time(result.total_time)])
+    return result
+
+
+def _run_policy(warehouse, policy, units, capacity):
+    if not warehouse.targets:
+        raise RoutingError("Add some pick locations (Right Click) first.")
+    warehouse.target_index = {}
+    with timed("route"):
+        planned = plan_policy(warehouse, policy, capacity=capacity)
+        if planned is None:
+            raise RoutingError("Some targets are unreachable!")
+        route, tour = planned
+        result = SimulationResult(policy, route, tour)
+        _fill_tables(result, warehouse, units)
+    return result
+
+
+def _target_matrix(warehouse, engine, cache):
+    targets = warehouse.targets
+    if not targets:
+        raise RoutingError("Add some pick locations (Right Click) first.")
+
+    warehouse.target_index = {}
+
+    nodes_of_interest = [warehouse.start] + targets
+
+    # Build Matrix
+    matrix = build_matrix(warehouse, nodes_of_interest, engine, cache)
+
+    # Everything reachable from the depot is reachable from every other node too
+    if (matrix.dist[0] == UNREACHED).any():
+        raise RoutingError("Some targets are unreachable!")
+    return matrix
+
+
+def _fill_tables(result, warehouse, units):
+    """Table rows for one tour, and the stop numbers drawn on its targets"""
+    tour = result.tour
+    matrix = result.matrix
+
+    # --- OUTBOUND (Picking) legs, cell paths are only walked back when drawn ---
+    # Trips back to the depot in between are listed as "T{trip} RTN"
+    trip = 1
+    stop = 0
+    for k in range(len(tour) - 1):
+        u_idx = tour[k]
+        v_idx = tour[k + 1]
+
+        current_distance = matrix.distance(u_idx, v_idx)
+        current_time = rounded_time(matrix.time(u_idx, v_idx))
+        if v_idx == 0:
+            result.table.append([f"T{trip} RTN", f"{current_distance:.0f}", current_distance * units, current_time])
+            trip += 1
+            continue
+        result.table.append([f"S{stop}", f"{current_distance:.0f}", current_distance * units, current_time])
+        stop += 1
+    _number_targets(result, warehouse)
+
+    sum = 0
+    sum_units = 0
+    for row in result.table:
+        sum += int(row[1])
+        sum_units += int(row[2])
+
+    result.table.append(["I. SUM", sum, sum_units, rounded_time(result.picking_time)])
+
+    # --- RETURN leg ---
+    return_distance = result.return_distance
+    result.return_table.append(["RTRN", f"{return_distance:.0f}", return_distance * units, rounded_time(result.return_time)])
+    result.return_table.append(["F. SUM", return_distance + sum, return_distance * units + sum_units,
+                                rounded_time(result.total_time)])
+
+
+def rounded_time(time):
+    """A walking time as shown in the tables: whole numbers as ints, the rest to one decimal"""
+    return int(time) if time == int(time) else round(time, 1)
+
+
+def _number_targets(result, warehouse):
+    """Stop numbers drawn on the targets, in the order ``result`` picks them"""
+    stop = 0
+    for node in result.tour:
+        if node != 0:
+            stop += 1
+            warehouse.target_index[result.nodes[node]] = stop
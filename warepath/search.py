@@ -0,0 +1,555 @@
+"""Shortest-path engines over the flat occupancy array of a :class:`Warehouse`.
+
+Distances and predecessors live in preallocated ``array('i')`` buffers indexed by
+cell id. Unreached cells keep ``UNREACHED`` and the source has ``NO_PARENT``.
+On a floor with cell costs or diagonal moves, distances are in ``warehouse.time_scale``
+units (see :mod:`warepath.grid`). :func:`dial` and :func:`astar` handle both, :func:`jps`
+handles diagonal moves, and :func:`bfs` counts 4-connected steps.
+"""
+
+import heapq
+from array import array
+
+import numpy as np
+
+from .grid import DIAGONAL, MAX_COST, STRAIGHT, TIME_SCALE, WALL
+from .profiling import count
+
+UNREACHED = -1
+NO_PARENT = -1
+
+
+def new_field(size):
+    """Blank distance and predecessor buffers for ``size`` cells"""
+    return array('i', [UNREACHED]) * size, array('i', [NO_PARENT]) * size
+
+
+def bfs(warehouse, source, dist=None, pred=None):
+    """Breadth first search from ``source`` filling ``dist`` and ``pred`` in place"""
+    size = warehouse.size
+    columns = warehouse.columns
+    occupancy = warehouse.occupancy
+
+    if dist is None or pred is None:
+        dist, pred = new_field(size)
+    else:
+        dist[:] = array('i', [UNREACHED]) * size
+        pred[:] = array('i', [NO_PARENT]) * size
+
+    dist[source] = 0
+
+    # The queue never holds more than one entry per cell, so a growing list with
+    # a read cursor is enough and avoids deque bookkeeping.
+    queue = [source]
+    head = 0
+    last_row = size - columns
+
+    while head < len(queue):
+        current = queue[head]
+        head += 1
+        d = dist[current] + 1
+        x = current % columns
+
+        # Same left/right/up/down order the old Box neighbour lists used
+        if x > 0:
+            n = current - 1
+            if dist[n] == UNREACHED and occupancy[n] != WALL:
+                dist[n] = d
+                pred[n] = current
+                queue.append(n)
+        if x < columns - 1:
+            n = current + 1
+            if dist[n] == UNREACHED and occupancy[n] != WALL:
+                dist[n] = d
+                pred[n] = current
+                queue.append(n)
+        if current >= columns:
+            n = current - columns
+            if dist[n] == UNREACHED and occupancy[n] != WALL:
+                dist[n] = d
+                pred[n] = current
+                queue.append(n)
+        if current < last_row:
+            n = current + columns
+            if dist[n] == UNREACHED and occupancy[n] != WALL:
+                dist[n] = d
+                pred[n] = current
+                queue.append(n)
+
+    count("cells expanded", len(queue))
+    return dist, pred
+
+
+def dial(warehouse, source, dist=None, pred=None):
+    """Dijkstra over the cell costs with a bucket queue (Dial), filling ``dist`` and ``pred`` in place
+
+    A step costs at most ``2 * MAX_COST``, so a ring of that many buckets plus one
+    holds every pending distance. The buckets are emptied in distance order,
+    which costs a list pop per cell instead of a heap operation. A plain 4-connected
+    floor is searched with :func:`bfs`.
+    """
+    if not warehouse.weighted and not warehouse.diagonal:
+        return bfs(warehouse, source, dist, pred)
+    size = warehouse.size
+    columns = warehouse.columns
+    occupancy = warehouse.occupancy
+    cost = warehouse.cost
+
+    if dist is None or pred is None:
+        dist, pred = new_field(size)
+    else:
+        dist[:] = array('i', [UNREACHED]) * size
+        pred[:] = array('i', [NO_PARENT]) * size
+
+    dist[source] = 0
+    if warehouse.diagonal:
+        count("cells expanded", _dial_moves(warehouse, source, dist, pred))
+        return dist, pred
+    ring = 2 * MAX_COST + 1
+    buckets = [[] for _ in range(ring)]
+    buckets[0].append(source)
+    pending = 1
+    expanded = 0
+    last_row = size - columns
+
+    d = 0
+    while pending:
+        bucket = buckets[d % ring]
+        while bucket:
+            current = bucket.pop()
+            pending -= 1
+            if dist[current] != d:
+                continue  # reached again on a shorter path since it was queued
+            expanded += 1
+            here = d + cost[current]
+            x = current % columns
+
+            # Same left/right/up/down order as bfs
+            if x > 0:
+                n = current - 1
+                if occupancy[n] != WALL:
+                    nd = here + cost[n]
+                    if dist[n] == UNREACHED or nd < dist[n]:
+                        dist[n] = nd
+                        pred[n] = current
+                        buckets[nd % ring].append(n)
+                        pending += 1
+            if x < columns - 1:
+                n = current + 1
+                if occupancy[n] != WALL:
+                    nd = here + cost[n]
+                    if dist[n] == UNREACHED or nd < dist[n]:
+                        dist[n] = nd
+                        pred[n] = current
+                        buckets[nd % ring].append(n)
+                        pending += 1
+            if current >= columns:
+                n = current - columns
+                if occupancy[n] != WALL:
+                    nd = here + cost[n]
+                    if dist[n] == UNREACHED or nd < dist[n]:
+                        dist[n] = nd
+                        pred[n] = current
+                        buckets[nd % ring].append(n)
+                        pending += 1
+            if current < last_row:
+                n = current + columns
+                if occupancy[n] != WALL:
+                    nd = here + cost[n]
+                    if dist[n] == UNREACHED or nd < dist[n]:
+                        dist[n] = nd
+                        pred[n] = current
+                        buckets[nd % ring].append(n)
+                        pending += 1
+        d += 1
+
+    count("cells expanded", expanded)
+    return dist, pred
+
+
+def _dial_moves(warehouse, source, dist, pred):
+    """The bucket loop of :func:`dial` over :meth:`Warehouse.moves`, for diagonal moves; returns the cells expanded"""
+    cost = warehouse.cost
+    weighted = warehouse.weighted
+    moves = warehouse.moves
+    ring = DIAGONAL * (2 * MAX_COST if weighted else 1) + 1
+    buckets = [[] for _ in range(ring)]
+    buckets[0].append(source)
+    pending = 1
+    expanded = 0
+
+    d = 0
+    while pending:
+        bucket = buckets[d % ring]
+        while bucket:
+            current = bucket.pop()
+            pending -= 1
+            if dist[current] != d:
+                continue
+            expanded += 1
+            here = cost[current]
+            for n, length in moves(current):
+                nd = d + (length * (here + cost[n]) if weighted else length)
+                if dist[n] == UNREACHED or nd < dist[n]:
+                    dist[n] = nd
+                    pred[n] = current
+                    buckets[nd % ring].append(n)
+                    pending += 1
+        d += 1
+    return expanded
+
+
+def path_time(warehouse, source, path):
+    """Length of ``path`` (cells after ``source``, as the searches return them) in ``warehouse.time_scale`` units"""
+    weighted = warehouse.weighted
+    diagonal = warehouse.diagonal
+    if not weighted and not diagonal:
+        return len(path)
+    columns = warehouse.columns
+    cost = warehouse.cost
+    total = 0
+    previous = source
+    for cell in path:
+        length = 1
+        if diagonal:
+            # From the coordinates, as id differences overlap on floors two columns wide
+            y, x = divmod(cell, columns)
+            py, px = divmod(previous, columns)
+            length = DIAGONAL if x != px and y != py else STRAIGHT
+        total += length * (cost[previous] + cost[cell]) if weighted else length
+        previous = cell
+    return total
+
+
+def walk_back(source, target, pred):
+    """Cells from ``source`` (exclusive) to ``target`` (inclusive) using a predecessor array"""
+    path = []
+    curr = target
+    while curr != source and curr != NO_PARENT:
+        path.append(curr)
+        curr = int(pred[curr])
+    return path[::-1]
+
+
+# --- Point to point search ---
+# Used when only a handful of legs are needed on a big floor. These touch a small
+# part of the grid, so they keep their bookkeeping in dicts instead of full-size arrays.
+
+def manhattan(columns, a, b):
+    return abs(a % columns - b % columns) + abs(a // columns - b // columns)
+
+
+def octile(columns, a, b):
+    """Shortest distance from ``a`` to ``b`` with diagonal moves on open floor, in ``STRAIGHT`` units"""
+    dx = abs(a % columns - b % columns)
+    dy = abs(a // columns - b // columns)
+    return STRAIGHT * max(dx, dy) + (DIAGONAL - STRAIGHT) * min(dx, dy)
+
+
+def astar(warehouse, source, target):
+    """A* with a Manhattan (or with diagonal moves, octile) heuristic, returns the leg like ``walk_back`` or None
+
+    Cell costs are followed; every step costs at least its length on a floor of
+    cost 1, which keeps the scaled heuristic admissible.
+    """
+    if source == target:
+        return []
+    columns = warehouse.columns
+    tx, ty = target % columns, target // columns
+    weighted = warehouse.weighted
+    cost = warehouse.cost
+    diagonal = warehouse.diagonal
+    factor = TIME_SCALE if weighted else 1  # least cost of a step of length 1
+
+    g = {source: 0}
+    parent = {source: NO_PARENT}
+    closed = set()
+    # Ties on f go to the deeper node so straight corridors are followed, not flooded
+    open_heap = [(factor * (octile if diagonal else manhattan)(columns, source, target), 0, source)]
+
+    while open_heap:
+        _, _, current = heapq.heappop(open_heap)
+        if current == target:
+            count("cells expanded", len(closed))
+            return walk_back(source, target, parent)
+        if current in closed:
+            continue
+        closed.add(current)
+
+        if diagonal:
+            for n, length in warehouse.moves(current):
+                d = g[current] + (length * (cost[current] + cost[n]) if weighted else length)
+                if d < g.get(n, d + 1):
+                    g[n] = d
+                    parent[n] = current
+                    dx, dy = abs(n % columns - tx), abs(n // columns - ty)
+                    h = STRAIGHT * max(dx, dy) + (DIAGONAL - STRAIGHT) * min(dx, dy)
+                    heapq.heappush(open_heap, (d + factor * h, -d, n))
+            continue
+        d = g[current] + 1
+        for n in warehouse.neighbours(current):
+            if weighted:
+                d = g[current] + cost[current] + cost[n]
+            if d < g.get(n, d + 1):
+                g[n] = d
+                parent[n] = current
+                h = abs(n % columns - tx) + abs(n // columns - ty)
+                heapq.heappush(open_heap, (d + factor * h, -d, n))
+    count("cells expanded", len(closed))
+    return None
+
+
+def jps(warehouse, source, target, tables=None):
+    """Jump Point Search, returns the leg like ``walk_back`` or None
+
+    Straight runs without forced neighbours are skipped in one jump, so open floor
+    and long aisles cost a scan instead of a heap entry per cell. Horizontal jumps
+    are lookups in ``tables`` (see :func:`jump_tables`), pass them in when searching
+    many legs on the same walls. With diagonal moves the search is :func:`jps_diagonal`.
+    """
+    if warehouse.diagonal:
+        return jps_diagonal(warehouse, source, target, tables)
+    if source == target:
+        return []
+    columns, rows = warehouse.columns, warehouse.rows
+    occupancy = warehouse.occupancy
+    tx, ty = target % columns, target // columns
+    right, left = (tables if tables is not None else jump_tables(warehouse))[:2]
+
+    def free(x, y):
+        return 0 <= x < columns and 0 <= y < rows and occupancy[y * columns + x] != WALL
+
+    def jump_horizontal(x, y, dx):
+        stop = int(right[y * columns + x] if dx > 0 else left[y * columns + x])
+        # Every cell strictly between x and the stop is free, so the goal is hit first if it is in there
+        if y == ty and (x < tx <= stop if dx > 0 else stop <= tx < x):
+            return tx, y
+        if stop < 0 or stop >= columns or occupancy[y * columns + stop] == WALL:
+            return None
+        return stop, y
+
+    def jump_vertical(x, y, dy):
+        while True:
+            y += dy
+            if not free(x, y):
+                return None
+            if x == tx and y == ty:
+                return x, y
+            if (free(x - 1, y) and not free(x - 1, y - dy)) or (free(x + 1, y) and not free(x + 1, y - dy)):
+                return x, y
+            # Vertical runs also stop where a sideways jump would find something
+            if jump_horizontal(x, y, 1) is not None or jump_horizontal(x, y, -1) is not None:
+                return x, y
+
+    g = {source: 0}
+    parent = {source: NO_PARENT}
+    closed = set()
+    open_heap = [(manhattan(columns, source, target), 0, source)]
+
+    while open_heap:
+        _, _, current = heapq.heappop(open_heap)
+        if current == target:
+            break
+        if current in closed:
+            continue
+        closed.add(current)
+
+        x, y = current % columns, current // columns
+        p = parent[current]
+        if p == NO_PARENT:
+            directions = ((-1, 0), (1, 0), (0, -1), (0, 1))
+        else:
+            px, py = p % columns, p // columns
+            dx = (x > px) - (x < px)
+            dy = (y > py) - (y < py)
+            if dx:
+                directions = ((dx, 0), (0, -1), (0, 1))
+            else:
+                directions = ((0, dy), (-1, 0), (1, 0))
+
+        for dx, dy in directions:
+            found = jump_horizontal(x, y, dx) if dx else jump_vertical(x, y, dy)
+            if found is None:
+                continue
+            jx, jy = found
+            n = jy * columns + jx
+            d = g[current] + abs(jx - x) + abs(jy - y)
+            if d < g.get(n, d + 1):
+                g[n] = d
+                parent[n] = current
+                heapq.heappush(open_heap, (d + abs(jx - tx) + abs(jy - ty), -d, n))
+    else:
+        count("jump points expanded", len(closed))
+        return None
+    count("jump points expanded", len(closed))
+
+    # Fill in the straight runs between jump points
+    path = []
+    curr = target
+    while curr != source:
+        prev = parent[curr]
+        step = (1 if curr > prev else -1) * (1 if curr // columns == prev // columns else columns)
+        while curr != prev:
+            path.append(curr)
+            curr -= step
+    return path[::-1]
+
+
+def jps_diagonal(warehouse, source, target, tables=None):
+    """8-connected Jump Point Search without corner cutting, returns the leg like ``walk_back`` or None
+
+    A diagonal step needs both cells beside it free, so a straight jump only stops
+    where an opening appears beside the run (the same forced neighbours as
+    :func:`jump_tables` marks), and every jump point also tries both turns. A
+    diagonal jump stops where one of its two straight jumps finds something.
+    Symmetric paths across open floor are never pushed, so a leg over an empty hall
+    costs a few jump points. ``tables`` are :func:`jump_tables` followed by
+    :func:`column_jump_tables`.
+    """
+    if source == target:
+        return []
+    columns, rows = warehouse.columns, warehouse.rows
+    occupancy = warehouse.occupancy
+    tx, ty = target % columns, target // columns
+    if tables is None:
+        tables = jump_tables(warehouse) + column_jump_tables(warehouse)
+    right, left, down, up = tables
+
+    def free(x, y):
+        return 0 <= x < columns and 0 <= y < rows and occupancy[y * columns + x] != WALL
+
+    def jump_horizontal(x, y, dx):
+        stop = int(right[y * columns + x] if dx > 0 else left[y * columns + x])
+        if y == ty and (x < tx <= stop if dx > 0 else stop <= tx < x):
+            return tx, y
+        if stop < 0 or stop >= columns or occupancy[y * columns + stop] == WALL:
+            return None
+        return stop, y
+
+    def jump_vertical(x, y, dy):
+        stop = int(down[y * columns + x] if dy > 0 else up[y * columns + x])
+        if x == tx and (y < ty <= stop if dy > 0 else stop <= ty < y):
+            return x, ty
+        if stop < 0 or stop >= rows or occupancy[stop * columns + x] == WALL:
+            return None
+        return x, stop
+
+    def jump_diagonal(x, y, dx, dy):
+        while free(x + dx, y) and free(x, y + dy) and free(x + dx, y + dy):
+            x += dx
+            y += dy
+            if (x == tx and y == ty) or jump_horizontal(x, y, dx) or jump_vertical(x, y, dy):
+                return x, y
+        return None
+
+    g = {source: 0}
+    parent = {source: NO_PARENT}
+    closed = set()
+    open_heap = [(octile(columns, source, target), 0, source)]
+
+    while open_heap:
+        _, _, current = heapq.heappop(open_heap)
+        if current == target:
+            break
+        if current in closed:
+            continue
+        closed.add(current)
+
+        x, y = current % columns, current // columns
+        p = parent[current]
+        if p == NO_PARENT:
+            directions = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1))
+        else:
+            px, py = p % columns, p // columns
+            dx = (x > px) - (x < px)
+            dy = (y > py) - (y < py)
+            if dx and dy:
+                directions = ((dx, 0), (0, dy), (dx, dy))
+            elif dx:
+                directions = ((dx, 0), (0, -1), (0, 1), (dx, -1), (dx, 1))
+            else:
+                directions = ((0, dy), (-1, 0), (1, 0), (-1, dy), (1, dy))
+
+        for dx, dy in directions:
+            if dx and dy:
+                found = jump_diagonal(x, y, dx, dy)
+            elif dx:
+                found = jump_horizontal(x, y, dx)
+            else:
+                found = jump_vertical(x, y, dy)
+            if found is None:
+                continue
+            jx, jy = found
+            n = jy * columns + jx
+            d = g[current] + (DIAGONAL * abs(jx - x) if dx and dy else STRAIGHT * (abs(jx - x) + abs(jy - y)))
+            if d < g.get(n, d + 1):
+                g[n] = d
+                parent[n] = current
+                heapq.heappush(open_heap, (d + octile(columns, n, target), -d, n))
+    else:
+        count("jump points expanded", len(closed))
+        return None
+    count("jump points expanded", len(closed))
+
+    # Fill in the straight and diagonal runs between jump points
+    path = []
+    curr = target
+    while curr != source:
+        prev = parent[curr]
+        sx = (curr % columns > prev % columns) - (curr % columns < prev % columns)
+        sy = (curr // columns > prev // columns) - (curr // columns < prev // columns)
+        step = sx + sy * columns
+        while curr != prev:
+            path.append(curr)
+            curr -= step
+    return path[::-1]
+
+
+def jump_tables(warehouse):
+    """Where a horizontal jump from each cell stops, going right and going left
+
+    A jump stops on the first cell with a forced neighbour (an opening above or below
+    that was blocked one step back), or on the first wall / the edge of the grid.
+    Both tables hold x coordinates, indexed by cell id; -1 and ``columns`` are the edges.
+    They only depend on the walls, so one pair serves every leg of a matrix build.
+    """
+    rows, columns = warehouse.rows, warehouse.columns
+    plane = np.frombuffer(warehouse.occupancy, dtype=np.uint8).reshape(rows, columns) != WALL
+    right, left = _row_jumps(plane)
+    return right.ravel(), left.ravel()
+
+
+def column_jump_tables(warehouse):
+    """:func:`jump_tables` for vertical jumps: where a jump stops going down and going up
+
+    Both tables hold y coordinates, indexed by cell id; -1 and ``rows`` are the edges.
+    """
+    rows, columns = warehouse.rows, warehouse.columns
+    plane = np.frombuffer(warehouse.occupancy, dtype=np.uint8).reshape(rows, columns) != WALL
+    down, up = _row_jumps(plane.T)
+    return np.ascontiguousarray(down.T).ravel(), np.ascontiguousarray(up.T).ravel()
+
+
+def _row_jumps(plane):
+    """(right, left) stops of horizontal jumps on a (rows, columns) grid of free cells, as x per cell"""
+    columns = plane.shape[1]
+    up = np.zeros_like(plane)
+    up[1:] = plane[:-1]
+    down = np.zeros_like(plane)
+    down[:-1] = plane[1:]
+    x = np.broadcast_to(np.arange(columns), plane.shape)
+
+    opened = np.zeros_like(plane)  # moving right into x opens up/down
+    opened[:, 1:] = (up[:, 1:] & ~up[:, :-1]) | (down[:, 1:] & ~down[:, :-1])
+    stop = np.where(opened | ~plane, x, columns)
+    right = np.empty(plane.shape, dtype=np.int32)
+    right[:, :-1] = np.minimum.accumulate(stop[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    right[:, -1] = columns
+
+    opened[:] = False  # moving left into x opens up/down
+    opened[:, :-1] = (up[:, :-1] & ~up[:, 1:]) | (down[:, :-1] & ~down[:, 1:])
+    stop = np.where(opened | ~plane, x, -1)
+    left = np.empty(plane.shape, dtype=np.int32)
+    left[:, 1:] = np.maximum.accumulate(stop, axis=1)[:, :-1]
+    left[:, 0] = -1
+    return right, left
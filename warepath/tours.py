@@ -0,0 +1,266 @@
+"""Tour construction and improvement over a route matrix.
+
+Tours are lists of matrix indices starting at the depot (index 0). They are
+closed: the picker walks back from the last entry to the depot, so every move
+below prices the return leg in as well.
+"""
+
+import time
+
+import numpy as np
+
+# How many nearest nodes each node considers when looking for improving moves
+CANDIDATES = 8
+# Default wall-clock budget for local search, in seconds
+TIME_BUDGET = 0.2
+# Largest pick count solved exactly; the DP table holds 2**n * n entries
+EXACT_LIMIT = 16
+
+
+def solve_tour(dist, mode, time_budget=TIME_BUDGET):
+    """Tour for one of the routing modes, plus whether it is proven optimal
+
+    SEQUENCE keeps placement order, GREEDY is nearest neighbour, OPTIMIZED improves
+    the greedy tour with local search, EXACT runs Held-Karp up to ``EXACT_LIMIT``
+    picks and falls back to OPTIMIZED above that.
+    """
+    n_count = len(dist)
+    if mode == "SEQUENCE":
+        return list(range(n_count)), False
+    greedy = nearest_neighbour(dist)
+    if mode == "GREEDY":
+        return greedy, False
+    if mode == "EXACT" and n_count - 1 <= EXACT_LIMIT:
+        return held_karp(dist), True
+    if mode in ("OPTIMIZED", "EXACT"):
+        return improve_tour(dist, greedy, time_budget), False
+    raise ValueError(f"Unknown mode {mode!r}")
+
+
+def split_trips(dist, tour, capacity):
+    """Cuts ``tour`` into depot-returning trips of at most ``capacity`` picks, shortest in total
+
+    Route first, cluster second: the pick order of ``tour`` is kept and the DP only
+    decides after which picks the picker walks back to the depot to empty the tote.
+    ``best[j]`` is the shortest walk that has collected the first j picks and is back
+    at the depot, and each trip start i relaxes the at most ``capacity`` trips that
+    begin there, so the whole split is O(n * capacity).
+    """
+    picks = [int(node) for node in tour[1:]]
+    n = len(picks)
+    if n == 0:
+        return [list(tour)]
+    out = dist[0, picks].tolist()
+    back = dist[picks, 0].tolist()
+    step = dist[picks[:-1], picks[1:]].tolist()
+
+    best = [0] + [None] * n
+    start = [0] * (n + 1)  # start[j]: first pick of the last trip in best[j]
+    for i in range(n):
+        walk = best[i] + out[i]
+        for j in range(i, min(n, i + capacity)):
+            if j > i:
+                walk += step[j - 1]
+            total = walk + back[j]
+            if best[j + 1] is None or total < best[j + 1]:
+                best[j + 1] = total
+                start[j + 1] = i
+
+    trips = []
+    j = n
+    while j > 0:
+        i = start[j]
+        trips.append([0] + picks[i:j])
+        j = i
+    return trips[::-1]
+
+
+def join_trips(trips):
+    """One tour visiting the depot between trips, e.g. [0, a, b, 0, c] (the last return stays implicit)"""
+    tour = [0]
+    for trip in trips:
+        if len(tour) > 1:
+            tour.append(0)
+        tour.extend(trip[1:])
+    return tour
+
+
+def tour_length(dist, tour, closed=True):
+    order = np.asarray(tour)
+    length = int(dist[order[:-1], order[1:]].sum())
+    if closed:
+        length += int(dist[order[-1], order[0]])
+    return length
+
+
+def nearest_neighbour(dist, start=0):
+    """Greedy tour from ``start``: always walk to the closest unvisited node (lowest index on ties)"""
+    n_count = len(dist)
+    visited = np.zeros(n_count, dtype=bool)
+    visited[start] = True
+    current_idx = start
+    tour = [start]
+    for _ in range(n_count - 1):
+        row = np.where(visited, np.iinfo(np.int32).max, dist[current_idx])
+        current_idx = int(row.argmin())
+        visited[current_idx] = True
+        tour.append(current_idx)
+    return tour
+
+
+def candidate_lists(dist, k=CANDIDATES):
+    """For every node, the ``k`` other nodes closest to it, nearest first"""
+    order = np.argsort(dist, axis=1, kind='stable')
+    near = []
+    for i, row in enumerate(order.tolist()):
+        near.append([j for j in row[:k + 1] if j != i][:k])
+    return near
+
+
+def improve_tour(dist, tour, time_budget=TIME_BUDGET, candidates=CANDIDATES):
+    """Runs 2-opt, Or-opt and relocate moves until none improves or the budget runs out
+
+    Only moves that connect a node to one of its ``candidates`` nearest neighbours are
+    tried, and each one is priced by the change in its edges alone. The depot stays first.
+    """
+    t = list(tour)
+    if len(t) < 4:
+        return t
+    deadline = time.perf_counter() + time_budget
+    d = dist.tolist()
+    near = candidate_lists(dist, candidates)
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = _two_opt(d, t, near, deadline)
+        for length in (1, 2, 3):  # length 1 is a plain relocate
+            improved |= _or_opt(d, t, near, length, deadline)
+    return t
+
+
+def _reverse(t, pos, i, j):
+    """Reverses the cyclic run of positions i..j, or its complement so the depot never moves"""
+    n = len(t)
+    if i == 0 or i > j:
+        i, j = (j + 1) % n, (i - 1) % n
+    t[i:j + 1] = t[i:j + 1][::-1]
+    for p in range(i, j + 1):
+        pos[t[p]] = p
+
+
+def _two_opt(d, t, near, deadline):
+    n = len(t)
+    pos = [0] * n
+    for p, node in enumerate(t):
+        pos[node] = p
+
+    improved = False
+    for a in range(n):
+        if time.perf_counter() > deadline:
+            break
+        # Edge to the successor, then edge to the predecessor
+        for step in (1, -1):
+            p = pos[a]
+            b = t[(p + step) % n]
+            d_ab = d[a][b]
+            for c in near[a]:
+                d_ac = d[a][c]
+                if d_ac >= d_ab:
+                    break
+                q = pos[c]
+                e = t[(q + step) % n]
+                if d_ac + d[b][e] - d_ab - d[c][e] < 0:
+                    if step == 1:
+                        _reverse(t, pos, (p + 1) % n, q)
+                    else:
+                        _reverse(t, pos, p, (q - 1) % n)
+                    improved = True
+                    break
+    return improved
+
+
+def _or_opt(d, t, near, length, deadline):
+    n = len(t)
+    improved = False
+    s = 1
+    while s + length <= n:
+        if time.perf_counter() > deadline:
+            break
+        segment = t[s:s + length]
+        first, last = segment[0], segment[-1]
+        prev, after = t[s - 1], t[(s + length) % n]
+        gain = d[prev][first] + d[last][after] - d[prev][after]
+
+        rest = t[:s] + t[s + length:]
+        where = {node: p for p, node in enumerate(rest)}
+        best = None
+        for c in near[first] + near[last]:
+            if c not in where:
+                continue
+            p = where[c]
+            # Try the gap after c and the gap before it, in both orientations
+            for x_at in (p, p - 1):
+                x, y = rest[x_at], rest[(x_at + 1) % len(rest)]
+                base = d[x][y]
+                forward = d[x][first] + d[last][y] - base
+                backward = d[x][last] + d[first][y] - base
+                delta = min(forward, backward) - gain
+                if delta < 0 and (best is None or delta < best[0]):
+                    best = (delta, x_at % len(rest), backward < forward)
+
+        if best is None:
+            s += 1
+            continue
+        _, x_at, flip = best
+        if flip:
+            segment.reverse()
+        t[:] = rest[:x_at + 1] + segment + rest[x_at + 1:]
+        improved = True
+    return improved
+
+
+def held_karp(dist):
+    """Provably shortest closed tour from the depot, by bitmask dynamic programming
+
+    ``cost[mask, j]`` is the shortest walk from the depot through the picks in
+    ``mask`` ending at pick ``j``. Each layer of equally sized masks is filled for
+    all masks at once with NumPy. Memory grows as 2**n * n, so keep n to about
+    ``EXACT_LIMIT`` picks.
+    """
+    n = len(dist) - 1  # picks, the depot is index 0
+    if n <= 1:
+        return list(range(n + 1))
+    d = np.asarray(dist, dtype=np.int32)
+    legs = d[1:, 1:]
+    full = (1 << n) - 1
+    inf = 1 << 30  # still fits int32 after adding one more leg
+
+    cost = np.full((1 << n, n), inf, dtype=np.int32)
+    came_from = np.zeros((1 << n, n), dtype=np.int8)
+    singles = 1 << np.arange(n)
+    cost[singles, np.arange(n)] = d[0, 1:]
+
+    masks = np.arange(1 << n)
+    sizes = np.zeros(1 << n, dtype=np.int8)
+    for bit in range(n):
+        sizes += (masks >> bit) & 1
+
+    for size in range(2, n + 1):
+        layer = masks[sizes == size]
+        for j in range(n):
+            with_j = layer[(layer >> j) & 1 == 1]
+            before = cost[with_j ^ (1 << j)]  # (masks, n): walks ending at each i
+            total = before + legs[:, j]
+            best = total.argmin(axis=1)
+            cost[with_j, j] = total[np.arange(len(with_j)), best]
+            came_from[with_j, j] = best
+
+    last = int((cost[full] + d[1:, 0]).argmin())
+    tour = []
+    mask = full
+    while mask:
+        tour.append(last + 1)
+        prev = int(came_from[mask, last])
+        mask ^= 1 << last
+        last = prev
+    return [0] + tour[::-1]
@@ -0,0 +1,177 @@
+"""Planning a whole wave of orders on one layout across a process pool.
+
+The distance fields are built once for the union of every pick cell in the wave.
+The resulting matrix is published to the workers through
+``multiprocessing.shared_memory``. Each worker cuts out the rows and columns of its
+order and runs the tour solver, and plans come back in completion order.
+"""
+
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .batching import batch_orders, batch_picks
+from .matrix import build_matrix
+from .search import UNREACHED
+from .tours import TIME_BUDGET, solve_tour, tour_length
+
+
+class OrderPlan:
+    def __init__(self, index, picks):
+        self.index = index  # position of the order in the wave
+        self.picks = picks  # pick cells as given
+        self.tour = []  # cells in visiting order, starting at the depot
+        self.distance = 0  # cells walked on the closed tour, the return to the depot included
+        self.time = 0  # walking time of the same tour, equal to the distance on a floor without costs
+        self.optimal = False
+        self.error = None  # set instead of a tour when the order cannot be planned
+
+
+class BatchingResult:
+    def __init__(self, batches, plans, singles):
+        self.batches = batches  # order positions per batch
+        self.plans = plans  # one OrderPlan per batch, its picks are the batch's distinct cells
+        self.singles = singles  # one OrderPlan per order, planned alone
+
+    @property
+    def single_distance(self):
+        """Walking needed with one tour per order (orders that could be planned only)"""
+        return sum(plan.distance for plan in self.singles if plan.error is None)
+
+    @property
+    def batched_distance(self):
+        return sum(plan.distance for plan in self.plans)
+
+    @property
+    def saved(self):
+        return self.single_distance - self.batched_distance
+
+    @property
+    def single_time(self):
+        return sum(plan.time for plan in self.singles if plan.error is None)
+
+    @property
+    def batched_time(self):
+        return sum(plan.time for plan in self.plans)
+
+    @property
+    def saved_time(self):
+        return self.single_time - self.batched_time
+
+
+class WavePlanner:
+    def __init__(self, warehouse, orders, engine="auto", cache=None):
+        self.warehouse = warehouse
+        self.orders = [list(order) for order in orders]
+
+        # One node per distinct cell across the wave, the depot first
+        self.nodes = [warehouse.start]
+        self.index = {warehouse.start: 0}
+        for order in self.orders:
+            for cell in order:
+                if cell not in self.index:
+                    self.index[cell] = len(self.nodes)
+                    self.nodes.append(cell)
+        self.matrix = build_matrix(warehouse, self.nodes, engine, cache)
+
+    def leg(self, a, b):
+        """Cells walked from cell ``a`` to cell ``b`` (both must be depot or picks of the wave)"""
+        return self.matrix.leg(self.index[a], self.index[b])
+
+    def plan(self, mode="OPTIMIZED", workers=None, time_budget=TIME_BUDGET, orders=None):
+        """Yields an :class:`OrderPlan` per order as soon as it is ready
+
+        ``workers`` defaults to one process per CPU; with ``workers=1`` everything runs
+        in this process, in order. ``orders`` plans other pick lists over the cells of
+        the wave (batches, for instance) instead of the wave's own orders.
+        """
+        mode = mode.upper()
+        if orders is None:
+            orders = self.orders
+        jobs = []
+        for i, order in enumerate(orders):
+            plan = OrderPlan(i, order)
+            members = [0] + [self.index[cell] for cell in order]
+            if not order:
+                plan.tour = [self.warehouse.start]
+                yield plan
+            elif (self.matrix.dist[0, members] == UNREACHED).any():
+                plan.error = "Some targets are unreachable!"
+                yield plan
+            else:
+                jobs.append((plan, members))
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1 or len(jobs) <= 1:
+            for plan, members in jobs:
+                yield self._finish(plan, members, _solve(self.matrix.dist, members, mode, time_budget))
+            return
+
+        dist = self.matrix.dist
+        shm = shared_memory.SharedMemory(create=True, size=max(dist.nbytes, 1))
+        try:
+            np.ndarray(dist.shape, dtype=dist.dtype, buffer=shm.buf)[:] = dist
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers, initializer=_attach, initargs=(shm.name, dist.shape, dist.dtype.str)) as pool:
+                pending = {pool.submit(_solve_shared, members, mode, time_budget): (plan, members)
+                           for plan, members in jobs}
+                for future in concurrent.futures.as_completed(pending):
+                    plan, members = pending[future]
+                    yield self._finish(plan, members, future.result())
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def batch(self, capacity, method="savings", mode="OPTIMIZED", workers=None, time_budget=TIME_BUDGET):
+        """Groups the orders into batches of at most ``capacity`` picks and plans one tour per batch
+
+        Every order is planned on its own as well, so the result can tell how much
+        walking the batches save. Orders with unreachable picks are left out of the batches.
+        """
+        singles = sorted(self.plan(mode, workers, time_budget), key=lambda plan: plan.index)
+        planned = [plan.index for plan in singles if plan.error is None]
+        orders = [[self.index[cell] for cell in self.orders[i]] for i in planned]
+        groups = batch_orders(self.matrix.dist, orders, capacity, method)
+
+        batches = [[planned[o] for o in group] for group in groups]
+        picks = [batch_picks(self.orders, batch) for batch in batches]
+        plans = sorted(self.plan(mode, workers, time_budget, picks), key=lambda plan: plan.index)
+        return BatchingResult(batches, plans, singles)
+
+    def _finish(self, plan, members, solved):
+        tour, time, optimal = solved
+        plan.tour = [self.nodes[members[i]] for i in tour]
+        plan.optimal = optimal
+        if self.matrix.scale == 1:
+            plan.distance = plan.time = time
+            return plan
+        closed = [members[i] for i in tour] + [members[tour[0]]]
+        plan.distance = sum(self.matrix.distance(a, b) for a, b in zip(closed, closed[1:]))
+        plan.time = time / self.matrix.scale
+        return plan
+
+
+def _solve(dist, members, mode, time_budget):
+    sub = dist[np.ix_(members, members)]
+    tour, optimal = solve_tour(sub, mode, time_budget)
+    return tour, tour_length(sub, tour), optimal
+
+
+# --- Worker side ---
+
+_shared = {}
+
+
+def _attach(name, shape, dtype):
+    """Pool initializer: map the published matrix once per worker process"""
+    # Workers share the parent's resource tracker, so the block is unlinked once, by the parent
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm
+    _shared["dist"] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _solve_shared(members, mode, time_budget):
+    return _solve(_shared["dist"], members, mode, time_budget)